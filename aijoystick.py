@@ -9,10 +9,10 @@ import wrap_vjoy
 import window_finder
 import screenshot
 import utils_os
-import cv2
-import time
-
-utils_logging.STREAM_HANDLER.setLevel(logging.INFO)
+import pipeline
+import output_coalescer
+import keybindings
+import metrics
 
 
 def get_option(*options):
@@ -64,22 +64,26 @@ class KeyBinder:
 		self.keybindings = dict()
 
 	@staticmethod
-	def repeat_press(function, *args, nof_times=5, sleep_time=1.0):
-		for time_no in range(0, nof_times):
-			logging.info(f'pressing {args} [{time_no}/{nof_times}]')
-			function(*args)
-			logging.info(f'sleeping {sleep_time}s...')
-			time.sleep(sleep_time)
+	def repeat_press(device, binding, nof_times=5, sleep_time=1.0):
+		logging.info(f'pressing {binding} {nof_times} times, every {sleep_time}s...')
+		with keybindings.Playback(device) as playback:
+			playback.play(keybindings.repeat([keybindings.Step(0.0, binding)], nof_times, sleep_time)).result()
+
+	def save(self, path):
+		keybindings.save_bindings(self.keybindings, path)
+
+	def load(self, path):
+		self.keybindings.update(keybindings.load_bindings(path))
 
 	@utils_logging.log_call
 	def setup_controls(self, nof_times=5, sleepTime=1.0):
-		def fix_keybinding(function, *args, **kwargs):
+		def fix_keybinding(device, binding):
 			name_of_keybinding = None
 			while not name_of_keybinding:
-				self.repeat_press(function, *args, **kwargs)
+				self.repeat_press(device, binding, nof_times=nof_times, sleep_time=sleepTime)
 				name_of_keybinding = input('name of keybinding (empty to retry keypressing)> ')
 				if name_of_keybinding:
-					self.keybindings[name_of_keybinding] = utils_logging.call_entry_to_string(function, *args, **kwargs)
+					self.keybindings[name_of_keybinding] = binding
 					logging.info(f'keybindings:{self.keybindings}')
 
 		with wrap_vjoy.VJoyDevice(report_id=1) as dev:
@@ -98,25 +102,25 @@ class KeyBinder:
 						if axis:
 							value = get_option(*range(0x1, 0x8000 + 1))
 							if value:
-								fix_keybinding(dev.set_axis, axis, value)
+								fix_keybinding(dev, keybindings.Binding(keybindings.ControlType.AXIS, axis, value))
 					elif input_type == 'button':
 						button_no = get_option(*range(1, nof_buttons + 1))
 						if button_no:
 							value = get_option(True, False)
 							if value:
-								fix_keybinding(dev.set_button, button_no, value)
+								fix_keybinding(dev, keybindings.Binding(keybindings.ControlType.BUTTON, button_no, value))
 					elif input_type == 'dhat':
 						dhat = get_option(*range(1, nof_dhats + 1))
 						if dhat:
 							value = get_option(*list(wrap_vjoy.VJoyDevice.DiscreteHatDirection))
 							if value:
-								fix_keybinding(dev.set_discrete_hat, dhat, value)
+								fix_keybinding(dev, keybindings.Binding(keybindings.ControlType.DISCRETE_HAT, dhat, value))
 					elif input_type == 'chat':
 						chat = get_option(*range(1, nof_chats + 1))
 						if chat:
 							value = get_option(*range(-1, 35999 + 1))
 							if value:
-								fix_keybinding(dev.set_continuous_hat, chat, value)
+								fix_keybinding(dev, keybindings.Binding(keybindings.ControlType.CONTINUOUS_HAT, chat, value))
 
 
 @utils_logging.log_call
@@ -136,10 +140,41 @@ def select_window():
 				return handle
 
 
+def no_action(shots):
+	"""Decision function that never acts, replace with a policy that maps screenshots to an action(device)."""
+	return None
+
+
+@utils_logging.log_call
+def run(window_handle, decide, fps=60, latency_budget=0.05, report_rate=250, metrics_interval=10.0):
+	"""Run the capture -> decide -> actuate loop on a window until an empty line is entered.
+
+	:param window_handle: window to capture
+	:param decide: callable taking a list of screenshots and returning None or an action, a callable taking the VJoyDevice
+	:param fps: capture frame rate
+	:param latency_budget: seconds from capture to actuation, see pipeline.Pipeline
+	:param report_rate: joystick reports per second, see output_coalescer.OutputCoalescer
+	:param metrics_interval: seconds between logged metrics snapshots, see metrics.PeriodicDumper
+	"""
+	with metrics.PeriodicDumper(interval=metrics_interval), screenshot.CaptureSession(
+		(window_handle, ), fps=fps) as session, wrap_vjoy.VJoyDevice(report_id=1) as dev:
+		with output_coalescer.OutputCoalescer(dev, rate=report_rate) as output:
+			with pipeline.Pipeline(session.read, decide, output, latency_budget=latency_budget) as runner:
+				while input('running, empty line to stop> '):
+					logging.info(runner.statistics())
+			logging.info(runner.statistics())
+		logging.info(output.statistics())
+		logging.info(session.statistics())
+
+
 if __name__ == "__main__":
+	utils_logging.setup_logging()
+	utils_logging.STREAM_HANDLER.setLevel(logging.INFO)
 	keybinder = KeyBinder()
 	keybinder.setup_controls()
 	logging.info(keybinder.keybindings)
+	keybinder.save('keybindings.json')
 	handle = None
 	while handle is None:
 		handle = select_window()
+	run(handle, no_action)
@@ -0,0 +1,244 @@
+"""
+The purpose of this module is to measure the hot paths headless, and to catch performance regressions.
+
+Every benchmark runs against stand-ins (SyntheticBackend for capture, SimulatedVJoyInterface for vJoy,
+FakeWindowSource for window lookups), so the suite runs on any machine. Results are Measurements, saved as JSON;
+compared with a saved baseline, a measurement that is worse than the baseline by more than the tolerance is a
+regression.
+
+Usage::
+
+	python benchmark.py --save benchmark.json --tolerance 0.25
+	python benchmark.py --baseline benchmark.json
+"""
+
+import argparse
+import json
+import logging
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import hud_reader
+import template_matching
+import utils_logging
+import window_index
+import wrap_vjoy
+from capture_backends import SyntheticBackend
+from multiprocessor import Call
+from pixel_format import PixelFormat, frame_shape
+from screenshot import CaptureSession
+
+Measurement = namedtuple('Measurement', ['value', 'unit', 'higher_is_better'])
+Measurement.__doc__ = """
+:param value: measured value
+:param unit: unit of value, e.g. 'frames/s'
+:param higher_is_better: direction in which value improves, used to detect regressions
+"""
+
+RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+
+
+def benchmark_capture(resolutions=RESOLUTIONS, pixel_formats=(PixelFormat.BGRA, PixelFormat.RGB, PixelFormat.GRAY), nof_frames=100):
+	"""Frames/sec of CaptureSession.read from a SyntheticBackend, including conversion from BGRA."""
+	result = dict()
+	for width, height in resolutions:
+		for pixel_format in pixel_formats:
+			with CaptureSession(backend=SyntheticBackend(width=width, height=height), pixel_format=pixel_format) as session:
+				out = [np.empty(frame_shape(height, width, pixel_format), dtype='uint8')]
+				session.read(out)
+				start = time.perf_counter()
+				for _ in range(nof_frames):
+					session.read(out)
+				fps = nof_frames / (time.perf_counter() - start)
+			result[f'capture_{pixel_format.value}_{width}x{height}'] = Measurement(fps, 'frames/s', True)
+	return result
+
+
+def benchmark_vjoy(nof_updates=200):
+	"""Driver calls/sec and complete updates/sec of the VJoyDevice setters and of commits, on the simulated driver."""
+	result = wrap_vjoy.benchmark(nof_updates=nof_updates, interface=wrap_vjoy.SimulatedVJoyInterface())
+	return {
+		f'vjoy_{name}': Measurement(value, 'calls/s' if '_calls_' in name else 'updates/s', True)
+		for name, value in result.items()
+	}
+
+
+def benchmark_logging(nof_calls=100000):
+	"""Overhead of the utils_logging decorators with DEBUG logging disabled."""
+	return {
+		f'logging_{name}': Measurement(seconds * 1e9, 'ns/call', False)
+		for name, seconds in utils_logging.benchmark(nof_calls=nof_calls).items()
+	}
+
+
+def benchmark_window_index(nof_windows=5000):
+	"""Refresh and lookup times of a WindowIndex over nof_windows fake windows."""
+	return {
+		f'window_index_{name}': Measurement(seconds * 1e6, 'us', False)
+		for name, seconds in window_index.benchmark(nof_windows=nof_windows).items()
+	}
+
+
+def benchmark_template_matching(nof_templates=(1, 10, 50), frame_sizes=((640, 480), (1920, 1080))):
+	"""Frames/sec of TemplateMatcher.match, by number of templates and frame size."""
+	return {
+		f'template_matching_{nof}_{width}x{height}': Measurement(fps, 'frames/s', True)
+		for (nof, width, height), fps in template_matching.benchmark(nof_templates=nof_templates, frame_sizes=frame_sizes).items()
+	}
+
+
+def benchmark_hud_reader(nof_rois=(10, 100, 500)):
+	"""Microseconds per HudReader.read of a 1280x720 frame, by number of regions."""
+	return {
+		f'hud_reader_{name}_{nof}': Measurement(microseconds, 'us', False)
+		for (name, nof), microseconds in hud_reader.benchmark(nof_rois=nof_rois).items() if name == 'vectorized'
+	}
+
+
+def _echo(value):
+	return value
+
+
+def benchmark_multiprocessor(nof_calls=200, nof_process_calls=5):
+	"""Round-trip latency of multiprocessor.Call, to a warm worker and to a process spawned per call."""
+	result = dict()
+	for name, nof_workers, nof in (('pooled', 1, nof_calls), ('process_per_call', 0, nof_process_calls)):
+		with Call(_echo, nof_workers=nof_workers) as call:
+			call(0)
+			latencies = list()
+			for call_no in range(nof):
+				start = time.perf_counter()
+				call(call_no)
+				latencies.append(time.perf_counter() - start)
+		result[f'multiprocessor_{name}_median'] = Measurement(statistics.median(latencies) * 1e6, 'us', False)
+		result[f'multiprocessor_{name}_max'] = Measurement(max(latencies) * 1e6, 'us', False)
+	return result
+
+
+def import_time(module, nof_runs=3):
+	"""Cumulative import time of module in a fresh interpreter, as reported by python -X importtime.
+
+	:return: fastest of nof_runs, in microseconds
+	"""
+	times = list()
+	for _ in range(nof_runs):
+		completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+			cwd=pathlib.Path(__file__).resolve().parent,
+			capture_output=True,
+			text=True,
+			check=True)
+		#Last line: 'import time: self [us] | cumulative | imported package', of the module itself.
+		times.append(int(completed.stderr.strip().splitlines()[-1].split('|')[1]))
+	return min(times)
+
+
+def benchmark_startup(modules=('aijoystick', 'multiprocessor', 'screenshot', 'wrap_vjoy')):
+	"""Import time of the tool and of what its worker processes import, in fresh interpreters."""
+	return {f'import_{module}': Measurement(import_time(module) / 1000, 'ms', False) for module in modules}
+
+
+BENCHMARKS = {
+	'capture': benchmark_capture,
+	'vjoy': benchmark_vjoy,
+	'logging': benchmark_logging,
+	'window_index': benchmark_window_index,
+	'template_matching': benchmark_template_matching,
+	'hud_reader': benchmark_hud_reader,
+	'multiprocessor': benchmark_multiprocessor,
+	'startup': benchmark_startup,
+}
+
+
+def run(names=None):
+	"""
+	:param names: names of BENCHMARKS to run, all if None
+	:return: dict from measurement name to Measurement
+	"""
+	results = dict()
+	for name in (names or BENCHMARKS):
+		logging.info(f'running benchmark {name}...')
+		results.update(BENCHMARKS[name]())
+	return results
+
+
+DEFAULT_TOLERANCE = 0.2
+
+
+def save(results, path, tolerance=DEFAULT_TOLERANCE):
+	"""
+	:param results: dict from name to Measurement
+	:param path: JSON file to write
+	:param tolerance: regression threshold stored with the results, see regressions
+	"""
+	pathlib.Path(path).write_text(
+		json.dumps({
+		'tolerance': tolerance,
+		'measurements': {name: measurement._asdict() for name, measurement in results.items()},
+		},
+		indent='\t'))
+
+
+def load(path):
+	"""
+	:return: (dict from name to Measurement, tolerance) of a file written by save
+	"""
+	saved = json.loads(pathlib.Path(path).read_text())
+	return {name: Measurement(**measurement) for name, measurement in saved['measurements'].items()}, saved['tolerance']
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+	"""
+	:param results: dict from name to Measurement
+	:param baseline: dict from name to Measurement, e.g. load of a saved run
+	:param tolerance: fraction a measurement may be worse than its baseline
+	:return: dict from name to (baseline value, value) of the measurements that regressed
+	"""
+	regressed = dict()
+	for name, measurement in results.items():
+		reference = baseline.get(name)
+		if reference is None:
+			continue
+		if measurement.higher_is_better:
+			worse = measurement.value < reference.value * (1 - tolerance)
+		else:
+			worse = measurement.value > reference.value * (1 + tolerance)
+		if worse:
+			regressed[name] = (reference.value, measurement.value)
+	return regressed
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('names', nargs='*', help=f'benchmarks to run ({", ".join(BENCHMARKS)}), all if none')
+	parser.add_argument('--save', help='JSON file to save the results to')
+	parser.add_argument('--baseline', help='JSON file of earlier results to check for regressions')
+	parser.add_argument('--tolerance', type=float, help=f'fraction a result may be worse than the baseline, saved with --save, defaults to the baseline\'s or {DEFAULT_TOLERANCE}')
+	args = parser.parse_args(argv)
+	unknown = set(args.names) - set(BENCHMARKS)
+	if unknown:
+		parser.error(f'unknown benchmarks {sorted(unknown)}')
+	utils_logging.setup_logging()
+	#Measure with DEBUG records disabled, like a run that is not being debugged.
+	logging.getLogger().setLevel(logging.INFO)
+	results = run(args.names or None)
+	for name, measurement in results.items():
+		print(f'{name}: {measurement.value:.1f} {measurement.unit}')
+	if args.save:
+		save(results, args.save, DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance)
+	if args.baseline:
+		baseline, tolerance = load(args.baseline)
+		regressed = regressions(results, baseline, tolerance if args.tolerance is None else args.tolerance)
+		for name, (reference, value) in regressed.items():
+			print(f'REGRESSION {name}: {reference:.1f} -> {value:.1f} {results[name].unit}')
+		return 1 if regressed else 0
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+The purpose of this module is to make the source of captured frames pluggable.
+
+A CaptureBackend captures frames of its sources (monitors, windows, generated or recorded streams) in a requested
+PixelFormat. Besides the mss (monitors) and GDI (windows) backends there are backends that need no display, so that
+everything downstream of capture can be run and measured headless:
+
+* SyntheticBackend generates deterministic frames at a configurable resolution and frame rate.
+* ReplayBackend plays back frames recorded to disk, see frame_recording.
+"""
+
+import abc
+import pathlib
+import platform
+import time
+
+import utils_logging
+from timing import sleep_until
+from pixel_format import PixelFormat, convert, convert_bgra
+from region import check_regions, allocate_batch
+from utils_import import lazy_import
+from window_tracker import WindowChange, WindowTracker
+
+np = lazy_import('numpy')
+mss = lazy_import('mss')
+frame_recording = lazy_import('frame_recording')
+
+if platform.system() == 'Windows':
+	from screenshot_windows import WindowCapture, get_windowshot, get_window_regions
+
+
+class CaptureBackend(abc.ABC):
+	"""Interface of capture backends. Use as a context manager, or call open and close."""
+
+	def open(self):
+		pass
+
+	def close(self):
+		pass
+
+	@abc.abstractmethod
+	def sources(self):
+		"""
+		:return: list of the sources this backend captures, e.g. monitors or window handles
+		"""
+
+	@abc.abstractmethod
+	def grab(self, source, pixel_format=PixelFormat.RGB, out=None):
+		"""
+		:param source: one of sources()
+		:param pixel_format: requested PixelFormat
+		:param out: optional preallocated array, see pixel_format.frame_shape
+		:return: contiguous frame of source in pixel_format (out if given)
+		"""
+
+	def grab_regions(self, source, regions, pixel_format=PixelFormat.RGB, out=None):
+		"""
+		Backends that can grab sub-rectangles directly should override this, the default crops a full grab.
+
+		:param source: one of sources()
+		:param regions: tuple of Region relative to source
+		:param pixel_format: requested PixelFormat
+		:param out: optional preallocated batch, see region.allocate_batch
+		:return: batch of frames, see region.allocate_batch
+		"""
+		frame = self.grab(source, pixel_format=PixelFormat.BGRA)
+		check_regions(regions, frame.shape[1], frame.shape[0])
+		if out is None:
+			out = allocate_batch(regions, pixel_format)
+		for region_no, region in enumerate(regions):
+			convert_bgra(frame[region.top:region.top + region.height, region.left:region.left + region.width],
+				pixel_format, out=out[region_no])
+		return out
+
+	def __enter__(self):
+		self.open()
+		return self
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
+
+
+class MssBackend(CaptureBackend):
+	"""Captures monitors with mss. [https://pypi.org/project/mss/]"""
+
+	def __init__(self):
+		self.grabber = None
+
+	@utils_logging.log_call
+	def open(self):
+		self.grabber = mss.mss()
+
+	@utils_logging.log_call
+	def close(self):
+		if self.grabber:
+			self.grabber.close()
+			self.grabber = None
+
+	def sources(self):
+		return list(self.grabber.monitors)
+
+	def grab(self, source, pixel_format=PixelFormat.RGB, out=None):
+		sct = self.grabber.grab(source)
+		#sct.raw is the native BGRA buffer, sct.rgb would cost an extra conversion
+		bgra = np.frombuffer(sct.raw, dtype='uint8').reshape(sct.height, sct.width, 4)
+		return convert_bgra(bgra, pixel_format, out=out)
+
+	def grab_regions(self, source, regions, pixel_format=PixelFormat.RGB, out=None):
+		check_regions(regions, source['width'], source['height'])
+		if out is None:
+			out = allocate_batch(regions, pixel_format)
+		for region_no, region in enumerate(regions):
+			self.grab({
+				'left': source['left'] + region.left,
+				'top': source['top'] + region.top,
+				'width': region.width,
+				'height': region.height,
+			}, pixel_format, out[region_no])
+		return out
+
+
+class GdiBackend(CaptureBackend):
+	"""Captures windows with GDI (Windows only), see screenshot_windows.
+
+	Every window is followed by a WindowTracker, its GDI resources are kept open across frames and reallocated only
+	when the tracker signals that the window was resized.
+	"""
+
+	def __init__(self, window_handles, revalidate_interval=0.1, provider=None):
+		"""
+		:param window_handles: windows to capture
+		:param revalidate_interval: seconds between checks of the windows' geometry, see WindowTracker
+		:param provider: geometry provider of the trackers, window_tracker.default_provider if None
+		"""
+		self.window_handles = tuple(window_handles)
+		self.revalidate_interval = revalidate_interval
+		self.provider = provider
+		self.trackers = dict()
+		self.captures = dict()
+
+	@utils_logging.log_call
+	def open(self):
+		for window_handle in self.window_handles:
+			tracker = WindowTracker(window_handle, provider=self.provider, interval=self.revalidate_interval)
+			tracker.subscribe(self._on_window_change)
+			self.trackers[window_handle] = tracker
+
+	@utils_logging.log_call
+	def close(self):
+		for capture in self.captures.values():
+			capture.close()
+		self.captures = dict()
+		self.trackers = dict()
+
+	def _on_window_change(self, tracker, change, previous):
+		capture = self.captures.get(tracker.window_handle)
+		if capture is None:
+			return
+		if change is WindowChange.RESIZED:
+			capture.resize(*tracker.size)
+		elif change is WindowChange.CLOSED:
+			capture.close()
+			del self.captures[tracker.window_handle]
+
+	def _tracker(self, source):
+		"""
+		:return: revalidated WindowTracker of source, None if the backend is not open
+		:raises WindowClosed: if the window does not exist any more
+		"""
+		tracker = self.trackers.get(source)
+		if tracker is not None:
+			tracker.revalidate()
+			tracker.check()
+		return tracker
+
+	def sources(self):
+		return list(self.window_handles)
+
+	def grab(self, source, pixel_format=PixelFormat.RGB, out=None):
+		tracker = self._tracker(source)
+		if tracker is None:
+			return get_windowshot(source, pixel_format=pixel_format, out=out)
+		capture = self.captures.get(source)
+		if capture is None:
+			capture = self.captures[source] = WindowCapture(source).open()
+			capture.resize(*tracker.size)
+		return capture.grab(pixel_format=pixel_format, out=out)
+
+	def grab_regions(self, source, regions, pixel_format=PixelFormat.RGB, out=None):
+		tracker = self._tracker(source)
+		return get_window_regions(source, regions, pixel_format=pixel_format, out=out,
+			size=tracker.size if tracker is not None else None)
+
+
+class _PacedBackend(CaptureBackend):
+	"""Backend whose frame n of every source becomes available n/fps seconds after open (immediately if fps is None)."""
+
+	def __init__(self, fps):
+		self.period = 1.0 / fps if fps else None
+		self.start_ns = None
+		self.frame_nos = dict()
+
+	def open(self):
+		self.start_ns = time.perf_counter_ns()
+		self.frame_nos = {source_no: 0 for source_no in range(len(self.sources()))}
+
+	def _next_frame_no(self, source_no):
+		frame_no = self.frame_nos[source_no]
+		self.frame_nos[source_no] = frame_no + 1
+		if self.period:
+			sleep_until(self.start_ns + int(frame_no * self.period * 1e9))
+		return frame_no
+
+
+class SyntheticBackend(_PacedBackend):
+	"""Generates deterministic BGRA frames: a diagonal gradient scrolling one pixel per frame, different per source."""
+
+	@utils_logging.log_call
+	def __init__(self, width=640, height=480, fps=None, nof_sources=1):
+		"""
+		:param width: width of the frames
+		:param height: height of the frames
+		:param fps: frame rate frames are produced at, as fast as possible if None
+		:param nof_sources: number of independent sources
+		"""
+		super().__init__(fps)
+		self.width = width
+		self.height = height
+		self.nof_sources = nof_sources
+		#Twice as wide as a frame, frame n is the view starting at column n % width.
+		rows = np.arange(height, dtype=np.uint32)[:, np.newaxis]
+		columns = np.arange(2 * width, dtype=np.uint32)[np.newaxis, :] % width
+		self.patterns = list()
+		for source_no in range(nof_sources):
+			pattern = np.empty((height, 2 * width, 4), dtype='uint8')
+			pattern[..., 0] = (rows + columns + 64 * source_no) % 256
+			pattern[..., 1] = (2 * rows + 37 * source_no) % 256
+			pattern[..., 2] = (3 * columns + 91 * source_no) % 256
+			pattern[..., 3] = 255
+			self.patterns.append(pattern)
+
+	def sources(self):
+		return list(range(self.nof_sources))
+
+	def frame(self, source, frame_no):
+		"""
+		:return: BGRA view of frame frame_no of source, without pacing
+		"""
+		offset = frame_no % self.width
+		return self.patterns[source][:, offset:offset + self.width]
+
+	def grab(self, source, pixel_format=PixelFormat.RGB, out=None):
+		return convert_bgra(self.frame(source, self._next_frame_no(source)), pixel_format, out=out)
+
+
+class ReplayBackend(_PacedBackend):
+	"""Plays back frames recorded to disk.
+
+	A recording is a directory recorded by frame_recording.FrameRecorder, or a .npy file with a stack of frames
+	(nof_frames x height x width[ x channels]). Both are memory mapped. A directory of recordings of either kind has one
+	source per recording.
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, path, recorded_format=PixelFormat.BGRA, fps=None, loop=True):
+		"""
+		:param path: recording, or directory of recordings
+		:param recorded_format: PixelFormat of the recorded frames
+		:param fps: frame rate frames are played back at, as fast as possible if None
+		:param loop: start over at the end of a recording instead of raising EOFError
+		"""
+		super().__init__(fps)
+		path = pathlib.Path(path)
+		if frame_recording.is_recording(path) or not path.is_dir():
+			self.paths = [path]
+		else:
+			self.paths = sorted(child for child in path.iterdir() if child.suffix == '.npy' or frame_recording.is_recording(child))
+		if not self.paths:
+			raise FileNotFoundError(f"no recordings in {path}")
+		self.recorded_format = recorded_format
+		self.loop = loop
+		self.recordings = None
+
+	@utils_logging.log_call
+	def open(self):
+		self.recordings = [frame_recording.FrameReader(path) if frame_recording.is_recording(path) else np.load(path, mmap_mode='r') for path in self.paths]
+		super().open()
+
+	@utils_logging.log_call
+	def close(self):
+		self.recordings = None
+
+	def sources(self):
+		return list(range(len(self.paths)))
+
+	def _next_recorded_frame(self, source):
+		recording = self.recordings[source]
+		frame_no = self._next_frame_no(source)
+		if frame_no >= len(recording):
+			if not self.loop:
+				raise EOFError(f"end of recording {self.paths[source]}")
+			frame_no %= len(recording)
+		return recording[frame_no]
+
+	def grab(self, source, pixel_format=PixelFormat.RGB, out=None):
+		return convert(self._next_recorded_frame(source), self.recorded_format, pixel_format, out=out)
+
+	def grab_regions(self, source, regions, pixel_format=PixelFormat.RGB, out=None):
+		frame = self._next_recorded_frame(source)
+		check_regions(regions, frame.shape[1], frame.shape[0])
+		if out is None:
+			out = allocate_batch(regions, pixel_format)
+		for region_no, region in enumerate(regions):
+			convert(frame[region.top:region.top + region.height, region.left:region.left + region.width],
+				self.recorded_format, pixel_format, out=out[region_no])
+		return out
+
+
+def default_backend(window_handles=None):
+	"""
+	:return: GdiBackend for the windows if window_handles are given, otherwise MssBackend for all monitors
+	"""
+	if window_handles:
+		return GdiBackend(window_handles)
+	return MssBackend()
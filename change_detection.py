@@ -0,0 +1,127 @@
+"""
+The purpose of this module is to find out which parts of consecutive frames changed, so unchanged work can be skipped.
+
+Frames are split in tiles. A ChangeDetector compares a frame with the previous one tile by tile (vectorized, with
+buffers allocated once per frame size) and reports either that nothing changed or which tiles are dirty.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import cv2
+
+from region import Region
+
+Changes = namedtuple('Changes', ['unchanged', 'dirty_tiles', 'mask'])
+Changes.__doc__ = """
+:param unchanged: True if no tile changed more than the threshold
+:param dirty_tiles: (nof_dirty_tiles x 2) array of (tile_row, tile_column)
+:param mask: (nof_tile_rows x nof_tile_columns) bool array, True for dirty tiles. Overwritten by the next frame.
+"""
+
+
+class ChangeDetector:
+	"""Tile-wise change detection against the previous frame.
+
+	A tile is dirty if any of its pixels differs more than threshold (in any channel) from the reference frame. The
+	reference frame is only replaced when something is dirty, so slow changes below the threshold still add up to a
+	detected change instead of creeping by unnoticed.
+	"""
+
+	def __init__(self, tile_size=(32, 32), threshold=0):
+		"""
+		:param tile_size: (height, width) of a tile, edge tiles may be smaller
+		:param threshold: largest per pixel difference that is not a change
+		"""
+		self.tile_height, self.tile_width = tile_size
+		self.threshold = threshold
+		self.nof_frames = 0
+		self.nof_unchanged = 0
+		self.reset()
+
+	def reset(self):
+		"""Forget the reference frame, the next frame is reported as completely dirty."""
+		self.reference = None
+
+	def _allocate(self, frame):
+		height, width = frame.shape[:2]
+		nof_channels = frame.shape[2] if frame.ndim == 3 else 1
+		self.reference = frame.copy()
+		self.difference = np.empty_like(frame)
+		#Channels are folded into the columns, a tile is nof_channels*tile_width values wide.
+		self.nof_full_tile_rows = height // self.tile_height
+		nof_tile_rows = -(-height // self.tile_height)
+		self.column_starts = np.arange(0, width, self.tile_width) * nof_channels
+		self.tile_rows_difference = np.empty((nof_tile_rows, width * nof_channels), dtype=frame.dtype)
+		self.tile_difference = np.empty((nof_tile_rows, len(self.column_starts)), dtype=frame.dtype)
+		self.mask = np.ones(self.tile_difference.shape, dtype=bool)
+
+	@property
+	def tile_grid(self):
+		"""(nof_tile_rows, nof_tile_columns), None before the first frame"""
+		return None if self.reference is None else self.mask.shape
+
+	def __call__(self, frame):
+		"""
+		:param frame: HxW or HxWxC frame, same dtype and layout as the previous frames
+		:return: Changes of frame compared to the reference frame
+		"""
+		self.nof_frames += 1
+		if self.reference is None or self.reference.shape != frame.shape or self.reference.dtype != frame.dtype:
+			self._allocate(frame)
+			self.mask[...] = True
+			return Changes(unchanged=False, dirty_tiles=np.argwhere(self.mask), mask=self.mask)
+		cv2.absdiff(frame, self.reference, dst=self.difference)
+		difference = self.difference.reshape(frame.shape[0], -1)
+		#Reducing whole bands of tile rows at once is much faster than np.maximum.reduceat along axis 0.
+		full_height = self.nof_full_tile_rows * self.tile_height
+		np.max(difference[:full_height].reshape(self.nof_full_tile_rows, self.tile_height, -1),
+			axis=1,
+			out=self.tile_rows_difference[:self.nof_full_tile_rows])
+		if full_height < frame.shape[0]:
+			np.max(difference[full_height:], axis=0, out=self.tile_rows_difference[self.nof_full_tile_rows])
+		np.maximum.reduceat(self.tile_rows_difference, self.column_starts, axis=1, out=self.tile_difference)
+		np.greater(self.tile_difference, self.threshold, out=self.mask)
+		if not self.mask.any():
+			self.nof_unchanged += 1
+			return Changes(unchanged=True, dirty_tiles=np.empty((0, 2), dtype=np.intp), mask=self.mask)
+		self._update_reference(frame)
+		return Changes(unchanged=False, dirty_tiles=np.argwhere(self.mask), mask=self.mask)
+
+	def _update_reference(self, frame):
+		"""Copy the dirty tiles of frame into the reference, the clean tiles keep accumulating their small changes."""
+		if self.mask.all():
+			np.copyto(self.reference, frame)
+			return
+		height, width = frame.shape[:2]
+		pixels = np.repeat(np.repeat(self.mask, self.tile_height, axis=0)[:height], self.tile_width, axis=1)[:, :width]
+		np.copyto(self.reference, frame, where=pixels if frame.ndim == 2 else pixels[..., np.newaxis])
+
+	def tile_region(self, tile_row, tile_column):
+		"""
+		:return: Region of a tile in frame coordinates, clipped to the frame
+		"""
+		height, width = self.reference.shape[:2]
+		top = int(tile_row) * self.tile_height
+		left = int(tile_column) * self.tile_width
+		return Region(left=left, top=top, width=min(self.tile_width, width - left), height=min(self.tile_height, height - top))
+
+	def dirty_regions(self, changes):
+		"""
+		:return: list of Region, one per dirty tile of changes
+		"""
+		return [self.tile_region(tile_row, tile_column) for tile_row, tile_column in changes.dirty_tiles]
+
+
+def skip_unchanged(frames, detector=None):
+	"""Pipeline stage that drops frames in which nothing changed.
+
+	:param frames: iterable of frames of one source
+	:param detector: ChangeDetector to use, one with default settings if None
+	:return: generator of (frame, Changes) for the frames that changed
+	"""
+	detector = detector if detector is not None else ChangeDetector()
+	for frame in frames:
+		changes = detector(frame)
+		if not changes.unchanged:
+			yield frame, changes
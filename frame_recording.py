@@ -0,0 +1,208 @@
+"""
+The purpose of this module is to record captured frames to disk at capture rate and to replay them quickly.
+
+A recording is a directory with
+
+* ``chunk_NNNNN.bin`` files, preallocated and memory mapped, that the raw frame bytes are appended to, and
+* ``index.bin``, one INDEX_DTYPE record per frame with its timestamp, location, shape and dtype.
+
+FrameRecorder.append only copies the frame into the mapped chunk and appends an index record; opening the next chunk
+and flushing full ones happens on a background thread. FrameReader maps the chunks read-only and hands out NumPy views
+for random access and for replay at any multiple of real-time.
+"""
+
+import os
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import utils_logging
+from timing import sleep_until
+
+INDEX_DTYPE = np.dtype([
+	('timestamp_ns', '<i8'),
+	('chunk', '<i4'),
+	('ndim', '<i4'),
+	('offset', '<i8'),
+	('shape', '<i4', (4, )),
+	('dtype', 'S8'),
+])
+INDEX_FILE_NAME = 'index.bin'
+_ALIGNMENT = 64
+
+
+def chunk_file_name(chunk_no):
+	return f'chunk_{chunk_no:05d}.bin'
+
+
+def is_recording(path):
+	return (pathlib.Path(path) / INDEX_FILE_NAME).is_file()
+
+
+class FrameRecorder:
+	"""Appends frames to a recording directory.
+
+	Usage::
+
+		with FrameRecorder('session') as recorder:
+			for shots in capture_session:
+				recorder.append(shots[0])
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, path, chunk_size=256 * 2**20):
+		"""
+		:param path: directory of the recording, created if needed, must not contain a recording
+		:param chunk_size: bytes per chunk file, the largest frame that can be recorded
+		"""
+		self.path = pathlib.Path(path)
+		self.path.mkdir(parents=True, exist_ok=True)
+		if is_recording(self.path):
+			raise FileExistsError(f"{self.path} already contains a recording")
+		self.chunk_size = chunk_size
+		self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='FrameRecorder')
+		self.index_file = open(self.path / INDEX_FILE_NAME, 'wb')
+		self.record = np.zeros(1, dtype=INDEX_DTYPE)
+		self.nof_frames = 0
+		self.nof_stalls = 0
+		self.chunk_no = 0
+		self.chunk = self._open_chunk(0)
+		self.next_chunk = self.executor.submit(self._open_chunk, 1)
+		self.offset = 0
+
+	def _open_chunk(self, chunk_no):
+		chunk_path = self.path / chunk_file_name(chunk_no)
+		with open(chunk_path, 'wb') as chunk_file:
+			chunk_file.truncate(self.chunk_size)
+			if hasattr(os, 'posix_fallocate'):
+				#Reserve the blocks now instead of on first touch in append.
+				os.posix_fallocate(chunk_file.fileno(), 0, self.chunk_size)
+		return np.memmap(chunk_path, dtype='uint8', mode='r+', shape=(self.chunk_size, ))
+
+	def _retire_chunk(self, chunk):
+		chunk.flush()
+
+	def _next_chunk(self):
+		if not self.next_chunk.done():
+			self.nof_stalls += 1
+		chunk = self.next_chunk.result()
+		self.executor.submit(self._retire_chunk, self.chunk)
+		self.chunk_no += 1
+		self.chunk = chunk
+		self.next_chunk = self.executor.submit(self._open_chunk, self.chunk_no + 1)
+		self.offset = 0
+
+	def append(self, frame, timestamp_ns=None):
+		"""Copy a frame into the recording.
+
+		:param frame: array of at most 4 dimensions
+		:param timestamp_ns: time of the frame, time.perf_counter_ns() if None
+		:return: frame number of frame in the recording
+		"""
+		if frame.ndim > 4:
+			raise ValueError(f"frames may have at most 4 dimensions, got {frame.shape}")
+		if frame.nbytes > self.chunk_size:
+			raise ValueError(f"frame of {frame.nbytes} bytes does not fit in chunks of {self.chunk_size} bytes")
+		if self.offset + frame.nbytes > self.chunk_size:
+			self._next_chunk()
+		destination = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.chunk, offset=self.offset)
+		np.copyto(destination, frame)
+		record = self.record[0]
+		record['timestamp_ns'] = time.perf_counter_ns() if timestamp_ns is None else timestamp_ns
+		record['chunk'] = self.chunk_no
+		record['ndim'] = frame.ndim
+		record['offset'] = self.offset
+		record['shape'][:frame.ndim] = frame.shape
+		record['shape'][frame.ndim:] = 0
+		record['dtype'] = frame.dtype.str
+		self.index_file.write(self.record.tobytes())
+		self.offset += (frame.nbytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+		self.nof_frames += 1
+		return self.nof_frames - 1
+
+	@utils_logging.log_call
+	def close(self):
+		if self.chunk is None:
+			return
+		self.index_file.close()
+		next_chunk_path = pathlib.Path(self.next_chunk.result().filename)
+		self.next_chunk = None
+		self.executor.shutdown(wait=True)
+		next_chunk_path.unlink()
+		#Only the last chunk is trimmed, the unmapped tail of the others is at most one frame.
+		chunk_path = pathlib.Path(self.chunk.filename)
+		self.chunk.flush()
+		self.chunk = None
+		os.truncate(chunk_path, self.offset)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
+
+
+class FrameReader:
+	"""Random access to, and replay of, a recording made by FrameRecorder. Frames are read-only views of the chunks."""
+
+	@utils_logging.log_call
+	def __init__(self, path):
+		self.path = pathlib.Path(path)
+		self.index = np.fromfile(self.path / INDEX_FILE_NAME, dtype=INDEX_DTYPE)
+		self.chunks = dict()
+
+	def __len__(self):
+		return len(self.index)
+
+	@property
+	def timestamps_ns(self):
+		return self.index['timestamp_ns']
+
+	def _chunk(self, chunk_no):
+		chunk = self.chunks.get(chunk_no)
+		if chunk is None:
+			chunk = self.chunks[chunk_no] = np.memmap(self.path / chunk_file_name(chunk_no), dtype='uint8', mode='r')
+		return chunk
+
+	def __getitem__(self, frame_no):
+		"""
+		:return: read-only view of frame frame_no
+		"""
+		record = self.index[frame_no]
+		return np.ndarray(tuple(record['shape'][:record['ndim']]),
+			dtype=np.dtype(record['dtype'].decode('ascii')),
+			buffer=self._chunk(int(record['chunk'])),
+			offset=int(record['offset']))
+
+	def __iter__(self):
+		for frame_no in range(len(self)):
+			yield self[frame_no]
+
+	def replay(self, speed=None, start=0, stop=None):
+		"""Yield frames at their recorded pace.
+
+		:param speed: multiple of real-time to replay at, as fast as possible if None
+		:param start: first frame number
+		:param stop: frame number to stop before, the end if None
+		:return: generator of (timestamp_ns, frame)
+		"""
+		stop = len(self) if stop is None else stop
+		replay_start = time.perf_counter_ns()
+		for frame_no in range(start, stop):
+			timestamp_ns = int(self.index[frame_no]['timestamp_ns'])
+			if speed:
+				sleep_until(replay_start + int((timestamp_ns - int(self.index[start]['timestamp_ns'])) / speed))
+			yield timestamp_ns, self[frame_no]
+
+	def close(self):
+		self.chunks.clear()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
@@ -0,0 +1,271 @@
+"""
+The purpose of this module is to share captured frames between processes without pickling them.
+
+A FrameRing is a fixed number of frame slots in one ``multiprocessing.shared_memory`` block. The capture process
+writes frames in place, tagged with a sequence number and a timestamp; consumers in other processes attach by name
+and read the slots as NumPy views.
+
+Two ways of reading are supported:
+
+* ``read_latest`` returns the most recently published frame and never holds the producer back (frames may be skipped).
+* ``reader(reader_no)`` returns a NoDropReader with its own cursor in shared memory; the producer waits rather than
+  overwrite a frame that reader has not consumed yet.
+"""
+
+import contextlib
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import utils_logging
+
+Frame = namedtuple('Frame', ['seq', 'timestamp_ns', 'array'])
+
+_MAGIC = int.from_bytes(b'FRAMERIN', 'little')
+_MAX_NDIM = 4
+_HEADER_WORDS = 16
+#header word indices
+_H_MAGIC = 0
+_H_NOF_SLOTS = 1
+_H_NOF_READERS = 2
+_H_NDIM = 3
+_H_SHAPE = 4  # .. 4 + _MAX_NDIM
+_H_DTYPE = 8
+_H_WRITE_SEQ = 9
+_META_WORDS = 2  # seq, timestamp_ns
+_ALIGNMENT = 64
+_NO_READER = -1
+
+
+def _aligned(nof_bytes):
+	return (nof_bytes + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _wait_until(predicate, timeout, poll_interval, what):
+	deadline = None if timeout is None else time.perf_counter() + timeout
+	while not predicate():
+		if deadline is not None and time.perf_counter() > deadline:
+			raise TimeoutError(f"timed out after {timeout}s waiting for {what}")
+		time.sleep(poll_interval)
+
+
+class FrameRing:
+	"""Ring of frame slots in shared memory. Use FrameRing.create in the producer and FrameRing.attach in consumers."""
+
+	def __init__(self, shm, owner, poll_interval=0.0005):
+		self.shm = shm
+		self.owner = owner
+		self.poll_interval = poll_interval
+		header = np.ndarray((_HEADER_WORDS, ), dtype=np.int64, buffer=shm.buf)
+		if header[_H_MAGIC] != _MAGIC:
+			raise ValueError(f"shared memory {shm.name!r} does not contain a FrameRing")
+		self.nof_slots = int(header[_H_NOF_SLOTS])
+		self.nof_readers = int(header[_H_NOF_READERS])
+		self.shape = tuple(int(dim) for dim in header[_H_SHAPE:_H_SHAPE + int(header[_H_NDIM])])
+		self.dtype = np.dtype(header[_H_DTYPE:_H_DTYPE + 1].tobytes().rstrip(b'\0').decode('ascii'))
+		offset = _aligned(header.nbytes)
+		self._header = header
+		self._meta = np.ndarray((self.nof_slots, _META_WORDS), dtype=np.int64, buffer=shm.buf, offset=offset)
+		offset += _aligned(self._meta.nbytes)
+		self._cursors = np.ndarray((max(self.nof_readers, 1), ), dtype=np.int64, buffer=shm.buf, offset=offset)
+		offset += _aligned(self._cursors.nbytes)
+		self.slots = np.ndarray((self.nof_slots, ) + self.shape, dtype=self.dtype, buffer=shm.buf, offset=offset)
+
+	@staticmethod
+	def _size(shape, dtype, nof_slots, nof_readers):
+		frame_nof_bytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+		return (_aligned(_HEADER_WORDS * 8) + _aligned(nof_slots * _META_WORDS * 8) + _aligned(max(nof_readers, 1) * 8) +
+			nof_slots * frame_nof_bytes)
+
+	@classmethod
+	@utils_logging.log_call
+	def create(cls, shape, dtype='uint8', nof_slots=4, nof_readers=1, name=None):
+		"""
+		:param shape: shape of every frame, e.g. pixel_format.frame_shape(...)
+		:param dtype: dtype of every frame
+		:param nof_slots: number of frames the ring holds
+		:param nof_readers: number of NoDropReader cursors that can be attached
+		:param name: name of the shared memory block, generated if None
+		:return: FrameRing that owns (and unlinks on close) the shared memory block
+		"""
+		shape = tuple(int(dim) for dim in shape)
+		dtype_str = np.dtype(dtype).str.encode('ascii')
+		if len(shape) > _MAX_NDIM:
+			raise ValueError(f"frames may have at most {_MAX_NDIM} dimensions, got {shape}")
+		if len(dtype_str) > 8:
+			raise ValueError(f"unsupported dtype {dtype!r}")
+		if nof_slots < 2:
+			raise ValueError(f"nof_slots must be at least 2, got {nof_slots}")
+		shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(shape, dtype, nof_slots, nof_readers))
+		header = np.ndarray((_HEADER_WORDS, ), dtype=np.int64, buffer=shm.buf)
+		header[:] = 0
+		header[_H_NOF_SLOTS] = nof_slots
+		header[_H_NOF_READERS] = nof_readers
+		header[_H_NDIM] = len(shape)
+		header[_H_SHAPE:_H_SHAPE + len(shape)] = shape
+		header[_H_DTYPE:_H_DTYPE + 1] = np.frombuffer(dtype_str.ljust(8, b'\0'), dtype=np.int64)
+		header[_H_MAGIC] = _MAGIC
+		ring = cls(shm, owner=True)
+		ring._meta[:] = 0
+		ring._cursors[:] = _NO_READER
+		return ring
+
+	@classmethod
+	@utils_logging.log_call
+	def attach(cls, name):
+		"""
+		:param name: name of a shared memory block made by FrameRing.create
+		:return: FrameRing view of it, closing it leaves the block alive
+		"""
+		try:
+			#Only the creator unlinks the block (python>=3.13), older versions share the tracker of the multiprocessing parent.
+			shm = shared_memory.SharedMemory(name=name, track=False)
+		except TypeError:
+			shm = shared_memory.SharedMemory(name=name)
+		return cls(shm, owner=False)
+
+	@property
+	def name(self):
+		return self.shm.name
+
+	@property
+	def write_seq(self):
+		"""Sequence number of the last published frame, 0 if nothing is published yet."""
+		return int(self._header[_H_WRITE_SEQ])
+
+	def _slot_index(self, seq):
+		return (seq - 1) % self.nof_slots
+
+	def _consumed_by_all(self, seq):
+		"""True if writing seq would not overwrite a frame some attached NoDropReader still needs."""
+		cursors = self._cursors[:self.nof_readers]
+		attached = cursors[cursors != _NO_READER]
+		return not len(attached) or int(attached.min()) >= seq - self.nof_slots
+
+	@contextlib.contextmanager
+	def writing(self, timestamp_ns=None, timeout=None):
+		"""Claim the next slot for an in-place write, e.g. as the ``out`` of a capture function.
+
+		The frame is published when the with-block exits without an exception.
+
+		:param timestamp_ns: timestamp of the frame, time.perf_counter_ns() at publication if None
+		:param timeout: seconds to wait for lagging NoDropReaders, forever if None
+		:raises TimeoutError: if a NoDropReader did not consume the slot in time
+		"""
+		seq = self.write_seq + 1
+		slot_index = self._slot_index(seq)
+		_wait_until(lambda: self._consumed_by_all(seq), timeout, self.poll_interval, f"readers to consume frame {seq - self.nof_slots}")
+		meta = self._meta[slot_index]
+		meta[0] = 0  # invalidate the slot while it is written
+		yield self.slots[slot_index]
+		meta[1] = time.perf_counter_ns() if timestamp_ns is None else timestamp_ns
+		meta[0] = seq
+		self._header[_H_WRITE_SEQ] = seq
+
+	def write(self, frame, timestamp_ns=None, timeout=None):
+		"""Copy frame into the next slot and publish it.
+
+		:return: sequence number of the published frame
+		"""
+		with self.writing(timestamp_ns=timestamp_ns, timeout=timeout) as slot:
+			np.copyto(slot, frame)
+		return self.write_seq
+
+	def is_valid(self, frame):
+		"""
+		:return: True if the slot a Frame views has not been overwritten since it was read
+		"""
+		return int(self._meta[self._slot_index(frame.seq), 0]) == frame.seq
+
+	def _frame(self, seq):
+		slot_index = self._slot_index(seq)
+		meta = self._meta[slot_index]
+		return Frame(seq=seq, timestamp_ns=int(meta[1]), array=self.slots[slot_index])
+
+	def read_latest(self, copy=False):
+		"""Read the most recently published frame without holding the producer back.
+
+		:param copy: copy the frame out of shared memory, retrying if the producer overwrote it meanwhile
+		:return: Frame, or None if nothing is published yet. Without copy the array is a view of the slot that the
+			producer will eventually overwrite, see is_valid.
+		"""
+		while True:
+			seq = self.write_seq
+			if not seq:
+				return None
+			frame = self._frame(seq)
+			if copy:
+				frame = frame._replace(array=frame.array.copy())
+			if self.is_valid(frame):
+				return frame
+
+	def wait_latest(self, after_seq=0, timeout=None, copy=False):
+		"""Block until a frame newer than after_seq is published, then read the latest one.
+
+		:raises TimeoutError: if no new frame was published in time
+		"""
+		_wait_until(lambda: self.write_seq > after_seq, timeout, self.poll_interval, f"a frame after {after_seq}")
+		return self.read_latest(copy=copy)
+
+	def reader(self, reader_no=0):
+		"""
+		:param reader_no: cursor to use, 0 <= reader_no < nof_readers, unique per consumer
+		:return: NoDropReader that starts with the next published frame
+		"""
+		if not 0 <= reader_no < self.nof_readers:
+			raise ValueError(f"reader_no {reader_no} is not within bounds 0<={reader_no}<{self.nof_readers}")
+		return NoDropReader(self, reader_no)
+
+	def close(self):
+		self.slots = None
+		self._meta = None
+		self._cursors = None
+		self._header = None
+		self.shm.close()
+		if self.owner:
+			self.shm.unlink()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
+
+
+class NoDropReader:
+	"""Reads every frame in order. The producer waits while the frame last returned by read is still in use."""
+
+	def __init__(self, ring, reader_no):
+		self.ring = ring
+		self.reader_no = reader_no
+		self.seq = ring.write_seq
+		ring._cursors[reader_no] = self.seq
+
+	def read(self, timeout=None):
+		"""Release the previously read frame and return the next one.
+
+		:raises TimeoutError: if no frame was published in time
+		:return: Frame whose array stays valid until the next call to read or close
+		"""
+		self.ring._cursors[self.reader_no] = self.seq
+		seq = self.seq + 1
+		_wait_until(lambda: self.ring.write_seq >= seq, timeout, self.ring.poll_interval, f"frame {seq}")
+		self.seq = seq
+		return self.ring._frame(seq)
+
+	def __iter__(self):
+		while True:
+			yield self.read()
+
+	def close(self):
+		self.ring._cursors[self.reader_no] = _NO_READER
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
@@ -0,0 +1,248 @@
+"""
+The purpose of this module is to read the game state shown by the HUD (bars, gauges, indicator lights) from frames.
+
+A HudReader is given the regions of interest once, with what to read from each:
+
+* bar_fill: fraction of the region's pixels that have the bar's fill color, i.e. how full a bar of that shape is.
+* dominant_color: index of the palette color closest to the mean color of the region.
+* indicator: 1.0 if the mean brightness of the region is at least a threshold, else 0.0.
+
+The pixel indices of all regions are precomputed into one flat index array, grouped by kind, so reading a frame is one
+gather and a few vectorized reductions (np.add.reduceat over the regions' contiguous segments) whatever the number of
+regions: the cost grows with the number of pixels read, not with Python work per region. The result is a float32
+state vector with one value per region, in the order the regions were given.
+
+Usage::
+
+	reader = HudReader([bar_fill('health', (20, 700, 200, 10), (200, 30, 30)),
+		indicator('ready', (900, 40, 8, 8), 180)], width, height, PixelFormat.RGB)
+	for shots in get_screenshots(window_handles):
+		state = reader.read(shots[0])
+"""
+
+import enum
+import time
+from collections import namedtuple
+
+import utils_logging
+from pixel_format import PixelFormat, frame_shape
+from region import Region, check_regions
+from utils_import import lazy_import
+
+np = lazy_import('numpy')
+
+
+class HudKind(enum.Enum):
+	BAR_FILL = 'bar_fill'
+	DOMINANT_COLOR = 'dominant_color'
+	INDICATOR = 'indicator'
+
+
+HudRoi = namedtuple('HudRoi', ['name', 'kind', 'region', 'color', 'tolerance', 'palette', 'threshold'])
+HudRoi.__doc__ = """Region of interest of a HudReader, use bar_fill, dominant_color and indicator to create them.
+
+:param name: name of the value
+:param kind: HudKind
+:param region: Region of the frame
+:param color: (r, g, b) fill color, BAR_FILL only
+:param tolerance: maximum per-channel difference from color, BAR_FILL only
+:param palette: sequence of (r, g, b), DOMINANT_COLOR only
+:param threshold: minimum mean brightness (0 to 255), INDICATOR only
+"""
+
+
+def bar_fill(name, region, color, tolerance=40):
+	return HudRoi(name, HudKind.BAR_FILL, Region(*region), tuple(color), tolerance, None, None)
+
+
+def dominant_color(name, region, palette):
+	return HudRoi(name, HudKind.DOMINANT_COLOR, Region(*region), None, None, tuple(map(tuple, palette)), None)
+
+
+def indicator(name, region, threshold=128):
+	return HudRoi(name, HudKind.INDICATOR, Region(*region), None, None, None, threshold)
+
+
+#Frame channels holding red, green and blue.
+_RGB_CHANNELS = {
+	PixelFormat.RGB: (0, 1, 2),
+	PixelFormat.BGR: (2, 1, 0),
+	PixelFormat.BGRA: (2, 1, 0),
+	PixelFormat.GRAY: (0, 0, 0),
+}
+
+#ITU-R BT.601 luma, as cv2 uses for COLOR_*2GRAY.
+_LUMA = (0.299, 0.587, 0.114)
+
+
+def _pixel_indices(region, width):
+	rows = np.arange(region.top, region.top + region.height)[:, np.newaxis]
+	columns = np.arange(region.left, region.left + region.width)[np.newaxis, :]
+	return (rows * width + columns).ravel()
+
+
+class HudReader:
+	"""Reads many HUD regions of interest from frames of one size and pixel format, see module docstring."""
+
+	@utils_logging.log_call
+	def __init__(self, rois, width, height, pixel_format=PixelFormat.RGB):
+		"""
+		:param rois: sequence of HudRoi
+		:param width: width of the frames
+		:param height: height of the frames
+		:param pixel_format: PixelFormat of the frames
+		:raises ValueError: if a region is not inside the frames, or a palette is empty
+		"""
+		self.rois = tuple(rois)
+		self.width = width
+		self.height = height
+		self.pixel_format = pixel_format
+		self.frame_shape = frame_shape(height, width, pixel_format)
+		check_regions([roi.region for roi in self.rois], width, height)
+		if any(roi.kind is HudKind.DOMINANT_COLOR and not roi.palette for roi in self.rois):
+			raise ValueError("dominant_color needs a palette")
+		self.state = np.zeros(len(self.rois), dtype=np.float32)
+		self.groups = dict()
+		pixel_indices = list()
+		offset = 0
+		for kind in HudKind:
+			roi_nos = [roi_no for roi_no, roi in enumerate(self.rois) if roi.kind is kind]
+			if not roi_nos:
+				continue
+			sizes = np.array([self.rois[roi_no].region.width * self.rois[roi_no].region.height for roi_no in roi_nos])
+			starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+			pixel_indices.extend(_pixel_indices(self.rois[roi_no].region, width) for roi_no in roi_nos)
+			self.groups[kind] = self._compile_group(kind, [self.rois[roi_no] for roi_no in roi_nos], np.array(roi_nos), sizes,
+				starts, offset)
+			offset += int(sizes.sum())
+		pixel_indices = np.concatenate(pixel_indices) if pixel_indices else np.zeros(0, dtype=np.intp)
+		#Indices into the raveled frame, channel-major: row c holds the red (c=0), green or blue values of all pixels.
+		self.indices = pixel_indices[np.newaxis, :] * pixel_format.nof_channels + np.array(
+			_RGB_CHANNELS[pixel_format])[:, np.newaxis]
+		self.pixels = np.empty(self.indices.shape, dtype='uint8')
+
+	@staticmethod
+	def _compile_group(kind, rois, roi_nos, sizes, starts, offset):
+		group = {
+			'roi_nos': roi_nos,
+			'sizes': sizes.astype(np.float32),
+			'starts': starts,
+			'pixels': slice(offset, offset + int(sizes.sum())),
+		}
+		if kind is HudKind.BAR_FILL:
+			#Per pixel and channel, so that matching is two comparisons over the whole group.
+			colors = np.array([roi.color for roi in rois], dtype=np.int16)
+			tolerances = np.array([roi.tolerance for roi in rois], dtype=np.int16)[:, np.newaxis]
+			group['lower'] = np.repeat(np.clip(colors - tolerances, 0, 255).astype('uint8').T, sizes, axis=1)
+			group['upper'] = np.repeat(np.clip(colors + tolerances, 0, 255).astype('uint8').T, sizes, axis=1)
+		elif kind is HudKind.DOMINANT_COLOR:
+			#Palettes padded to the longest one, padding is too far away to ever be closest.
+			palettes = np.full((len(rois), max(len(roi.palette) for roi in rois), 3), np.inf, dtype=np.float32)
+			for roi_no, roi in enumerate(rois):
+				palettes[roi_no, :len(roi.palette)] = roi.palette
+			group['palettes'] = palettes
+		else:
+			group['thresholds'] = np.array([roi.threshold for roi in rois], dtype=np.float32)
+		return group
+
+	@staticmethod
+	def _means(rgb, group):
+		"""
+		:return: mean (r, g, b) per region of the group, shape (nof regions, 3)
+		"""
+		return (np.add.reduceat(rgb, group['starts'], axis=1, dtype=np.float32) / group['sizes']).T
+
+	def read(self, frame, out=None):
+		"""
+		:param frame: contiguous frame of the reader's size and pixel format, e.g. from screenshot.get_screenshots
+		:param out: optional float32 array with one element per region, the reader's own state vector if None
+		:raises ValueError: if the frame has another shape
+		:return: state vector (out), one value per region in the order they were given
+		"""
+		if frame.shape != self.frame_shape:
+			raise ValueError(f"frame of shape {frame.shape} is not a {self.width}x{self.height} {self.pixel_format.value} frame")
+		out = self.state if out is None else out
+		np.take(frame.reshape(-1), self.indices, out=self.pixels)
+		for kind, group in self.groups.items():
+			rgb = self.pixels[:, group['pixels']]
+			if kind is HudKind.BAR_FILL:
+				in_range = (rgb >= group['lower']) & (rgb <= group['upper'])
+				matching = in_range[0] & in_range[1] & in_range[2]
+				out[group['roi_nos']] = np.add.reduceat(matching, group['starts'], dtype=np.float32) / group['sizes']
+			elif kind is HudKind.DOMINANT_COLOR:
+				distances = ((self._means(rgb, group)[:, np.newaxis, :] - group['palettes'])**2).sum(axis=2)
+				out[group['roi_nos']] = distances.argmin(axis=1)
+			else:
+				out[group['roi_nos']] = self._means(rgb, group) @ np.array(_LUMA, dtype=np.float32) >= group['thresholds']
+		return out
+
+	def as_dict(self, state=None):
+		"""
+		:return: dict from region name to its value in state (the last read if None)
+		"""
+		state = self.state if state is None else state
+		return {roi.name: float(value) for roi, value in zip(self.rois, state)}
+
+
+def read_reference(rois, frame, pixel_format=PixelFormat.RGB):
+	"""Straightforward per-region HudReader.read, to check and to benchmark it against.
+
+	:return: float32 state vector
+	"""
+	channels = list(_RGB_CHANNELS[pixel_format])
+	frame = frame if frame.ndim == 3 else frame[..., np.newaxis]
+	state = np.zeros(len(rois), dtype=np.float32)
+	for roi_no, roi in enumerate(rois):
+		region = roi.region
+		rgb = frame[region.top:region.top + region.height, region.left:region.left + region.width][..., channels]
+		rgb = rgb.reshape(-1, 3).astype(np.float32)
+		if roi.kind is HudKind.BAR_FILL:
+			state[roi_no] = np.mean(np.abs(rgb - roi.color).max(axis=1) <= roi.tolerance)
+		elif roi.kind is HudKind.DOMINANT_COLOR:
+			state[roi_no] = np.argmin(((rgb.mean(axis=0) - np.array(roi.palette))**2).sum(axis=1))
+		else:
+			state[roi_no] = rgb.mean(axis=0) @ np.array(_LUMA) >= roi.threshold
+	return state
+
+
+def random_rois(nof_rois, width, height, size=(24, 8), seed=0):
+	"""
+	:return: list of nof_rois HudRoi of all kinds at random positions, for tests and benchmarks
+	"""
+	rng = np.random.default_rng(seed)
+	palette = ((255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 255), (0, 0, 0))
+	rois = list()
+	for roi_no in range(nof_rois):
+		region = (int(rng.integers(0, width - size[0])), int(rng.integers(0, height - size[1]))) + size
+		kind = roi_no % 3
+		if kind == 0:
+			rois.append(bar_fill(f'bar{roi_no}', region, tuple(int(value) for value in rng.integers(0, 256, 3)), tolerance=60))
+		elif kind == 1:
+			rois.append(dominant_color(f'color{roi_no}', region, palette))
+		else:
+			rois.append(indicator(f'light{roi_no}', region, threshold=int(rng.integers(64, 192))))
+	return rois
+
+
+def benchmark(nof_rois=(10, 100, 500), width=1280, height=720, nof_reads=50):
+	"""Microseconds per read of HudReader and of read_reference, by number of regions.
+
+	:return: dict from (implementation, number of regions) to microseconds per read
+	"""
+	frame = np.random.default_rng(1).integers(0, 256, (height, width, 3), dtype='uint8')
+	result = dict()
+	for nof in nof_rois:
+		rois = random_rois(nof, width, height)
+		reader = HudReader(rois, width, height)
+		for name, read in (('vectorized', reader.read), ('reference', lambda frame: read_reference(rois, frame))):
+			read(frame)
+			start = time.perf_counter()
+			for _ in range(nof_reads):
+				read(frame)
+			result[(name, nof)] = (time.perf_counter() - start) / nof_reads * 1e6
+	return result
+
+
+if __name__ == '__main__':
+	for (name, nof), microseconds in benchmark().items():
+		print(f'{name} {nof} regions: {microseconds:.0f} us/read')
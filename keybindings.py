@@ -0,0 +1,227 @@
+"""
+The purpose of this module is to store keybindings as data and to play them back on a timeline.
+
+A Binding is a (control type, index, value) triple, e.g. (BUTTON, 3, True). A table of named bindings is saved and
+loaded as JSON and compiled into callables that write directly to a device (a VJoyDevice, or an OutputCoalescer in
+front of one). A Playback plays timelines of bindings, e.g. macros, on a background thread.
+"""
+
+import enum
+import functools
+import json
+import logging
+import pathlib
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+import utils_logging
+from timing import LatenessHistogram, sleep_until
+from wrap_vjoy import VJDHIDUsage, VJoyDevice
+
+
+class ControlType(enum.Enum):
+	AXIS = 'axis'
+	BUTTON = 'button'
+	DISCRETE_HAT = 'discrete_hat'
+	CONTINUOUS_HAT = 'continuous_hat'
+
+
+Binding = namedtuple('Binding', ['control', 'index', 'value'])
+Binding.__doc__ = """One control set to one value.
+
+:param control: ControlType
+:param index: VJDHIDUsage of an axis, or number of a button or hat (starting at 1)
+:param value: axis value, bool for buttons, VJoyDevice.DiscreteHatDirection or continuous hat value (-1 to 35999)
+"""
+
+Step = namedtuple('Step', ['time', 'binding'])
+Step.__doc__ = """
+:param time: seconds from the start of the timeline
+:param binding: Binding, or name of a binding in the Playback's table
+"""
+
+
+def to_json_value(binding):
+	"""
+	:return: [control, index, value] with JSON types
+	"""
+	value = binding.value.value if isinstance(binding.value, enum.Enum) else binding.value
+	return [binding.control.value, int(binding.index), value]
+
+
+def from_json_value(value):
+	"""
+	:return: Binding of a to_json_value result
+	"""
+	control, index, value = value
+	control = ControlType(control)
+	if control is ControlType.AXIS:
+		return Binding(control, VJDHIDUsage(index), int(value))
+	if control is ControlType.BUTTON:
+		return Binding(control, int(index), bool(value))
+	if control is ControlType.DISCRETE_HAT:
+		return Binding(control, int(index), VJoyDevice.DiscreteHatDirection(value))
+	return Binding(control, int(index), int(value))
+
+
+@utils_logging.log_call
+def save_bindings(bindings, path):
+	"""
+	:param bindings: dict from name to Binding
+	:param path: JSON file to write
+	"""
+	pathlib.Path(path).write_text(json.dumps({name: to_json_value(binding) for name, binding in bindings.items()}, indent='\t'))
+
+
+@utils_logging.log_call
+def load_bindings(path):
+	"""
+	:param path: JSON file written by save_bindings
+	:return: dict from name to Binding
+	"""
+	return {name: from_json_value(value) for name, value in json.loads(pathlib.Path(path).read_text()).items()}
+
+
+def compile_binding(binding, device):
+	"""
+	:param binding: Binding
+	:param device: entered VJoyDevice, or anything with the same setters
+	:return: callable without arguments that applies binding to device
+	"""
+	if binding.control is ControlType.AXIS:
+		return functools.partial(device.set_axis, binding.index, binding.value)
+	if binding.control is ControlType.BUTTON:
+		return functools.partial(device.set_button, binding.index, binding.value)
+	if binding.control is ControlType.DISCRETE_HAT:
+		return functools.partial(device.set_discrete_hat, binding.index, binding.value)
+	if binding.control is ControlType.CONTINUOUS_HAT:
+		return functools.partial(device.set_continuous_hat, binding.index, binding.value)
+	raise ValueError(f"unknown control type {binding.control!r}")
+
+
+def compile_bindings(bindings, device):
+	"""
+	:param bindings: dict from name to Binding
+	:return: dict from name to compile_binding result
+	"""
+	return {name: compile_binding(binding, device) for name, binding in bindings.items()}
+
+
+def repeat(steps, nof_times, period):
+	"""
+	:param steps: timeline, sequence of Step
+	:param nof_times: number of times to play the timeline
+	:param period: seconds between the starts of the repetitions
+	:return: list of Step with the timeline repeated nof_times
+	"""
+	return [Step(repetition_no * period + step.time, step.binding) for repetition_no in range(nof_times) for step in steps]
+
+
+def tap(binding, release, duration=0.05):
+	"""
+	:return: timeline applying binding, then release (a Binding or name) duration seconds later
+	"""
+	return [Step(0.0, binding), Step(duration, release)]
+
+
+class PlaybackStopped(Exception):
+	"""A timeline was not played to the end since its Playback was stopped."""
+
+
+class Playback:
+	"""Plays timelines of bindings on a background thread, one timeline at a time in the order they were given.
+
+	Usage::
+
+		with Playback(device, load_bindings('keybindings.json')) as playback:
+			done = playback.play(tap('fire', 'fire released'))
+			...
+			done.result()
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, device, bindings=None):
+		"""
+		:param device: entered VJoyDevice, or anything with the same setters
+		:param bindings: dict from name to Binding, for timelines that refer to bindings by name
+		"""
+		self.device = device
+		self.compiled = compile_bindings(bindings or dict(), device)
+		self.timelines = queue.Queue()
+		self.stopping = threading.Event()
+		self.thread = None
+		self.nof_steps = 0
+		self.lateness = LatenessHistogram()
+
+	def _compile_step(self, step):
+		time_offset, binding = step
+		return float(time_offset), self.compiled[binding] if isinstance(binding, str) else compile_binding(binding, self.device)
+
+	def play(self, steps):
+		"""Play a timeline without waiting for it.
+
+		:param steps: sequence of Step (or (time, binding) pairs)
+		:raises KeyError: if a binding name is not in the table
+		:return: concurrent.futures.Future that is done when the last step has been applied
+		"""
+		timeline = sorted((self._compile_step(step) for step in steps), key=lambda step: step[0])
+		future = Future()
+		if self.thread is None:
+			self.stopping.clear()
+			self.thread = threading.Thread(target=self._run, name='Playback', daemon=True)
+			self.thread.start()
+		self.timelines.put((timeline, future))
+		return future
+
+	def _play_timeline(self, timeline):
+		start_ns = time.perf_counter_ns()
+		for time_offset, apply in timeline:
+			lateness_ns = sleep_until(start_ns + int(time_offset * 1e9), event=self.stopping)
+			if lateness_ns is None or self.stopping.is_set():
+				raise PlaybackStopped()
+			apply()
+			self.nof_steps += 1
+			self.lateness.add(lateness_ns)
+
+	def _run(self):
+		while True:
+			item = self.timelines.get()
+			if item is None:
+				return
+			timeline, future = item
+			if not future.set_running_or_notify_cancel():
+				continue
+			try:
+				self._play_timeline(timeline)
+				future.set_result(None)
+			except BaseException as exception:
+				if not isinstance(exception, PlaybackStopped):
+					logging.error(f'playback failed: {exception!r}')
+				future.set_exception(exception)
+
+	@utils_logging.log_call
+	def stop(self):
+		"""Stop playing, the timeline being played and those not started yet fail with PlaybackStopped."""
+		if self.thread is None:
+			return
+		self.stopping.set()
+		while True:
+			try:
+				item = self.timelines.get_nowait()
+			except queue.Empty:
+				break
+			if item is not None and item[1].set_running_or_notify_cancel():
+				item[1].set_exception(PlaybackStopped())
+		self.timelines.put(None)
+		self.thread.join()
+		self.thread = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.stop()
+		return False
@@ -0,0 +1,256 @@
+"""
+The purpose of this module is to count and time what happens per frame, cheaply enough to leave on in production.
+
+Counters, gauges and latency histograms are registered by name in a Registry (module functions use REGISTRY).
+Histograms have fixed logarithmic buckets (several per power of two, like HDR histograms), so recording is a bisect
+and two additions, and percentiles are accurate to within a bucket. A snapshot of all metrics is available from code,
+and a PeriodicDumper writes snapshots to the log or to a JSON lines file.
+
+Usage::
+
+	READ_SECONDS = metrics.histogram('capture.read_seconds')
+	with READ_SECONDS.time():
+		...
+	metrics.snapshot()['capture.read_seconds']['p99']
+"""
+
+import bisect
+import contextlib
+import json
+import logging
+import pathlib
+import threading
+import time
+
+import utils_logging
+
+
+def log_buckets(lowest=1e-6, highest=100.0, per_octave=4):
+	"""
+	:return: tuple of bucket upper edges from lowest to at least highest, per_octave per power of two
+	"""
+	edges = list()
+	edge_no = 0
+	while not edges or edges[-1] < highest:
+		edges.append(lowest * 2**(edge_no / per_octave))
+		edge_no += 1
+	return tuple(edges)
+
+
+DEFAULT_BUCKETS = log_buckets()
+
+
+class Counter:
+	"""Monotonically increasing count. Increments are not locked, concurrent increments may very rarely be lost."""
+
+	def __init__(self, name):
+		self.name = name
+		self.value = 0
+
+	def inc(self, amount=1):
+		self.value += amount
+
+	def snapshot(self):
+		return self.value
+
+	def reset(self):
+		self.value = 0
+
+
+class Gauge:
+	"""Last set value, e.g. a queue length or a frame rate."""
+
+	def __init__(self, name):
+		self.name = name
+		self.value = 0
+
+	def set(self, value):
+		self.value = value
+
+	def snapshot(self):
+		return self.value
+
+	def reset(self):
+		self.value = 0
+
+
+class Histogram:
+	"""Distribution of values (seconds for latencies) in fixed buckets."""
+
+	def __init__(self, name, buckets=DEFAULT_BUCKETS):
+		"""
+		:param name: name of the histogram
+		:param buckets: sorted bucket upper edges, values above the last edge go in an overflow bucket
+		"""
+		self.name = name
+		self.buckets = tuple(buckets)
+		self.reset()
+
+	def reset(self):
+		self.counts = [0] * (len(self.buckets) + 1)
+		self.count = 0
+		self.total = 0.0
+		self.min = None
+		self.max = None
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.total += value
+		if self.max is None or value > self.max:
+			self.max = value
+		if self.min is None or value < self.min:
+			self.min = value
+
+	@contextlib.contextmanager
+	def time(self):
+		"""Observe the seconds the with-block takes."""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - start)
+
+	def percentile(self, percentile):
+		"""
+		:param percentile: 0 to 100
+		:return: upper edge of the bucket the percentile falls in, clamped to the observed min and max, None if empty
+		"""
+		if not self.count:
+			return None
+		rank = max(1, percentile / 100 * self.count)
+		cumulative = 0
+		for bucket_no, count in enumerate(self.counts):
+			cumulative += count
+			if cumulative >= rank:
+				edge = self.buckets[bucket_no] if bucket_no < len(self.buckets) else self.max
+				return min(max(edge, self.min), self.max)
+		return self.max
+
+	def snapshot(self):
+		return {
+			'count': self.count,
+			'mean': self.total / self.count if self.count else None,
+			'min': self.min,
+			'p50': self.percentile(50),
+			'p90': self.percentile(90),
+			'p99': self.percentile(99),
+			'max': self.max,
+		}
+
+
+class Registry:
+	"""Metrics by name, a metric is created on first use and shared by everyone asking for the same name."""
+
+	def __init__(self):
+		self.metrics = dict()
+		self.lock = threading.Lock()
+
+	def _get(self, metric_type, name, *args):
+		metric = self.metrics.get(name)
+		if metric is None:
+			with self.lock:
+				metric = self.metrics.setdefault(name, metric_type(name, *args))
+		if not isinstance(metric, metric_type):
+			raise TypeError(f"metric {name} is a {type(metric).__name__}, not a {metric_type.__name__}")
+		return metric
+
+	def counter(self, name):
+		return self._get(Counter, name)
+
+	def gauge(self, name):
+		return self._get(Gauge, name)
+
+	def histogram(self, name, buckets=DEFAULT_BUCKETS):
+		return self._get(Histogram, name, buckets)
+
+	def snapshot(self):
+		"""
+		:return: dict from name to value (counters and gauges) or to dict of statistics (histograms)
+		"""
+		with self.lock:
+			metrics = list(self.metrics.values())
+		return {metric.name: metric.snapshot() for metric in sorted(metrics, key=lambda metric: metric.name)}
+
+	def reset(self):
+		with self.lock:
+			for metric in self.metrics.values():
+				metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def counter(name):
+	return REGISTRY.counter(name)
+
+
+def gauge(name):
+	return REGISTRY.gauge(name)
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS):
+	return REGISTRY.histogram(name, buckets)
+
+
+def snapshot():
+	return REGISTRY.snapshot()
+
+
+class PeriodicDumper:
+	"""Writes a snapshot of a registry every interval seconds, as a JSON line to a file or as an INFO log record.
+
+	Usage::
+
+		with metrics.PeriodicDumper(interval=10, path='metrics.jsonl'):
+			...
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, registry=REGISTRY, interval=10.0, path=None):
+		"""
+		:param registry: Registry to dump
+		:param interval: seconds between snapshots
+		:param path: JSON lines file to append snapshots to, logged if None
+		"""
+		self.registry = registry
+		self.interval = interval
+		self.path = pathlib.Path(path) if path else None
+		self.stopping = threading.Event()
+		self.thread = None
+
+	def dump(self):
+		record = {'time': time.time(), 'metrics': self.registry.snapshot()}
+		if self.path is None:
+			logging.info(f'metrics: {json.dumps(record)}')
+		else:
+			with open(self.path, 'a') as metrics_file:
+				metrics_file.write(json.dumps(record) + '\n')
+
+	def _run(self):
+		while not self.stopping.wait(self.interval):
+			self.dump()
+
+	@utils_logging.log_call
+	def start(self):
+		self.stopping.clear()
+		self.thread = threading.Thread(target=self._run, name='PeriodicDumper', daemon=True)
+		self.thread.start()
+		return self
+
+	@utils_logging.log_call
+	def stop(self):
+		"""Stop dumping periodically, and dump a last snapshot."""
+		if self.thread is None:
+			return
+		self.stopping.set()
+		self.thread.join()
+		self.thread = None
+		self.dump()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_args):
+		self.stop()
+		return False
@@ -1,21 +1,229 @@
-from multiprocessing import Process, Queue
+import itertools
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import Process, Queue, Value
+
+_RETIRED = None
+_IDLE = -1
+
+
+class WorkerDied(RuntimeError):
+	"""The worker process running a call exited before returning its result."""
+
+
+def _picklable(exception):
+	try:
+		pickle.dumps(exception)
+		return exception
+	except Exception:
+		return RuntimeError(repr(exception))
+
+
+def _worker(function, tasks, results, max_tasks, running):
+	"""Run tasks until told to stop (a None task) or until max_tasks tasks are done, then announce retirement.
+
+	The call id of the task being run is written to running (shared memory, unlike the queue it survives this process
+	dying abruptly), so that its call can be failed if this process dies. Results are pickled here: a result that
+	cannot be pickled fails its call instead of being lost in the queue's feeder thread.
+	"""
+	nof_tasks = 0
+	while max_tasks is None or nof_tasks < max_tasks:
+		task = tasks.get()
+		if task is None:
+			break
+		call_id, args, kwargs = task
+		running.value = call_id
+		try:
+			result = pickle.dumps(function(*args, **kwargs))
+		except BaseException as exception:
+			results.put((call_id, False, _picklable(exception)))
+		else:
+			results.put((call_id, True, result))
+		nof_tasks += 1
+	results.put((_RETIRED, os.getpid(), None))
 
 
 class Call:
-	def __init__(self, function):
+	"""Call a function in other processes.
+
+	With nof_workers=0 every call runs in a process of its own. With nof_workers>0 a pool of warm processes is kept
+	and reused; a worker is recycled (replaced by a fresh process) after max_tasks_per_worker calls.
+	Results are tagged with a call id, so concurrent calls on the same instance never get each other's results.
+
+	Usage::
+
+		with Call(function, nof_workers=4) as call:
+			future = call.submit(*args)
+			result = call(*args)
+			result = future.result()
+	"""
+
+	def __init__(self, function, nof_workers=0, max_tasks_per_worker=None, poll_interval=0.5):
+		"""
+		:param function: picklable function to call
+		:param nof_workers: number of pooled worker processes, 0 to spawn a process per call
+		:param max_tasks_per_worker: recycle a pooled worker after this many calls, never if None
+		:param poll_interval: seconds between checks for workers that died without retiring
+		"""
 		assert function
-		self.queue = Queue()
 		self.function = function
+		self.nof_workers = nof_workers
+		self.max_tasks_per_worker = max_tasks_per_worker if nof_workers else 1
+		self.poll_interval = poll_interval
+		self.tasks = Queue()
+		self.results = Queue()
+		self.futures = dict()
+		self.workers = dict()
+		self.running = dict()
+		self.call_ids = itertools.count()
+		self.lock = threading.Lock()
+		self.collector = None
+		self.shutting_down = False
+		self.stopping = False
+		for _ in range(nof_workers):
+			self._start_worker()
 
-	@staticmethod
-	def _wrap_function(func, queue, args, kwargs):
-		queue.put(func(*args, **kwargs))
+	def _start_worker(self):
+		running = Value('q', _IDLE, lock=False)
+		worker = Process(target=_worker, args=[self.function, self.tasks, self.results, self.max_tasks_per_worker, running])
+		worker.start()
+		self.workers[worker.pid] = worker
+		self.running[worker.pid] = running
+
+	def _retire_worker(self, pid):
+		worker = self.workers.pop(pid, None)
+		self.running.pop(pid, None)
+		if worker is None:
+			return
+		worker.join()
+		#While shutting down, recycled workers are replaced until the submitted calls are done.
+		if self.nof_workers and not self.stopping:
+			self._start_worker()
+
+	def _stop_if_done(self):
+		"""Once shutting down and no call is pending any more, tell every worker to stop."""
+		if self.shutting_down and not self.stopping and not self.futures:
+			self.stopping = True
+			for _ in range(len(self.workers)):
+				self.tasks.put(None)
+
+	def _fail_call_of(self, pid, exitcode):
+		"""Fail the call a dead worker was running, unless its result arrived."""
+		running = self.running.get(pid)
+		future = self.futures.pop(running.value, None) if running is not None else None
+		if future is not None:
+			future.set_exception(WorkerDied(f"worker process {pid} died (exit code {exitcode}) before returning a result"))
+		self._stop_if_done()
+
+	def _stopped(self):
+		"""True once shut down and all workers are gone, calls still pending then were lost with a dead worker."""
+		if not (self.shutting_down and not self.workers):
+			return False
+		for future in self.futures.values():
+			future.set_exception(WorkerDied("worker process died before returning a result"))
+		self.futures.clear()
+		return True
+
+	def _handle(self, message):
+		"""
+		:return: True if the collector should stop
+		"""
+		call_id, ok, value = message
+		with self.lock:
+			if call_id is _RETIRED:
+				self._retire_worker(ok)
+				return self._stopped()
+			future = self.futures.pop(call_id, None)
+			self._stop_if_done()
+		if future is None:
+			#Failed already, its worker was found dead before the result was read.
+			return False
+		if not ok:
+			future.set_exception(value)
+			return False
+		try:
+			result = pickle.loads(value)
+		except Exception as exception:
+			future.set_exception(exception)
+		else:
+			future.set_result(result)
+		return False
+
+	def _collect(self):
+		while True:
+			try:
+				message = self.results.get(timeout=self.poll_interval)
+			except queue.Empty:
+				with self.lock:
+					dead = [(pid, worker.exitcode) for pid, worker in self.workers.items() if not worker.is_alive()]
+				if dead:
+					#Whatever a worker sent before exiting is in the queue already, handle it before failing its calls.
+					while True:
+						try:
+							message = self.results.get_nowait()
+						except queue.Empty:
+							break
+						if self._handle(message):
+							return
+					with self.lock:
+						for pid, exitcode in dead:
+							self._fail_call_of(pid, exitcode)
+							self._retire_worker(pid)
+				with self.lock:
+					if self._stopped():
+						return
+				continue
+			if self._handle(message):
+				return
+
+	def submit(self, *args, **kwargs):
+		"""Schedule a call without waiting for it.
+
+		:return: concurrent.futures.Future of the function's return value
+		"""
+		future = Future()
+		future.set_running_or_notify_cancel()
+		with self.lock:
+			if self.shutting_down:
+				raise RuntimeError("cannot submit after shutdown")
+			call_id = next(self.call_ids)
+			self.futures[call_id] = future
+			if not self.nof_workers:
+				self._start_worker()
+			if self.collector is None:
+				self.collector = threading.Thread(target=self._collect, name=f'Call({getattr(self.function, "__name__", "function")})', daemon=True)
+				self.collector.start()
+			#Under the lock, so that a concurrent shutdown cannot put its stop sentinels before this task.
+			self.tasks.put((call_id, args, kwargs))
+		return future
 
 	def __call__(self, *args, **kwargs):
-		p = Process(
-		    target=self._wrap_function,
-		    args=[self.function, self.queue, args, kwargs])
-		p.start()
-		ret = self.queue.get()
-		p.join()
-		return ret
+		return self.submit(*args, **kwargs).result()
+
+	def shutdown(self, wait=True):
+		"""Stop the workers once the already submitted calls are done.
+
+		:param wait: block until all workers have exited
+		"""
+		with self.lock:
+			if self.shutting_down:
+				return
+			self.shutting_down = True
+			self._stop_if_done()
+			collector = self.collector
+		if collector is None:
+			for worker in self.workers.values():
+				worker.join()
+			self.workers.clear()
+		elif wait:
+			collector.join()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_args):
+		self.shutdown()
+		return False
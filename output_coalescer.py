@@ -0,0 +1,173 @@
+"""
+The purpose of this module is to send joystick output at a fixed report rate instead of once per change.
+
+An OutputCoalescer stands in front of an entered VJoyDevice and has the same setters. Changes are collected in a
+pending VJoyState; a change of a control that already changed since the last flush replaces it (coalesced), a change
+to the value the control already has is dropped. A background thread commits the pending state with one UpdateVJD call
+per report period, e.g. at 125, 250 or 1000 Hz, and only if something changed.
+"""
+
+import logging
+import threading
+
+import utils_logging
+from timing import DEFAULT_SPIN_NS, PeriodicTicker
+from wrap_vjoy import VJoyState
+
+
+class OutputCoalescer:
+	"""Fixed-rate, coalescing writer to a VJoyDevice.
+
+	Usage::
+
+		with VJoyDevice() as device, OutputCoalescer(device, rate=250) as output:
+			output.set_axis(VJDHIDUsage.HID_USAGE_X, 0x4000)
+			output.set_button(1, True)
+			logging.info(output.statistics())
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, device, rate=250, spin_ns=DEFAULT_SPIN_NS):
+		"""
+		:param device: entered VJoyDevice (or anything with capabilities, state and commit(state))
+		:param rate: flushes per second
+		:param spin_ns: nanoseconds of each report period that are spun instead of slept, see timing.sleep_until
+		"""
+		self.device = device
+		self.capabilities = device.capabilities
+		self.rate = rate
+		self.period = 1.0 / rate
+		self.lock = threading.Lock()
+		self.pending = device.state.copy()
+		self.pending.capabilities = self.capabilities
+		self.dirty = set()
+		self.nof_writes = 0
+		self.nof_coalesced = 0
+		self.nof_dropped = 0
+		self.nof_flushes = 0
+		self.nof_commits = 0
+		self.ticker = PeriodicTicker(self.period, spin_ns)
+		self.running = threading.Event()
+		self.thread = None
+		self.exception = None
+
+	def _write(self, control, current, set_value, value):
+		with self.lock:
+			self.nof_writes += 1
+			if current == value:
+				self.nof_dropped += 1
+				return
+			set_value(value)
+			if control in self.dirty:
+				self.nof_coalesced += 1
+			else:
+				self.dirty.add(control)
+
+	def set_axis(self, axis, value):
+		self._write(('axis', axis), self.pending.axes.get(axis), lambda value: self.pending.set_axis(axis, value), value)
+
+	def set_button(self, button_no, value: bool):
+		self._write(('button', button_no), self.pending.get_button(button_no),
+			lambda value: self.pending.set_button(button_no, value), bool(value))
+
+	def set_discrete_hat(self, hat_no, value):
+		self._write(('discrete_hat', hat_no), self.pending.discrete_hats.get(hat_no),
+			lambda value: self.pending.set_discrete_hat(hat_no, value), value)
+
+	def set_continuous_hat(self, hat_no, value):
+		self._write(('continuous_hat', hat_no), self.pending.continuous_hats.get(hat_no),
+			lambda value: self.pending.set_continuous_hat(hat_no, value), value)
+
+	def reset(self):
+		neutral = VJoyState.neutral(self.capabilities)
+		with self.lock:
+			self.pending = neutral
+			self.dirty.add('reset')
+
+	def reset_buttons(self):
+		with self.lock:
+			self.pending.buttons = 0
+			self.dirty.add('reset')
+
+	def reset_hats(self):
+		neutral = VJoyState.neutral(self.capabilities)
+		with self.lock:
+			self.pending.discrete_hats = neutral.discrete_hats
+			self.pending.continuous_hats = neutral.continuous_hats
+			self.dirty.add('reset')
+
+	def flush(self):
+		"""Commit the pending state now if it differs from what the device has.
+
+		:return: True if the device was written to
+		"""
+		with self.lock:
+			self.nof_flushes += 1
+			if not self.dirty:
+				return False
+			self.dirty.clear()
+			if self.pending == self.device.state:
+				return False
+			state = self.pending.copy()
+		self.device.commit(state)
+		self.nof_commits += 1
+		return True
+
+	def _run(self):
+		try:
+			#Whole missed periods are skipped instead of flushed in a burst to catch up.
+			self.ticker.start()
+			while self.running.is_set():
+				self.ticker.wait()
+				self.flush()
+		except Exception as exception:
+			logging.error(f'output coalescer failed: {exception!r}')
+			self.exception = exception
+			self.running.clear()
+
+	@utils_logging.log_call
+	def start(self):
+		self.running.set()
+		self.thread = threading.Thread(target=self._run, name='OutputCoalescer', daemon=True)
+		self.thread.start()
+		return self
+
+	@utils_logging.log_call
+	def stop(self):
+		"""Stop flushing periodically and flush what is still pending.
+
+		:raises Exception: the exception that made the flush thread fail, if any
+		"""
+		self.running.clear()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+		if self.exception is not None:
+			raise self.exception
+		self.flush()
+
+	def statistics(self):
+		"""
+		:return: counts of writes, of writes replaced before being flushed (coalesced), of writes that changed nothing
+			(dropped), of flushes and of the flushes that wrote to the device (commits), of report periods without a
+			flush (missed), and flush jitter in seconds
+		"""
+		return {
+			'rate': self.rate,
+			'writes': self.nof_writes,
+			'coalesced': self.nof_coalesced,
+			'dropped': self.nof_dropped,
+			'flushes': self.nof_flushes,
+			'commits': self.nof_commits,
+			'missed': self.ticker.nof_missed,
+			'jitter_mean': self.ticker.lateness.mean_ns / 1e9,
+			'jitter_p99': self.ticker.lateness.percentile_ns(99) / 1e9,
+			'jitter_max': self.ticker.lateness.max_ns / 1e9,
+		}
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_args):
+		self.stop()
+		return False
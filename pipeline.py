@@ -0,0 +1,224 @@
+"""
+The purpose of this module is to run capture -> decide -> actuate as a concurrent loop.
+
+Every stage runs on a thread of its own. Stages are connected by LatestSlots, single item queues where a new item
+replaces an unconsumed one ("latest frame wins"), so a slow decision stage skips frames instead of building up
+latency. Frames that are older than the latency budget when the decision stage gets to them are dropped.
+"""
+
+import logging
+import threading
+import time
+
+import metrics
+import utils_logging
+
+_STALE = metrics.counter('pipeline.stale')
+_OVER_BUDGET = metrics.counter('pipeline.over_budget')
+
+
+class LatestSlot:
+	"""Thread-safe single item queue, put replaces an item that has not been taken yet."""
+
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.item = None
+		self.full = False
+		self.closed = False
+		self.nof_replaced = 0
+
+	def put(self, item):
+		with self.condition:
+			if self.full:
+				self.nof_replaced += 1
+			self.item = item
+			self.full = True
+			self.condition.notify()
+
+	def get(self, timeout=None):
+		"""
+		:return: the item, or None if the slot was closed (or the timeout passed) while empty
+		"""
+		with self.condition:
+			if not self.condition.wait_for(lambda: self.full or self.closed, timeout):
+				return None
+			if not self.full:
+				return None
+			item = self.item
+			self.item = None
+			self.full = False
+			return item
+
+	def close(self):
+		with self.condition:
+			self.closed = True
+			self.condition.notify_all()
+
+
+class StageStatistics:
+	"""Timing of one pipeline stage, in seconds."""
+
+	def __init__(self, name=None):
+		"""
+		:param name: if given, durations are also observed by the metrics histogram pipeline.<name>_seconds
+		"""
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.last = 0.0
+		self.histogram = metrics.histogram(f'pipeline.{name}_seconds') if name else None
+
+	def add(self, duration):
+		if self.histogram is not None:
+			self.histogram.observe(duration)
+		self.count += 1
+		self.total += duration
+		self.last = duration
+		if duration > self.max:
+			self.max = duration
+
+	def as_dict(self):
+		return {
+			'count': self.count,
+			'mean': self.total / self.count if self.count else 0.0,
+			'max': self.max,
+			'last': self.last,
+		}
+
+
+class Pipeline:
+	"""Concurrent capture -> decide -> actuate loop.
+
+	Usage::
+
+		with CaptureSession(handles, fps=60) as session, VJoyDevice() as device:
+			with Pipeline(session.read, decide, device, latency_budget=0.05) as pipeline:
+				...
+			logging.info(pipeline.statistics())
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, capture, decide, device, latency_budget=0.05, actuate=None):
+		"""
+		:param capture: callable returning the next frames, e.g. CaptureSession.read
+		:param decide: callable taking frames and returning an action, or None for no action
+		:param device: output device, e.g. an entered VJoyDevice
+		:param latency_budget: seconds from capture to actuation, older frames are dropped before deciding
+		:param actuate: callable taking device and action, defaults to calling action(device)
+		"""
+		self.capture = capture
+		self.decide = decide
+		self.device = device
+		self.latency_budget = latency_budget
+		self.actuate = actuate if actuate is not None else lambda device, action: action(device)
+		self.frames = LatestSlot()
+		self.actions = LatestSlot()
+		self.stages = {name: StageStatistics(name) for name in ('capture', 'decide', 'actuate', 'end_to_end')}
+		self.nof_stale = 0
+		self.nof_over_budget = 0
+		self.running = threading.Event()
+		self.threads = list()
+		self.exception = None
+
+	def _run_stage(self, name, step):
+		try:
+			while self.running.is_set():
+				step()
+		except Exception as exception:
+			logging.error(f'pipeline stage {name} failed: {exception!r}')
+			if self.exception is None:
+				self.exception = exception
+			self.running.clear()
+		finally:
+			self.frames.close()
+			self.actions.close()
+
+	def _capture_step(self):
+		start = time.perf_counter()
+		frames = self.capture()
+		end = time.perf_counter()
+		self.stages['capture'].add(end - start)
+		self.frames.put((end, frames))
+
+	def _decide_step(self):
+		item = self.frames.get()
+		if item is None:
+			return
+		captured, frames = item
+		start = time.perf_counter()
+		if start - captured > self.latency_budget:
+			self.nof_stale += 1
+			_STALE.inc()
+			return
+		action = self.decide(frames)
+		self.stages['decide'].add(time.perf_counter() - start)
+		if action is not None:
+			self.actions.put((captured, action))
+
+	def _actuate_step(self):
+		item = self.actions.get()
+		if item is None:
+			return
+		captured, action = item
+		start = time.perf_counter()
+		self.actuate(self.device, action)
+		end = time.perf_counter()
+		self.stages['actuate'].add(end - start)
+		self.stages['end_to_end'].add(end - captured)
+		if end - captured > self.latency_budget:
+			self.nof_over_budget += 1
+			_OVER_BUDGET.inc()
+
+	@utils_logging.log_call
+	def start(self):
+		self.running.set()
+		self.threads = [
+			threading.Thread(target=self._run_stage, args=(name, step), name=f'pipeline-{name}', daemon=True)
+			for name, step in (('capture', self._capture_step), ('decide', self._decide_step), ('actuate', self._actuate_step))
+		]
+		for thread in self.threads:
+			thread.start()
+		return self
+
+	@utils_logging.log_call
+	def stop(self):
+		"""Stop all stages.
+
+		:raises Exception: the exception that made a stage fail, if any
+		"""
+		self.running.clear()
+		self.frames.close()
+		self.actions.close()
+		for thread in self.threads:
+			thread.join()
+		if self.exception is not None:
+			raise self.exception
+
+	def run(self, duration):
+		"""Run for duration seconds, or until a stage fails."""
+		self.start()
+		deadline = time.perf_counter() + duration
+		while self.running.is_set() and time.perf_counter() < deadline:
+			time.sleep(min(0.01, max(0.0, deadline - time.perf_counter())))
+		self.stop()
+
+	def statistics(self):
+		"""
+		:return: per stage timing, and counts of frames (and actions) dropped because a newer one arrived (replaced),
+			of frames that were too old to decide on (stale) and of actions actuated outside the latency budget (over_budget)
+		"""
+		return {
+			'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+			'replaced': self.frames.nof_replaced,
+			'replaced_actions': self.actions.nof_replaced,
+			'stale': self.nof_stale,
+			'over_budget': self.nof_over_budget,
+			'latency_budget': self.latency_budget,
+		}
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc_args):
+		self.stop()
+		return False
@@ -0,0 +1,113 @@
+"""
+The purpose of this module is to convert captured frames to the pixel format a consumer asks for.
+
+Both mss and GDI deliver frames as BGRA (for GDI the alpha byte is unused), so BGRA is the native format: asking for
+it costs no conversion at all, every other format costs exactly one.
+"""
+
+import enum
+
+from utils_import import lazy_import
+
+np = lazy_import('numpy')
+cv2 = lazy_import('cv2')
+
+
+class PixelFormat(enum.Enum):
+	BGRA = 'BGRA'
+	BGR = 'BGR'
+	RGB = 'RGB'
+	GRAY = 'GRAY'
+
+	@property
+	def nof_channels(self):
+		return len(self.value) if self is not PixelFormat.GRAY else 1
+
+
+#Names of the cv2 conversion codes, looked up on use so importing this module does not load cv2.
+_FROM_BGRA = {
+	PixelFormat.BGR: 'COLOR_BGRA2BGR',
+	PixelFormat.RGB: 'COLOR_BGRA2RGB',
+	PixelFormat.GRAY: 'COLOR_BGRA2GRAY',
+}
+
+
+def frame_shape(height, width, pixel_format):
+	"""
+	:return: shape of a frame with the given size in the given pixel format, e.g. to preallocate ``out`` arrays.
+	"""
+	if pixel_format is PixelFormat.GRAY:
+		return (height, width)
+	return (height, width, pixel_format.nof_channels)
+
+
+def allocate_frame(height, width, pixel_format):
+	return np.empty(frame_shape(height, width, pixel_format), dtype='uint8')
+
+
+def check_out(out, height, width, pixel_format):
+	"""
+	:raises ValueError: if out cannot hold a contiguous frame of the given size and pixel format.
+	"""
+	expected_shape = frame_shape(height, width, pixel_format)
+	if out.shape != expected_shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+		raise ValueError(
+			f"out must be a contiguous uint8 array of shape {expected_shape}, got {out.dtype} {out.shape} (contiguous={out.flags.c_contiguous})"
+		)
+
+
+def convert_bgra(bgra, pixel_format=PixelFormat.RGB, out=None):
+	"""Convert a HxWx4 BGRA frame with at most one conversion.
+
+	:param bgra: frame in the native BGRA layout
+	:param pixel_format: requested PixelFormat
+	:param out: optional preallocated array (see frame_shape) that receives the result
+	:return: contiguous frame in the requested pixel format (out if given)
+	"""
+	height, width = bgra.shape[:2]
+	if out is not None:
+		check_out(out, height, width, pixel_format)
+	if pixel_format is PixelFormat.BGRA:
+		if out is None:
+			return np.ascontiguousarray(bgra)
+		if out is not bgra:
+			np.copyto(out, bgra)
+		return out
+	if out is None:
+		return cv2.cvtColor(bgra, getattr(cv2, _FROM_BGRA[pixel_format]))
+	return cv2.cvtColor(bgra, getattr(cv2, _FROM_BGRA[pixel_format]), dst=out)
+
+
+def convert(frame, from_format, to_format, out=None):
+	"""Convert a frame between any two pixel formats with at most one conversion, see convert_bgra.
+
+	:param frame: frame in from_format
+	:param from_format: PixelFormat of frame
+	:param to_format: requested PixelFormat
+	:param out: optional preallocated array (see frame_shape) that receives the result
+	:return: contiguous frame in to_format (out if given)
+	"""
+	if from_format is PixelFormat.BGRA:
+		return convert_bgra(frame, to_format, out=out)
+	height, width = frame.shape[:2]
+	if out is not None:
+		check_out(out, height, width, to_format)
+	if from_format is to_format:
+		if out is None:
+			return np.ascontiguousarray(frame)
+		if out is not frame:
+			np.copyto(out, frame)
+		return out
+	code = getattr(cv2, f'COLOR_{from_format.value}2{to_format.value}')
+	if out is None:
+		return cv2.cvtColor(frame, code)
+	return cv2.cvtColor(frame, code, dst=out)
+
+
+def to_bgr(shot, pixel_format=PixelFormat.RGB):
+	"""
+	:return: shot in a layout cv2.imshow accepts, converting only when needed.
+	"""
+	if pixel_format is PixelFormat.RGB:
+		return cv2.cvtColor(shot, cv2.COLOR_RGB2BGR)
+	return shot
@@ -0,0 +1,158 @@
+"""
+The purpose of this module is to turn captured frames into model-ready tensors.
+
+A Preprocessor crops, converts to grayscale, resizes, normalizes and stacks the last N frames of one or more streams
+(windows or regions captured together). All buffers are allocated up front, so processing a frame allocates nothing.
+"""
+
+import time
+
+import numpy as np
+import cv2
+
+from pixel_format import PixelFormat
+from region import Region
+
+_TO_GRAY = {
+	PixelFormat.BGRA: cv2.COLOR_BGRA2GRAY,
+	PixelFormat.BGR: cv2.COLOR_BGR2GRAY,
+	PixelFormat.RGB: cv2.COLOR_RGB2GRAY,
+}
+
+
+class Preprocessor:
+	"""Crop -> grayscale -> resize -> normalize -> stack, into preallocated tensors.
+
+	The result for a batch of B streams has shape (B, nof_stacked, height, width, channels), oldest frame first. It is
+	a view of an internal buffer that is valid until the next call.
+
+	Usage::
+
+		preprocessor = Preprocessor((640, 480), size=(84, 84), grayscale=True, nof_stacked=4)
+		tensor = preprocessor.process(frame)
+	"""
+
+	def __init__(self,
+		input_size,
+		input_format=PixelFormat.RGB,
+		nof_streams=1,
+		crop=None,
+		size=None,
+		grayscale=False,
+		nof_stacked=1,
+		dtype='float32',
+		scale=1.0 / 255.0,
+		mean=0.0,
+		std=1.0,
+		interpolation=cv2.INTER_AREA):
+		"""
+		:param input_size: (width, height) of the incoming frames
+		:param input_format: PixelFormat of the incoming frames
+		:param nof_streams: number of streams processed together as a batch
+		:param crop: optional Region (or (left, top, width, height)) of the frames to keep
+		:param size: optional (width, height) to resize to
+		:param grayscale: convert to a single channel
+		:param nof_stacked: number of most recent frames per stream in the result
+		:param dtype: dtype of the result, uint8 skips normalization
+		:param scale: factor applied before normalization, for floating point results
+		:param mean: subtracted after scaling, for floating point results
+		:param std: divided by after subtracting mean, for floating point results
+		:param interpolation: cv2 interpolation used for resizing
+		"""
+		input_width, input_height = input_size
+		self.input_format = input_format
+		self.crop = Region(*crop) if crop else Region(0, 0, input_width, input_height)
+		if self.crop.left + self.crop.width > input_width or self.crop.top + self.crop.height > input_height:
+			raise ValueError(f"crop {self.crop} is not inside {input_width}x{input_height}")
+		self.size = tuple(size) if size else (self.crop.width, self.crop.height)
+		self.grayscale = grayscale and input_format is not PixelFormat.GRAY
+		self.nof_streams = nof_streams
+		self.nof_stacked = nof_stacked
+		self.dtype = np.dtype(dtype)
+		self.alpha = scale / std
+		self.beta = -mean / std
+		self.interpolation = interpolation
+		nof_channels = 1 if (grayscale or input_format is PixelFormat.GRAY) else input_format.nof_channels
+		width, height = self.size
+		self.gray = np.empty((self.crop.height, self.crop.width), dtype='uint8') if self.grayscale else None
+		needs_resize = self.size != (self.crop.width, self.crop.height)
+		self.resized = np.empty((height, width) if nof_channels == 1 else (height, width, nof_channels),
+			dtype='uint8') if needs_resize else None
+		#Every frame is written twice (at t and t + nof_stacked), so the last nof_stacked frames are always one slice.
+		self.history = np.empty((nof_streams, 2 * nof_stacked, height, width, nof_channels), dtype=self.dtype)
+		self.position = None
+
+	@property
+	def output_shape(self):
+		width, height = self.size
+		return (self.nof_streams, self.nof_stacked, height, width, self.history.shape[-1])
+
+	def reset(self):
+		"""Forget the history, the next frame fills the whole stack."""
+		self.position = None
+
+	def _transform(self, frame, destination):
+		image = frame[self.crop.top:self.crop.top + self.crop.height, self.crop.left:self.crop.left + self.crop.width]
+		if self.gray is not None:
+			image = cv2.cvtColor(image, _TO_GRAY[self.input_format], dst=self.gray)
+		if self.resized is not None:
+			image = cv2.resize(image, self.size, dst=self.resized, interpolation=self.interpolation)
+		image = image.reshape(destination.shape)
+		if self.dtype == np.uint8:
+			np.copyto(destination, image)
+		else:
+			np.multiply(image, self.alpha, out=destination, casting='unsafe')
+			if self.beta:
+				np.add(destination, self.beta, out=destination)
+
+	def __call__(self, frames):
+		"""
+		:param frames: sequence of nof_streams frames (e.g. a batch of region shots), one per stream
+		:return: view of shape output_shape with the last nof_stacked frames of every stream
+		"""
+		if len(frames) != self.nof_streams:
+			raise ValueError(f"expected {self.nof_streams} frames, got {len(frames)}")
+		first = self.position is None
+		self.position = 0 if first else (self.position + 1) % self.nof_stacked
+		position = self.position
+		for stream_no, frame in enumerate(frames):
+			history = self.history[stream_no]
+			self._transform(frame, history[position])
+			if first:
+				history[1:] = history[position]
+			elif self.nof_stacked > 1:
+				np.copyto(history[position + self.nof_stacked], history[position])
+		return self.history[:, position + 1:position + 1 + self.nof_stacked] if self.nof_stacked > 1 else self.history[:, :1]
+
+	def process(self, frame):
+		"""
+		:param frame: frame of a single stream Preprocessor
+		:return: view of shape output_shape[1:]
+		"""
+		return self([frame])[0]
+
+
+def benchmark(resolutions=((640, 480), (1280, 720), (1920, 1080)), nof_frames=100, **preprocessor_kwargs):
+	"""Measure frames/sec of a Preprocessor on random RGB frames.
+
+	:param resolutions: (width, height) of the input frames to measure
+	:param nof_frames: frames processed per resolution
+	:param preprocessor_kwargs: Preprocessor settings, defaults to an 84x84 grayscale stack of 4
+	:return: dict mapping 'WIDTHxHEIGHT' to frames/sec
+	"""
+	preprocessor_kwargs = preprocessor_kwargs or dict(size=(84, 84), grayscale=True, nof_stacked=4)
+	result = dict()
+	for width, height in resolutions:
+		preprocessor = Preprocessor((width, height), **preprocessor_kwargs)
+		frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+		preprocessor.process(frame)
+		start = time.perf_counter()
+		for _ in range(nof_frames):
+			preprocessor.process(frame)
+		result[f'{width}x{height}'] = nof_frames / (time.perf_counter() - start)
+	return result
+
+
+if __name__ == '__main__':
+	for resolution, fps in benchmark().items():
+		print(f'{resolution}: {fps:.0f} frames/s')
@@ -0,0 +1,47 @@
+"""
+The purpose of this module is to describe the rectangles (regions of interest) to capture of a window or monitor.
+"""
+
+from collections import namedtuple
+
+from pixel_format import frame_shape
+from utils_import import lazy_import
+
+np = lazy_import('numpy')
+
+Region = namedtuple('Region', ['left', 'top', 'width', 'height'])
+
+
+def to_regions(regions):
+	"""
+	:param regions: sequence of Region or (left, top, width, height)
+	:return: tuple of Region
+	"""
+	return tuple(Region(*region) for region in regions)
+
+
+def check_regions(regions, width, height):
+	"""
+	:raises ValueError: if a region is empty or not inside a width x height rectangle
+	"""
+	for region in regions:
+		if region.width <= 0 or region.height <= 0 or region.left < 0 or region.top < 0 or (
+			region.left + region.width > width) or (region.top + region.height > height):
+			raise ValueError(f"{region} is not inside {width}x{height}")
+
+
+def is_batchable(regions):
+	"""
+	:return: True if all regions have the same size, so that their shots can be stacked in one array
+	"""
+	return len({(region.width, region.height) for region in regions}) <= 1
+
+
+def allocate_batch(regions, pixel_format):
+	"""
+	:return: array of shape (len(regions), height, width[, channels]) if all regions have the same size, otherwise a
+		list with one array per region. Either way, item i receives the shot of regions[i].
+	"""
+	if regions and is_batchable(regions):
+		return np.empty((len(regions), ) + frame_shape(regions[0].height, regions[0].width, pixel_format), dtype='uint8')
+	return [np.empty(frame_shape(region.height, region.width, pixel_format), dtype='uint8') for region in regions]
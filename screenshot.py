@@ -1,49 +1,164 @@
 import platform
 import logging
+import time
+import itertools
 
-import numpy as np
-import mss
-import cv2
-
+import metrics
 import utils_logging
-from window_finder import get_window_handles
+from pixel_format import PixelFormat, to_bgr
+from region import to_regions
+from capture_backends import default_backend
+from timing import PeriodicTicker
+from utils_import import lazy_import
+
+cv2 = lazy_import('cv2')
 
 if platform.system() == 'Windows':
-	from screenshot_windows import get_windowshot
+	from window_finder import get_window_handles
+
+_GRAB_SECONDS = metrics.histogram('capture.grab_seconds')
+_LATENESS_SECONDS = metrics.histogram('capture.lateness_seconds')
+_FRAMES = metrics.counter('capture.frames')
+_LATE = metrics.counter('capture.late')
+_DROPPED = metrics.counter('capture.dropped')
 
 
-def show_screenshot(shot, wait_ms=1000):
+def show_screenshot(shot, wait_ms=1000, pixel_format=PixelFormat.RGB):
 	if len(shot):
-		bgrshot = cv2.cvtColor(shot, cv2.COLOR_RGB2BGR)
+		bgrshot = to_bgr(shot, pixel_format)
 		cv2.imshow("{0}".format(shot), bgrshot)
 		cv2.waitKey(wait_ms)
 		cv2.destroyAllWindows()
 
 
 @utils_logging.log_args
-def get_screenshots(window_handles=None):
+def get_screenshots(window_handles=None, pixel_format=PixelFormat.RGB, regions=None, backend=None):
 	"""Function that seeks windows to snap/screenshot
 	Several optionals can be used to try to find windows more robustly -- a generator of screenshots is returned.
+	The screenshots are contiguous arrays in the requested PixelFormat, PixelFormat.BGRA needs no conversion.
+	If regions (Region or (left, top, width, height), relative to each window or monitor) are given only those are grabbed,
+	and a batch (see region.allocate_batch) is yielded per window or monitor instead of a screenshot.
+	A CaptureBackend other than the default (see capture_backends.default_backend) can be given as backend.
 	NOTE: Since it yields the screenshots it is only iterable once.
 	TODO: Separate the logic for which hwnds to check and yielding screenshots. Perhaps use sets ?
 	"""
 
-	@utils_logging.log_args
-	def monitor_screenshots():
-		#[https://pypi.org/project/mss/]
-		with mss.mss() as multiple_screen_shot:
-			for monitor in multiple_screen_shot.monitors:
-				sct = multiple_screen_shot.grab(monitor)
-				yield np.frombuffer(sct.rgb, dtype='uint8').reshape(sct.height, sct.width, 3)
-
 	try:
-		if window_handles:
-			for window_handle in window_handles:
-				yield get_windowshot(window_handle)
-			return
+		with CaptureSession(window_handles, pixel_format=pixel_format, regions=regions, backend=backend) as session:
+			for shot in session.read():
+				yield shot
 	except Exception as exception:
 		logging.error(exception)
 		raise
-	for shot in monitor_screenshots():
-		yield shot
-	return
+
+
+class CaptureSession:
+	"""Long-lived capture of windows or monitors.
+
+	The CaptureBackend is opened once in ``__enter__`` and reused for every frame, so the hot path only pays for the
+	grab itself. :meth:`read` is paced to ``fps`` (if given) and keeps count of late and dropped frames.
+
+	Usage::
+
+		with CaptureSession(window_handles, fps=60) as session:
+			for shots in session:
+				...
+	"""
+
+	@utils_logging.log_call
+	def __init__(self,
+		window_handles=None,
+		fps=None,
+		pixel_format=PixelFormat.RGB,
+		regions=None,
+		late_tolerance=0.001,
+		backend=None):
+		"""
+		:param window_handles: windows to capture, all monitors are captured if empty or None
+		:param fps: target frame rate, None to capture as fast as possible
+		:param pixel_format: PixelFormat of the returned frames, PixelFormat.BGRA needs no conversion
+		:param regions: optional Regions relative to each window or monitor, only these are grabbed
+		:param late_tolerance: seconds a frame may start after its deadline without being counted as late
+		:param backend: CaptureBackend to capture from instead of the windows/monitors, e.g. a SyntheticBackend
+		"""
+		self.backend = backend if backend is not None else default_backend(window_handles)
+		self.period = 1.0 / fps if fps else None
+		self.pixel_format = pixel_format
+		self.regions = to_regions(regions) if regions else tuple()
+		self.late_tolerance = late_tolerance
+		self.sources = None
+		self.nof_frames = 0
+		self.nof_late = 0
+		self.nof_dropped = 0
+		self.start_time = None
+		self.ticker = None
+
+	@utils_logging.log_call
+	def __enter__(self):
+		self.backend.open()
+		self.sources = self.backend.sources()
+		self.start_time = time.perf_counter()
+		if self.period:
+			self.ticker = PeriodicTicker(self.period)
+			self.ticker.start()
+		return self
+
+	@utils_logging.log_call
+	def __exit__(self, *exc_args):
+		self.backend.close()
+		return False
+
+	def __iter__(self):
+		while True:
+			yield self.read()
+
+	def _wait_for_deadline(self):
+		#Whole periods that passed without a frame are dropped (skipped by the ticker), the remainder makes this frame late.
+		lateness_ns = self.ticker.wait()
+		_DROPPED.inc(self.ticker.nof_missed - self.nof_dropped)
+		self.nof_dropped = self.ticker.nof_missed
+		_LATENESS_SECONDS.observe(lateness_ns / 1e9)
+		if lateness_ns > self.late_tolerance * 1e9:
+			self.nof_late += 1
+			_LATE.inc()
+
+	def _grab(self, out):
+		if self.regions:
+			return [
+				self.backend.grab_regions(source, self.regions, pixel_format=self.pixel_format, out=shot_out)
+				for source, shot_out in zip(self.sources, out)
+			]
+		return [
+			self.backend.grab(source, pixel_format=self.pixel_format, out=shot_out)
+			for source, shot_out in zip(self.sources, out)
+		]
+
+	def read(self, out=None):
+		"""Capture the next frame of every window/monitor.
+
+		:param out: optional sequence of preallocated arrays, one per window handle (or monitor), see
+			pixel_format.frame_shape (or region.allocate_batch if the session has regions)
+		:return: list of screenshots in the session's PixelFormat, one per window handle (or monitor). With regions
+			every item is a batch with one shot per region, see region.allocate_batch.
+		"""
+		if self.start_time is None:
+			raise RuntimeError("CaptureSession must be entered before reading.")
+		if self.period:
+			self._wait_for_deadline()
+		if out is None:
+			out = itertools.repeat(None)
+		start = time.perf_counter()
+		shots = self._grab(out)
+		_GRAB_SECONDS.observe(time.perf_counter() - start)
+		_FRAMES.inc()
+		self.nof_frames += 1
+		return shots
+
+	def statistics(self):
+		elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+		return {
+			'frames': self.nof_frames,
+			'late': self.nof_late,
+			'dropped': self.nof_dropped,
+			'fps': self.nof_frames / elapsed if elapsed > 0 else 0.0,
+		}
@@ -7,12 +7,12 @@
 import ctypes
 import ctypes.wintypes
 
-import numpy as np
-
 import logging
 import utils_logging
 
 from utils_os import assert_win
+from pixel_format import PixelFormat, convert_bgra, allocate_frame, check_out
+from region import to_regions, check_regions, allocate_batch
 
 
 class Context():
@@ -71,17 +71,197 @@ class BITMAPINFO(ctypes.Structure):
 		('bmiColors', ctypes.wintypes.DWORD * 3),
 	]
 
+#"Copies the source rectangle directly to the destination rectangle." [wingdi.h]
+SRCCOPY = 0x00CC0020
+
+
+def _bitmap_info(width, height):
+	#[https://msdn.microsoft.com/sv-se/02f8ed65-8fed-4dda-9b94-7343a0cfa8c1,
+	# https://msdn.microsoft.com/en-us/library/dd183376(v=vs.85).aspx]
+	bitmap_info = BITMAPINFO()
+	bitmap_info.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+	bitmap_info.bmiHeader.biWidth = width
+	#Top-down image [https://msdn.microsoft.com/sv-se/library/ms787796.aspx,
+	# https://docs.microsoft.com/sv-se/windows/desktop/api/wingdi/nf-wingdi-getdibits]
+	bitmap_info.bmiHeader.biHeight = -height
+	bitmap_info.bmiHeader.biPlanes = 1
+	#"The bitmap has a maximum of 2^32 colors. If the biCompression member of the BITMAPINFOHEADER is BI_RGB, the bmiColors
+	# member of BITMAPINFO is NULL. Each DWORD in the bitmap array represents the relative intensities of blue, green, and
+	# red for a pixel. The value for blue is in the least significant 8 bits, followed by 8 bits each for green and red.
+	# The high byte in each DWORD is not used."
+	# => Do not set bmiColors in ctypes?
+	bitmap_info.bmiHeader.biBitCount = 32
+	#"BI_RGB An uncompressed format." [wingdi.h]
+	bitmap_info.bmiHeader.biCompression = 0
+	#"This may be set to zero for BI_RGB bitmaps."
+	bitmap_info.bmiHeader.biSizeImage = 0
+	#0? 10 pixels/millimeter = 10000 pixels/m? -- no idea if there is a "correct" value
+	bitmap_info.bmiHeader.biXPelsPerMeter = 0
+	bitmap_info.bmiHeader.biYPelsPerMeter = 0
+	#"If this value is zero, the bitmap uses the maximum number of colors corresponding to the value of the biBitCount
+	# member for the compression mode specified by biCompression."
+	bitmap_info.bmiHeader.biClrUsed = 0
+	#"If this value is zero, all colors are required."
+	bitmap_info.bmiHeader.biClrImportant = 0
+	return bitmap_info
+
+
+def _select_bitmap(memory_device_context_handle, bitmap_handle):
+	previously_selected_bitmap_handle = ctypes.windll.gdi32.SelectObject(memory_device_context_handle, bitmap_handle)
+	assert_win(previously_selected_bitmap_handle)
+	assert previously_selected_bitmap_handle != ctypes.wintypes.HANDLE(0xFFFFFFFF)
+	return previously_selected_bitmap_handle
+
+
+def _get_dibits(memory_device_context_handle, bitmap_handle, width, height, pixel_format, out, bgra=None, bitmap_info=None):
+	"""Copy the bitmap into a numpy array, converting it to pixel_format.
+
+	:param bgra: optional scratch BGRA frame to copy into before converting, reused across calls
+	:param bitmap_info: optional _bitmap_info(width, height), reused across calls
+	"""
+	if out is not None:
+		check_out(out, height, width, pixel_format)
+	#BGRX is written straight into out when no conversion is needed
+	if out is not None and pixel_format is PixelFormat.BGRA:
+		bgra = out
+	elif bgra is None or pixel_format is PixelFormat.BGRA:
+		#Without out the BGRA result must not be a scratch frame that the next call overwrites
+		bgra = allocate_frame(height, width, PixelFormat.BGRA)
+	#[https://docs.microsoft.com/sv-se/windows/desktop/api/wingdi/nf-wingdi-getdibits]
+	#DIB_RGB_COLORS = 0 [wingdi.h]
+	nof_scanlines = ctypes.windll.gdi32.GetDIBits(memory_device_context_handle, bitmap_handle, 0, height,
+		bgra.ctypes.data_as(ctypes.c_void_p), ctypes.byref(bitmap_info or _bitmap_info(width, height)), 0)
+	assert_win(nof_scanlines == height)
+	return convert_bgra(bgra, pixel_format, out=out)
+
+
+def _get_window_size(window_handle):
+	window_rect = ctypes.wintypes.RECT()
+	assert_win(ctypes.windll.user32.GetWindowRect(window_handle, ctypes.byref(window_rect)))
+	return window_rect.right - window_rect.left, window_rect.bottom - window_rect.top
+
+
+class WindowCapture:
+	"""Device contexts, bitmap and scratch frame to PrintWindow a window into, kept across frames.
+
+	The bitmap and the scratch frame are reallocated by resize, only when the size changes.
+
+	Usage::
+
+		with WindowCapture(window_handle) as capture:
+			capture.resize(width, height)
+			shot = capture.grab(PixelFormat.RGB)
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, window_handle):
+		self.window_handle = window_handle
+		self.window_device_context = None
+		self.memory_device_context = None
+		self.bitmap = None
+		self.previously_selected_bitmap = None
+		self.bitmap_info = None
+		self.bgra = None
+		self.width = None
+		self.height = None
+		self.nof_allocations = 0
+
+	@utils_logging.log_call
+	def open(self):
+		self.window_device_context = assert_win(ctypes.windll.user32.GetWindowDC(self.window_handle))
+		self.memory_device_context = assert_win(ctypes.windll.gdi32.CreateCompatibleDC(self.window_device_context))
+		return self
+
+	def _delete_bitmap(self):
+		if self.bitmap:
+			ctypes.windll.gdi32.SelectObject(self.memory_device_context, self.previously_selected_bitmap)
+			assert_win(ctypes.windll.gdi32.DeleteObject(self.bitmap))
+			self.bitmap = None
+			self.width = None
+			self.height = None
+
+	@utils_logging.log_call
+	def resize(self, width, height):
+		"""Allocate the bitmap and scratch frame for a width x height window, unless they already have that size."""
+		if (width, height) == (self.width, self.height):
+			return
+		self._delete_bitmap()
+		self.bitmap = assert_win(ctypes.windll.gdi32.CreateCompatibleBitmap(self.window_device_context, width, height))
+		self.previously_selected_bitmap = _select_bitmap(self.memory_device_context, self.bitmap)
+		self.bitmap_info = _bitmap_info(width, height)
+		self.bgra = allocate_frame(height, width, PixelFormat.BGRA)
+		self.width = width
+		self.height = height
+		self.nof_allocations += 1
+
+	@utils_logging.log_call
+	def close(self):
+		self._delete_bitmap()
+		if self.memory_device_context:
+			assert_win(ctypes.windll.gdi32.DeleteDC(self.memory_device_context))
+			self.memory_device_context = None
+		if self.window_device_context:
+			assert_win(ctypes.windll.user32.ReleaseDC(self.window_handle, self.window_device_context))
+			self.window_device_context = None
+
+	def grab(self, pixel_format=PixelFormat.RGB, out=None):
+		"""
+		:param pixel_format: requested PixelFormat, PixelFormat.BGRA is the native layout and needs no conversion
+		:param out: optional preallocated array for the result, for PixelFormat.BGRA GetDIBits writes directly into it
+		:return: contiguous screenshot of the last resize's size in the requested pixel format
+		"""
+		assert_win(ctypes.windll.user32.PrintWindow(self.window_handle, self.memory_device_context, 0))
+		return _get_dibits(self.memory_device_context, self.bitmap, self.width, self.height, pixel_format, out, self.bgra,
+			self.bitmap_info)
+
+	def __enter__(self):
+		return self.open()
+
+	def __exit__(self, *exc_args):
+		self.close()
+		return False
+
 
 @utils_logging.log_args
-def get_windowshot(window_handle):
-	"""Get an RGB screen capture of a window
+def get_windowshot(window_handle, pixel_format=PixelFormat.RGB, out=None):
+	"""Get a screen capture of a window
+
+	To capture a window repeatedly, keep a WindowCapture open instead.
 
 	:param window_handle: Handle to the window that will be screenshot.
 	:type window_handle: ctypes.wintypes.HWND
-	:return: RGB-screenshot
+	:param pixel_format: requested PixelFormat, PixelFormat.BGRA is the native layout and needs no conversion
+	:param out: optional preallocated array for the result, for PixelFormat.BGRA GetDIBits writes directly into it
+	:return: contiguous screenshot in the requested pixel format
 	:rtype: numpy.array
 	"""
 
+	with WindowCapture(window_handle) as capture:
+		capture.resize(*_get_window_size(window_handle))
+		logging.debug('Contexts created.')
+		return capture.grab(pixel_format, out)
+
+
+@utils_logging.log_args
+def get_window_regions(window_handle, regions, pixel_format=PixelFormat.RGB, out=None, size=None):
+	"""Get screen captures of rectangles of a window, only the pixels inside the regions are copied.
+
+	Unlike get_windowshot this uses BitBlt from the window device context, so the regions must be visible on screen.
+
+	:param window_handle: Handle to the window that will be screenshot.
+	:param regions: sequence of Region (or (left, top, width, height)) relative to the upper-left corner of the window
+	:param pixel_format: requested PixelFormat, PixelFormat.BGRA is the native layout and needs no conversion
+	:param out: optional preallocated batch, see region.allocate_batch
+	:param size: (width, height) of the window if known, e.g. from a WindowTracker, queried if None
+	:return: batch of screenshots, see region.allocate_batch
+	:raises ValueError: if a region is not inside the window
+	"""
+
+	regions = to_regions(regions)
+	width, height = size if size is not None else _get_window_size(window_handle)
+	check_regions(regions, width, height)
+	if out is None:
+		out = allocate_batch(regions, pixel_format)
 	with Context(
 		window_handle,
 		constructor=ctypes.windll.user32.GetWindowDC,
@@ -89,58 +269,19 @@ def get_windowshot(window_handle):
 		with Context(
 			ctx_window_device_context(), constructor=ctypes.windll.gdi32.CreateCompatibleDC,
 			destructor=ctypes.windll.gdi32.DeleteDC) as ctx_memory_device_context_handle:
-
-			window_rect = ctypes.wintypes.RECT()
-			assert_win(ctypes.windll.user32.GetWindowRect(window_handle, ctypes.byref(window_rect)))
-			width = window_rect.right - window_rect.left
-			height = window_rect.bottom - window_rect.top
-			with Context(
-				ctx_window_device_context(),
-				width,
-				height,
-				constructor=ctypes.windll.gdi32.CreateCompatibleBitmap,
-				destructor=ctypes.windll.gdi32.DeleteObject) as ctx_graphics_device_interface_bitmap_handle:
-				logging.debug('Contexts created.')
-				graphics_device_interface_previously_selected_bitmap_handle = ctypes.windll.gdi32.SelectObject(
-					ctx_memory_device_context_handle(), ctx_graphics_device_interface_bitmap_handle())
-				assert_win(graphics_device_interface_previously_selected_bitmap_handle)
-				assert graphics_device_interface_previously_selected_bitmap_handle != ctypes.wintypes.HANDLE(0xFFFFFFFF)
-				assert_win(ctypes.windll.user32.PrintWindow(window_handle, ctx_memory_device_context_handle(), 0))
-				#[https://msdn.microsoft.com/sv-se/02f8ed65-8fed-4dda-9b94-7343a0cfa8c1,
-				# https://msdn.microsoft.com/en-us/library/dd183376(v=vs.85).aspx]
-				bitmap_info = BITMAPINFO()
-				bitmap_info.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
-				bitmap_info.bmiHeader.biWidth = width
-				#Top-down image [https://msdn.microsoft.com/sv-se/library/ms787796.aspx,
-				# https://docs.microsoft.com/sv-se/windows/desktop/api/wingdi/nf-wingdi-getdibits]
-				bitmap_info.bmiHeader.biHeight = -height
-				bitmap_info.bmiHeader.biPlanes = 1
-				#"The bitmap has a maximum of 2^32 colors. If the biCompression member of the BITMAPINFOHEADER is BI_RGB, the bmiColors
-				# member of BITMAPINFO is NULL. Each DWORD in the bitmap array represents the relative intensities of blue, green, and
-				# red for a pixel. The value for blue is in the least significant 8 bits, followed by 8 bits each for green and red.
-				# The high byte in each DWORD is not used."
-				# => Do not set bmiColors in ctypes?
-				bitmap_info.bmiHeader.biBitCount = 32
-				#"BI_RGB An uncompressed format." [wingdi.h]
-				bitmap_info.bmiHeader.biCompression = 0
-				#"This may be set to zero for BI_RGB bitmaps."
-				bitmap_info.bmiHeader.biSizeImage = 0
-				#0? 10 pixels/millimeter = 10000 pixels/m? -- no idea if there is a "correct" value
-				bitmap_info.bmiHeader.biXPelsPerMeter = 0
-				bitmap_info.bmiHeader.biYPelsPerMeter = 0
-				#"If this value is zero, the bitmap uses the maximum number of colors corresponding to the value of the biBitCount
-				# member for the compression mode specified by biCompression."
-				bitmap_info.bmiHeader.biClrUsed = 0
-				#"If this value is zero, all colors are required."
-				bitmap_info.bmiHeader.biClrImportant = 0
-
-				data = ctypes.create_string_buffer(width * height * 4)
-				#[https://docs.microsoft.com/sv-se/windows/desktop/api/wingdi/nf-wingdi-getdibits]
-				#DIB_RGB_COLORS = 0 [wingdi.h]
-				nof_scanlines = ctypes.windll.gdi32.GetDIBits(ctx_memory_device_context_handle(),
-					ctx_graphics_device_interface_bitmap_handle(), 0, height, data, bitmap_info,
-					0)
-				assert_win(nof_scanlines == height)
-				#Convert BGRX to RGB
-				#https://stackoverflow.com/a/37421379
-				return np.frombuffer(data, dtype='uint8').reshape(height, width, 4)[..., :3][..., ::-1]
+			for region_no, region in enumerate(regions):
+				with Context(
+					ctx_window_device_context(),
+					region.width,
+					region.height,
+					constructor=ctypes.windll.gdi32.CreateCompatibleBitmap,
+					destructor=ctypes.windll.gdi32.DeleteObject) as ctx_graphics_device_interface_bitmap_handle:
+					previously_selected_bitmap_handle = _select_bitmap(ctx_memory_device_context_handle(),
+						ctx_graphics_device_interface_bitmap_handle())
+					assert_win(
+						ctypes.windll.gdi32.BitBlt(ctx_memory_device_context_handle(), 0, 0, region.width, region.height,
+						ctx_window_device_context(), region.left, region.top, SRCCOPY))
+					_get_dibits(ctx_memory_device_context_handle(), ctx_graphics_device_interface_bitmap_handle(), region.width,
+						region.height, pixel_format, out[region_no])
+					ctypes.windll.gdi32.SelectObject(ctx_memory_device_context_handle(), previously_selected_bitmap_handle)
+	return out
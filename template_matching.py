@@ -0,0 +1,285 @@
+"""
+The purpose of this module is to recognize HUD elements and menus in captured frames by template matching.
+
+Templates are registered once with a TemplateMatcher, which precomputes their grayscale versions at every scale and
+their image pyramids. Per frame, the frame is converted to grayscale and its pyramid built once (into buffers reused
+across frames of the same size), and shared by all templates. Every template is searched only inside its region of
+interest: first at the coarsest pyramid level, where a template that scores clearly below the threshold is rejected,
+then refined level by level in small windows around the best few coarse locations. If none of them reaches the
+threshold, the region of interest is searched at full resolution.
+
+Usage::
+
+	matcher = TemplateMatcher(threshold=0.8)
+	matcher.add('menu', cv2.imread('menu.png'), PixelFormat.BGR, roi=Region(0, 0, 400, 300))
+	for match in matcher.match(frame, PixelFormat.RGB):
+		...
+"""
+
+import time
+from collections import namedtuple
+
+import utils_logging
+from pixel_format import PixelFormat, convert
+from region import Region, check_regions
+from utils_import import lazy_import
+
+np = lazy_import('numpy')
+cv2 = lazy_import('cv2')
+
+Match = namedtuple('Match', ['name', 'score', 'left', 'top', 'width', 'height', 'scale'])
+Match.__doc__ = """Best location of a template in a frame.
+
+:param name: name the template was added with
+:param score: normalized correlation coefficient, 1.0 for a perfect match
+:param left: x of the upper-left corner in the frame
+:param top: y of the upper-left corner in the frame
+:param width: width of the (scaled) template
+:param height: height of the (scaled) template
+:param scale: scale of the template that matched best
+"""
+
+_Template = namedtuple('_Template', ['name', 'roi', 'pyramids'])
+
+#Pixels around the upscaled coarse location that are searched at the next finer level.
+REFINE_PAD = 2
+
+
+def _pyramid(image, nof_levels, min_size):
+	"""
+	:return: list of image halved up to nof_levels - 1 times, stopping before a side gets shorter than min_size
+	"""
+	levels = [image]
+	while len(levels) < nof_levels and min(levels[-1].shape[:2]) >= 2 * min_size:
+		levels.append(cv2.pyrDown(levels[-1]))
+	return levels
+
+
+class TemplateMatcher:
+	"""Matches many preprocessed templates against frames, see module docstring."""
+
+	@utils_logging.log_call
+	def __init__(self,
+		threshold=0.8,
+		scales=(1.0, ),
+		nof_levels=3,
+		coarse_margin=0.15,
+		min_template_size=8,
+		max_candidates=4,
+		full_search_fallback=True):
+		"""
+		:param threshold: minimum score of a match
+		:param scales: scales the templates are searched at, e.g. (0.9, 1.0, 1.1) for HUDs that scale with resolution
+		:param nof_levels: pyramid levels, 1 to match at full resolution only
+		:param coarse_margin: a template scoring below threshold - coarse_margin at the coarsest level is rejected
+		:param min_template_size: templates are not searched at levels where they would be smaller than this
+		:param max_candidates: number of coarse locations scoring at least threshold - coarse_margin that are refined
+		:param full_search_fallback: search the region of interest at full resolution when no refined candidate
+			reaches threshold, so a template that passed the coarse level is not missed
+		"""
+		self.threshold = threshold
+		self.scales = tuple(scales)
+		self.nof_levels = nof_levels
+		self.coarse_margin = coarse_margin
+		self.min_template_size = min_template_size
+		self.max_candidates = max_candidates
+		self.full_search_fallback = full_search_fallback
+		self.templates = dict()
+		self.frame_pyramid = None
+		self.nof_searches = 0
+		self.nof_rejections = 0
+		self.nof_fallbacks = 0
+
+	@utils_logging.log_call
+	def add(self, name, image, pixel_format=PixelFormat.BGR, roi=None):
+		"""Register a template, replacing a template with the same name.
+
+		:param name: name of the template, reported in its Matches
+		:param image: template image
+		:param pixel_format: PixelFormat of image
+		:param roi: Region (or (left, top, width, height)) of the frames to search, the whole frame if None
+		"""
+		gray = convert(image, pixel_format, PixelFormat.GRAY)
+		pyramids = list()
+		for scale in self.scales:
+			if scale == 1.0:
+				scaled = gray
+			else:
+				height, width = gray.shape
+				scaled = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+					interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+			pyramids.append((scale, _pyramid(scaled, self.nof_levels, self.min_template_size)))
+		self.templates[name] = _Template(name, Region(*roi) if roi is not None else None, pyramids)
+
+	def remove(self, name):
+		del self.templates[name]
+
+	def _frame_pyramid(self, frame, pixel_format):
+		"""Grayscale pyramid of frame, in buffers that are reused while the frame size stays the same."""
+		height, width = frame.shape[:2]
+		if self.frame_pyramid is None or self.frame_pyramid[0].shape != (height, width):
+			self.frame_pyramid = [np.empty((height, width), dtype='uint8')]
+			while len(self.frame_pyramid) < self.nof_levels:
+				previous_height, previous_width = self.frame_pyramid[-1].shape
+				self.frame_pyramid.append(np.empty(((previous_height + 1) // 2, (previous_width + 1) // 2), dtype='uint8'))
+		convert(frame, pixel_format, PixelFormat.GRAY, out=self.frame_pyramid[0])
+		for level_no in range(1, self.nof_levels):
+			cv2.pyrDown(self.frame_pyramid[level_no - 1], dst=self.frame_pyramid[level_no])
+		return self.frame_pyramid
+
+	def _candidates(self, scores, cutoff, template_shape):
+		"""
+		:return: list of (x, y) of the local maxima of scores that are at least cutoff, best first, at most
+			max_candidates, none closer than half the template to a better one
+		"""
+		scores = scores.copy()
+		radius_y, radius_x = (max(1, side // 2) for side in template_shape)
+		candidates = list()
+		while len(candidates) < self.max_candidates:
+			_, score, _, (x, y) = cv2.minMaxLoc(scores)
+			if score < cutoff and candidates:
+				break
+			candidates.append((x, y))
+			scores[max(0, y - radius_y):y + radius_y + 1, max(0, x - radius_x):x + radius_x + 1] = -np.inf
+		return candidates
+
+	def _refine(self, frame_pyramid, roi, template_pyramid, level_no, x, y):
+		"""
+		:param x: x of a location at level_no, in level_no pixels
+		:param y: y of a location at level_no, in level_no pixels
+		:return: (score, left, top) of the best location at level 0 near (x, y), None if the window is too small
+		"""
+		score = None
+		while level_no > 0:
+			level_no -= 1
+			template = template_pyramid[level_no]
+			level_image = frame_pyramid[level_no]
+			roi_left, roi_top = roi.left >> level_no, roi.top >> level_no
+			roi_right = min(level_image.shape[1], roi_left + (roi.width >> level_no))
+			roi_bottom = min(level_image.shape[0], roi_top + (roi.height >> level_no))
+			#Window around the coarse location, clipped to the region of interest.
+			left = min(max(roi_left, 2 * x - REFINE_PAD), max(roi_left, roi_right - template.shape[1]))
+			top = min(max(roi_top, 2 * y - REFINE_PAD), max(roi_top, roi_bottom - template.shape[0]))
+			right = min(roi_right, 2 * x + template.shape[1] + REFINE_PAD)
+			bottom = min(roi_bottom, 2 * y + template.shape[0] + REFINE_PAD)
+			image = level_image[top:bottom, left:right]
+			if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+				return None
+			_, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED))
+			x, y = x + left, y + top
+		return score, x, y
+
+	def _search_level(self, frame_pyramid, roi, template, level_no):
+		"""
+		:return: matchTemplate scores of template over roi at level_no and the (left, top) they are relative to, None
+			if the region of interest is smaller than the template
+		"""
+		left, top = roi.left >> level_no, roi.top >> level_no
+		image = frame_pyramid[level_no][top:top + (roi.height >> level_no), left:left + (roi.width >> level_no)]
+		if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+			return None
+		return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED), (left, top)
+
+	def _search(self, frame_pyramid, roi, template_pyramid):
+		"""
+		:return: (score, left, top) of the best location at level 0, None if rejected at a coarse level
+		"""
+		self.nof_searches += 1
+		#Coarsest level at which both the template and the region of interest are large enough.
+		level_no = len(template_pyramid) - 1
+		while level_no > 0 and any(roi_side >> level_no < template_side
+			for roi_side, template_side in zip((roi.height, roi.width), template_pyramid[level_no].shape)):
+			level_no -= 1
+		searched = self._search_level(frame_pyramid, roi, template_pyramid[level_no], level_no)
+		if searched is None:
+			return None
+		scores, (left, top) = searched
+		_, score, _, (x, y) = cv2.minMaxLoc(scores)
+		if level_no == 0:
+			return score, x + left, y + top
+		cutoff = self.threshold - self.coarse_margin
+		if score < cutoff:
+			self.nof_rejections += 1
+			return None
+		#Sharp content (text, outlines) has look-alikes at coarse levels, so several coarse maxima are refined.
+		best = None
+		for x, y in self._candidates(scores, cutoff, template_pyramid[level_no].shape):
+			found = self._refine(frame_pyramid, roi, template_pyramid, level_no, x + left, y + top)
+			if found is not None and (best is None or found[0] > best[0]):
+				best = found
+		if self.full_search_fallback and (best is None or best[0] < self.threshold):
+			self.nof_fallbacks += 1
+			scores, (left, top) = self._search_level(frame_pyramid, roi, template_pyramid[0], 0)
+			_, score, _, (x, y) = cv2.minMaxLoc(scores)
+			best = score, x + left, y + top
+		return best
+
+	def match(self, frame, pixel_format=PixelFormat.RGB, names=None):
+		"""
+		:param frame: captured frame
+		:param pixel_format: PixelFormat of frame
+		:param names: names of the templates to search for, all if None
+		:raises ValueError: if a template's region of interest is not inside the frame
+		:return: list of Match, the best location of every template scoring at least threshold, in the order the
+			templates were added
+		"""
+		frame_pyramid = self._frame_pyramid(frame, pixel_format)
+		height, width = frame.shape[:2]
+		frame_roi = Region(0, 0, width, height)
+		matches = list()
+		for template in (self.templates.values() if names is None else (self.templates[name] for name in names)):
+			roi = template.roi or frame_roi
+			check_regions((roi, ), width, height)
+			best = None
+			for scale, template_pyramid in template.pyramids:
+				found = self._search(frame_pyramid, roi, template_pyramid)
+				if found is not None and found[0] >= self.threshold and (best is None or found[0] > best.score):
+					template_height, template_width = template_pyramid[0].shape
+					best = Match(template.name, found[0], found[1], found[2], template_width, template_height, scale)
+			if best is not None:
+				matches.append(best)
+		return matches
+
+	def match_batch(self, frames, pixel_format=PixelFormat.RGB, names=None):
+		"""
+		:param frames: sequence of frames, e.g. a batch from region.allocate_batch
+		:return: list with the match result of every frame
+		"""
+		return [self.match(frame, pixel_format, names) for frame in frames]
+
+
+def _synthetic_frame(width, height, seed=0):
+	"""
+	:return: smooth random grayscale frame, textured like a screen rather than like noise
+	"""
+	noise = np.random.default_rng(seed).integers(0, 256, (height, width), dtype='uint8')
+	return cv2.GaussianBlur(noise, (0, 0), 2.0)
+
+
+def benchmark(nof_templates=(1, 10, 50), frame_sizes=((640, 480), (1920, 1080)), nof_frames=5, template_size=48):
+	"""Frames per second matched, by number of templates and frame size. Half of the templates are in the frame.
+
+	:return: dict from (number of templates, width, height) to frames/s
+	"""
+	result = dict()
+	for width, height in frame_sizes:
+		frame = _synthetic_frame(width, height)
+		other = _synthetic_frame(width, height, seed=1)
+		rng = np.random.default_rng(2)
+		for nof in nof_templates:
+			matcher = TemplateMatcher()
+			for template_no in range(nof):
+				source = frame if template_no % 2 == 0 else other
+				left, top = (int(rng.integers(0, side - template_size)) for side in (width, height))
+				matcher.add(template_no, source[top:top + template_size, left:left + template_size], PixelFormat.GRAY)
+			matcher.match(frame, PixelFormat.GRAY)
+			start = time.perf_counter()
+			for _ in range(nof_frames):
+				matcher.match(frame, PixelFormat.GRAY)
+			result[(nof, width, height)] = nof_frames / (time.perf_counter() - start)
+	return result
+
+
+if __name__ == '__main__':
+	for (nof, width, height), fps in benchmark().items():
+		print(f'{nof} templates {width}x{height}: {fps:.1f} frames/s')
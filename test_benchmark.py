@@ -0,0 +1,21 @@
+import pathlib
+import tempfile
+import unittest
+
+from benchmark import *
+
+
+class TestBenchmark(unittest.TestCase):
+	def test_regressions(self):
+		baseline = {'fps': Measurement(100.0, 'frames/s', True), 'latency': Measurement(10.0, 'us', False)}
+		self.assertEqual(regressions(baseline, baseline), dict())
+		results = {'fps': Measurement(70.0, 'frames/s', True), 'latency': Measurement(11.0, 'us', False)}
+		self.assertEqual(regressions(results, baseline, tolerance=0.2), {'fps': (100.0, 70.0)})
+		self.assertEqual(set(regressions(results, baseline, tolerance=0.05)), {'fps', 'latency'})
+
+	def test_save_load(self):
+		results = run(['logging'])
+		with tempfile.TemporaryDirectory() as directory:
+			path = pathlib.Path(directory) / 'benchmark.json'
+			save(results, path, tolerance=0.3)
+			self.assertEqual(load(path), (results, 0.3))
@@ -0,0 +1,59 @@
+import unittest
+import tempfile
+import pathlib
+import time
+
+from capture_backends import *
+from screenshot import CaptureSession, get_screenshots
+from region import Region
+from pixel_format import frame_shape
+
+
+class TestCaptureBackends(unittest.TestCase):
+	def test_synthetic_is_deterministic(self):
+		with SyntheticBackend(width=32, height=24, nof_sources=2) as first, SyntheticBackend(width=32, height=24,
+			nof_sources=2) as second:
+			for _ in range(3):
+				for source in first.sources():
+					np.testing.assert_array_equal(first.grab(source), second.grab(source))
+			self.assertFalse((first.frame(0, 0) == first.frame(1, 0)).all())
+
+	def test_pixel_formats(self):
+		with SyntheticBackend(width=8, height=4) as backend:
+			np.testing.assert_array_equal(backend.grab(0, PixelFormat.RGB), backend.frame(0, 0)[..., 2::-1])
+			for pixel_format in PixelFormat:
+				out = np.empty(frame_shape(4, 8, pixel_format), dtype='uint8')
+				self.assertIs(backend.grab(0, pixel_format=pixel_format, out=out), out)
+			with self.assertRaises(ValueError):
+				backend.grab(0, PixelFormat.BGR, out=np.empty((4, 8, 4), dtype='uint8'))
+
+	def test_session_regions(self):
+		regions = [Region(0, 0, 4, 2), (4, 2, 4, 2)]
+		with CaptureSession(backend=SyntheticBackend(width=8, height=4, nof_sources=2), regions=regions,
+			pixel_format=PixelFormat.BGRA) as session:
+			batches = session.read()
+		self.assertEqual(len(batches), 2)
+		self.assertEqual(batches[0].shape, (2, 2, 4, 4))
+		np.testing.assert_array_equal(batches[1][1], SyntheticBackend(width=8, height=4, nof_sources=2).frame(1, 0)[2:4, 4:8])
+		with self.assertRaises(ValueError):
+			list(get_screenshots(regions=[(6, 0, 4, 2)], backend=SyntheticBackend(width=8, height=4)))
+
+	def test_session_counts_dropped_frames(self):
+		with CaptureSession(backend=SyntheticBackend(width=8, height=4), fps=1000) as session:
+			session.read()
+			time.sleep(0.05)
+			session.read()
+			statistics = session.statistics()
+		self.assertEqual(statistics['frames'], 2)
+		self.assertGreater(statistics['dropped'], 10)
+
+	def test_replay(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = pathlib.Path(directory) / 'recording.npy'
+			frames = np.stack([SyntheticBackend(width=8, height=4).frame(0, frame_no) for frame_no in range(3)])
+			np.save(path, frames)
+			with ReplayBackend(path, loop=False) as backend:
+				shots = [backend.grab(0, PixelFormat.GRAY) for _ in range(3)]
+				with self.assertRaises(EOFError):
+					backend.grab(0)
+			self.assertEqual(shots[2].shape, (4, 8))
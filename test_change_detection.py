@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from change_detection import ChangeDetector, skip_unchanged
+from region import Region
+
+
+class TestChangeDetector(unittest.TestCase):
+	def setUp(self):
+		#Not a multiple of the tile size: edge tiles are 4 rows high and 8 columns wide.
+		self.frame = np.zeros((36, 40, 3), dtype='uint8')
+		self.detector = ChangeDetector(tile_size=(16, 16))
+
+	def test_first_frame_is_dirty(self):
+		changes = self.detector(self.frame)
+		self.assertFalse(changes.unchanged)
+		self.assertEqual(self.detector.tile_grid, (3, 3))
+		self.assertEqual(len(changes.dirty_tiles), 9)
+
+	def test_unchanged(self):
+		self.detector(self.frame)
+		changes = self.detector(self.frame.copy())
+		self.assertTrue(changes.unchanged)
+		self.assertEqual(changes.dirty_tiles.shape, (0, 2))
+		self.assertEqual((self.detector.nof_frames, self.detector.nof_unchanged), (2, 1))
+
+	def test_edge_tile(self):
+		self.detector(self.frame)
+		frame = self.frame.copy()
+		frame[35, 39, 2] = 1
+		changes = self.detector(frame)
+		self.assertFalse(changes.unchanged)
+		self.assertEqual(changes.dirty_tiles.tolist(), [[2, 2]])
+		self.assertEqual(self.detector.dirty_regions(changes), [Region(left=32, top=32, width=8, height=4)])
+
+	def test_threshold(self):
+		detector = ChangeDetector(tile_size=(16, 16), threshold=10)
+		detector(self.frame)
+		frame = self.frame.copy()
+		frame[0, 0] = 10
+		self.assertTrue(detector(frame).unchanged)
+		frame[20, 20] = 11
+		self.assertEqual(detector(frame).dirty_tiles.tolist(), [[1, 1]])
+
+	def test_small_changes_add_up(self):
+		detector = ChangeDetector(tile_size=(16, 16), threshold=10)
+		detector(self.frame)
+		frame = self.frame.copy()
+		for value in (4, 8):
+			frame[5, 5] = value
+			self.assertTrue(detector(frame).unchanged)
+		frame[5, 5] = 12
+		changes = detector(frame)
+		self.assertEqual(changes.dirty_tiles.tolist(), [[0, 0]])
+		#The reference is now the changed frame.
+		self.assertTrue(detector(frame).unchanged)
+
+	def test_small_changes_add_up_next_to_dirty_tiles(self):
+		detector = ChangeDetector(tile_size=(4, 4), threshold=5)
+		frame = np.zeros((8, 8), dtype='uint8')
+		detector(frame)
+		reported = list()
+		for step in range(1, 8):
+			frame = frame.copy()
+			frame[:4, :4] = 4 * step
+			frame[4:, 4:] = 100 * (step % 2)
+			changes = detector(frame)
+			self.assertIn([1, 1], changes.dirty_tiles.tolist())
+			reported.extend(changes.dirty_tiles.tolist())
+		self.assertIn([0, 0], reported)
+		np.testing.assert_array_equal(detector.reference[4:, :4], 0)
+
+	def test_reset_and_shape_change(self):
+		self.detector(self.frame)
+		self.detector.reset()
+		self.assertEqual(len(self.detector(self.frame).dirty_tiles), 9)
+		changes = self.detector(np.zeros((16, 32), dtype='uint8'))
+		self.assertFalse(changes.unchanged)
+		self.assertTrue(changes.mask.all())
+		self.assertEqual(self.detector.tile_grid, (1, 2))
+
+	def test_dirty_regions(self):
+		changes = self.detector(self.frame)
+		regions = self.detector.dirty_regions(changes)
+		self.assertEqual(len(regions), 9)
+		for region in regions:
+			self.assertLessEqual(region.left + region.width, 40)
+			self.assertLessEqual(region.top + region.height, 36)
+		self.assertEqual(sum(region.width * region.height for region in regions), 36 * 40)
+
+	def test_skip_unchanged(self):
+		frames = [self.frame, self.frame.copy(), self.frame.copy(), self.frame + 1, self.frame + 1]
+		kept = list(skip_unchanged(frames, ChangeDetector(tile_size=(16, 16))))
+		self.assertEqual(len(kept), 2)
+		self.assertIs(kept[1][0], frames[3])
+		self.assertEqual(len(kept[1][1].dirty_tiles), 9)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import tempfile
+import pathlib
+
+from frame_recording import *
+from capture_backends import ReplayBackend
+from pixel_format import PixelFormat
+
+
+class TestFrameRecording(unittest.TestCase):
+	def test_record_and_read(self):
+		rng = np.random.default_rng(0)
+		frames = [rng.integers(0, 256, (4 + frame_no, 5, 3), dtype=np.uint8) for frame_no in range(20)]
+		frames.append(np.arange(6, dtype=np.float32).reshape(2, 3))
+		with tempfile.TemporaryDirectory() as directory:
+			with FrameRecorder(directory, chunk_size=1024) as recorder:
+				for timestamp_ns, frame in enumerate(frames):
+					self.assertEqual(recorder.append(frame, timestamp_ns=timestamp_ns), timestamp_ns)
+				with self.assertRaises(ValueError):
+					recorder.append(np.zeros(1025, dtype=np.uint8))
+			self.assertGreater(len(list(pathlib.Path(directory).glob('chunk_*.bin'))), 1)
+			with FrameReader(directory) as reader:
+				self.assertEqual(len(reader), len(frames))
+				for frame, recorded in zip(frames, reader):
+					np.testing.assert_array_equal(frame, recorded)
+				self.assertEqual(reader[-1].dtype, np.float32)
+				self.assertEqual([timestamp_ns for timestamp_ns, _ in reader.replay(start=18)], [18, 19, 20])
+				del frame, recorded
+
+	def test_replay_backend_plays_recording(self):
+		with tempfile.TemporaryDirectory() as directory:
+			with FrameRecorder(directory, chunk_size=1024) as recorder:
+				for value in range(3):
+					recorder.append(np.full((2, 2, 4), value, dtype=np.uint8))
+			with ReplayBackend(directory, loop=False) as backend:
+				values = [int(backend.grab(0, PixelFormat.BGR)[0, 0, 0]) for _ in range(3)]
+			self.assertEqual(values, [0, 1, 2])
@@ -0,0 +1,51 @@
+import unittest
+from multiprocessing import Process
+
+from frame_ring import *
+
+
+def produce(name, nof_frames):
+	with FrameRing.attach(name) as ring:
+		for frame_no in range(nof_frames):
+			ring.write(np.full(ring.shape, frame_no, dtype=ring.dtype), timeout=10)
+
+
+class TestFrameRing(unittest.TestCase):
+	def test_read_latest(self):
+		with FrameRing.create((4, 6, 3), nof_slots=3) as ring:
+			self.assertIsNone(ring.read_latest())
+			for value in range(5):
+				ring.write(np.full((4, 6, 3), value, dtype='uint8'))
+			frame = ring.read_latest()
+			self.assertEqual(frame.seq, 5)
+			self.assertTrue((frame.array == 4).all())
+			self.assertTrue(ring.is_valid(frame))
+			with ring.writing() as slot:
+				slot[...] = 5
+			self.assertTrue(ring.is_valid(ring.read_latest()))
+
+	def test_attach_sees_shape_and_dtype(self):
+		with FrameRing.create((2, 3), dtype='float32', nof_slots=2) as ring:
+			ring.write(np.ones((2, 3), dtype='float32'))
+			with FrameRing.attach(ring.name) as attached:
+				self.assertEqual(attached.shape, (2, 3))
+				self.assertEqual(attached.dtype, np.float32)
+				self.assertEqual(attached.read_latest().array.sum(), 6)
+
+	def test_no_drop_across_processes(self):
+		nof_frames = 50
+		with FrameRing.create((8, 8), nof_slots=2, nof_readers=1) as ring:
+			with ring.reader(0) as reader:
+				producer = Process(target=produce, args=(ring.name, nof_frames))
+				producer.start()
+				values = [int(reader.read(timeout=10).array[0, 0]) for _ in range(nof_frames)]
+				producer.join()
+			self.assertEqual(values, list(range(nof_frames)))
+
+	def test_no_drop_producer_times_out(self):
+		with FrameRing.create((1, ), nof_slots=2, nof_readers=1) as ring:
+			with ring.reader(0):
+				ring.write(np.zeros(1, dtype='uint8'))
+				ring.write(np.zeros(1, dtype='uint8'))
+				with self.assertRaises(TimeoutError):
+					ring.write(np.zeros(1, dtype='uint8'), timeout=0.01)
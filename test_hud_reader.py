@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+
+from hud_reader import HudReader, bar_fill, dominant_color, indicator, random_rois, read_reference
+from pixel_format import PixelFormat, convert
+
+
+class TestHudReader(unittest.TestCase):
+	def test_read(self):
+		frame = np.zeros((40, 60, 3), dtype='uint8')
+		frame[0:10, 0:15] = (200, 30, 30)
+		frame[20:30, 40:50] = (250, 250, 250)
+		rois = [
+			bar_fill('health', (0, 0, 20, 10), (210, 20, 40)),
+			indicator('light', (40, 20, 10, 10), threshold=200),
+			dominant_color('color', (0, 0, 10, 10), [(0, 0, 0), (255, 0, 0)]),
+			indicator('dark', (0, 30, 10, 10)),
+		]
+		for pixel_format in (PixelFormat.RGB, PixelFormat.BGRA):
+			reader = HudReader(rois, 60, 40, pixel_format)
+			state = reader.read(convert(frame, PixelFormat.RGB, pixel_format))
+			self.assertIs(state, reader.state)
+			self.assertEqual(state.dtype, np.float32)
+			self.assertEqual(reader.as_dict(), {'health': 0.75, 'light': 1.0, 'color': 1.0, 'dark': 0.0})
+
+	def test_matches_reference(self):
+		frame = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype='uint8')
+		rois = random_rois(60, 160, 120)
+		for pixel_format in PixelFormat:
+			converted = convert(frame, PixelFormat.RGB, pixel_format)
+			out = np.empty(len(rois), dtype=np.float32)
+			HudReader(rois, 160, 120, pixel_format).read(converted, out=out)
+			np.testing.assert_array_equal(out, read_reference(rois, converted, pixel_format))
+
+	def test_errors(self):
+		with self.assertRaises(ValueError):
+			HudReader([indicator('outside', (50, 0, 20, 10))], 60, 40)
+		with self.assertRaises(ValueError):
+			HudReader([indicator('light', (0, 0, 10, 10))], 60, 40).read(np.zeros((40, 60), dtype='uint8'))
+		with self.assertRaises(ValueError):
+			HudReader([indicator('light', (0, 0, 10, 10))], 60, 40).read(np.full((40, 60, 4), 255, dtype='uint8'))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,37 @@
+import tempfile
+import time
+import unittest
+import pathlib
+
+from keybindings import *
+from wrap_vjoy import SimulatedVJoyInterface, VJoyDevice, VJDHIDUsage
+
+
+class TestKeybindings(unittest.TestCase):
+	def test_save_load(self):
+		bindings = {
+			'throttle': Binding(ControlType.AXIS, VJDHIDUsage.HID_USAGE_Z, 0x4000),
+			'fire': Binding(ControlType.BUTTON, 1, True),
+			'look up': Binding(ControlType.DISCRETE_HAT, 1, VJoyDevice.DiscreteHatDirection.NORTH),
+			'look around': Binding(ControlType.CONTINUOUS_HAT, 1, 9000),
+		}
+		with tempfile.TemporaryDirectory() as directory:
+			path = pathlib.Path(directory) / 'keybindings.json'
+			save_bindings(bindings, path)
+			self.assertEqual(load_bindings(path), bindings)
+
+	def test_playback(self):
+		interface = SimulatedVJoyInterface()
+		bindings = {'fire': Binding(ControlType.BUTTON, 2, True), 'fire released': Binding(ControlType.BUTTON, 2, False)}
+		with VJoyDevice(report_id=1, interface=interface) as dev, Playback(dev, bindings) as playback:
+			start = time.perf_counter()
+			done = playback.play(repeat(tap('fire', 'fire released', duration=0.01), nof_times=3, period=0.02))
+			self.assertFalse(done.done())
+			done.result(timeout=1)
+			self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+			self.assertEqual(playback.nof_steps, 6)
+			self.assertFalse(dev.state.get_button(2))
+			stopped = playback.play([Step(10.0, 'fire')])
+			playback.stop()
+			with self.assertRaises(PlaybackStopped):
+				stopped.result(timeout=1)
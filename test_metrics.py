@@ -0,0 +1,37 @@
+import json
+import pathlib
+import tempfile
+import unittest
+
+from metrics import *
+
+
+class TestMetrics(unittest.TestCase):
+	def test_histogram_percentiles(self):
+		histogram = Histogram('latency')
+		for value in range(1, 1001):
+			histogram.observe(value * 1e-5)
+		snapshot = histogram.snapshot()
+		self.assertEqual(snapshot['count'], 1000)
+		#Buckets are a quarter octave wide, percentiles are within 19% above the exact value.
+		for percentile, exact in ((50, 500e-5), (99, 990e-5)):
+			self.assertGreaterEqual(snapshot[f'p{percentile}'], exact)
+			self.assertLess(snapshot[f'p{percentile}'], exact * 1.19)
+		self.assertEqual(snapshot['max'], 1000e-5)
+
+	def test_registry(self):
+		registry = Registry()
+		registry.counter('frames').inc()
+		registry.counter('frames').inc(2)
+		registry.gauge('fps').set(60)
+		with registry.histogram('read').time():
+			pass
+		with self.assertRaises(TypeError):
+			registry.gauge('frames')
+		snapshot = registry.snapshot()
+		self.assertEqual((snapshot['frames'], snapshot['fps'], snapshot['read']['count']), (3, 60, 1))
+		with tempfile.TemporaryDirectory() as directory:
+			path = pathlib.Path(directory) / 'metrics.jsonl'
+			with PeriodicDumper(registry, interval=0.01, path=path):
+				pass
+			self.assertEqual(json.loads(path.read_text().splitlines()[-1])['metrics']['frames'], 3)
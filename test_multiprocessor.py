@@ -0,0 +1,84 @@
+import unittest
+import os
+
+from multiprocessor import *
+
+
+def square(value):
+	return value * value
+
+
+def pid(_=None):
+	return os.getpid()
+
+
+def fail(message):
+	raise ValueError(message)
+
+
+def die(value):
+	if value:
+		os._exit(1)
+	return value
+
+
+def unpicklable(_=None):
+	return lambda: None
+
+
+class TestCall(unittest.TestCase):
+	def test_process_per_call(self):
+		call = Call(square)
+		self.assertEqual(call(3), 9)
+		self.assertEqual([future.result() for future in [call.submit(value) for value in range(4)]], [0, 1, 4, 9])
+		call.shutdown()
+
+	def test_pool_results_are_not_mixed_up(self):
+		with Call(square, nof_workers=3) as call:
+			futures = [call.submit(value) for value in range(50)]
+			self.assertEqual([future.result(timeout=30) for future in futures], [value * value for value in range(50)])
+
+	def test_pool_reuses_workers(self):
+		with Call(pid, nof_workers=2) as call:
+			pids = {future.result(timeout=30) for future in [call.submit() for _ in range(20)]}
+		self.assertLessEqual(len(pids), 2)
+
+	def test_pool_recycles_workers(self):
+		with Call(pid, nof_workers=1, max_tasks_per_worker=2) as call:
+			pids = [call() for _ in range(6)]
+		self.assertEqual(len(set(pids)), 3)
+
+	def test_shutdown_runs_calls_queued_behind_recycling(self):
+		call = Call(square, nof_workers=1, max_tasks_per_worker=2)
+		futures = [call.submit(value) for value in range(5)]
+		call.shutdown()
+		self.assertEqual([future.result(timeout=30) for future in futures], [0, 1, 4, 9, 16])
+		self.assertEqual(call.workers, dict())
+
+	def test_exception_is_propagated(self):
+		with Call(fail, nof_workers=1) as call:
+			with self.assertRaisesRegex(ValueError, 'boom'):
+				call('boom')
+			self.assertEqual(call.submit('again').exception(timeout=30).args, ('again', ))
+
+	def test_submit_after_shutdown(self):
+		call = Call(square, nof_workers=1)
+		call.shutdown()
+		with self.assertRaises(RuntimeError):
+			call.submit(1)
+
+	def test_worker_death_fails_the_call(self):
+		with Call(die, nof_workers=1, poll_interval=0.1) as call:
+			with self.assertRaises(WorkerDied):
+				call.submit(1).result(timeout=30)
+			#The dead worker was replaced.
+			self.assertEqual(call.submit(0).result(timeout=30), 0)
+		call = Call(die, poll_interval=0.1)
+		self.assertIsInstance(call.submit(1).exception(timeout=30), WorkerDied)
+		call.shutdown()
+
+	def test_unpicklable_result_fails_the_call(self):
+		for nof_workers in (0, 1):
+			with Call(unpicklable, nof_workers=nof_workers) as call:
+				self.assertIsNotNone(call.submit().exception(timeout=30))
+				self.assertIsNotNone(call.submit().exception(timeout=30))
@@ -0,0 +1,36 @@
+import time
+import unittest
+
+from output_coalescer import OutputCoalescer
+from wrap_vjoy import SimulatedVJoyInterface, VJoyDevice, VJDHIDUsage
+
+
+class TestOutputCoalescer(unittest.TestCase):
+	def test_coalesce_and_drop(self):
+		interface = SimulatedVJoyInterface()
+		with VJoyDevice(report_id=1, interface=interface) as dev:
+			output = OutputCoalescer(dev, rate=125)
+			for value in (0x10, 0x20, 0x30):
+				output.set_axis(VJDHIDUsage.HID_USAGE_X, value)
+			output.set_button(1, False)
+			self.assertTrue(output.flush())
+			self.assertFalse(output.flush())
+			output.set_button(2, True)
+			output.set_button(2, False)
+			self.assertFalse(output.flush())
+			statistics = output.statistics()
+			self.assertEqual((statistics['writes'], statistics['coalesced'], statistics['dropped'], statistics['commits']), (6, 3, 1, 1))
+			self.assertEqual(interface.position(1).wAxisX, 0x30)
+			self.assertEqual(interface.devices[1].nof_updates, 1)
+
+	def test_flush_rate(self):
+		interface = SimulatedVJoyInterface()
+		with VJoyDevice(report_id=1, interface=interface) as dev:
+			with OutputCoalescer(dev, rate=250) as output:
+				for value in range(1, 0x8000, 0x10):
+					output.set_axis(VJDHIDUsage.HID_USAGE_Y, value)
+				time.sleep(0.1)
+			statistics = output.statistics()
+			self.assertLess(statistics['commits'], statistics['writes'])
+			self.assertLess(statistics['flushes'], 250 * 0.1 * 2)
+			self.assertEqual(dev.state.axes[VJDHIDUsage.HID_USAGE_Y], interface.position(1).wAxisY)
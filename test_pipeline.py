@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from pipeline import LatestSlot, Pipeline
+
+
+class FakeDevice:
+	def __init__(self):
+		self.actions = list()
+
+
+def capture():
+	time.sleep(0.001)
+	return [time.perf_counter()]
+
+
+def decide(frames):
+	return frames[0]
+
+
+def actuate(device, action):
+	device.actions.append(action)
+
+
+class TestLatestSlot(unittest.TestCase):
+	def test_replace(self):
+		slot = LatestSlot()
+		for item in range(3):
+			slot.put(item)
+		self.assertEqual(slot.nof_replaced, 2)
+		self.assertEqual(slot.get(), 2)
+		self.assertIsNone(slot.get(timeout=0.01))
+
+	def test_close(self):
+		slot = LatestSlot()
+		results = list()
+		getter = threading.Thread(target=lambda: results.append(slot.get()))
+		getter.start()
+		slot.close()
+		getter.join(timeout=5)
+		self.assertEqual(results, [None])
+		self.assertIsNone(slot.get())
+
+
+class TestPipeline(unittest.TestCase):
+	def test_run(self):
+		device = FakeDevice()
+		pipeline = Pipeline(capture, decide, device, latency_budget=1.0, actuate=actuate)
+		pipeline.run(0.1)
+		self.assertGreater(len(device.actions), 0)
+		self.assertEqual(device.actions, sorted(device.actions))
+		statistics = pipeline.statistics()
+		self.assertEqual(set(statistics), {'stages', 'replaced', 'replaced_actions', 'stale', 'over_budget', 'latency_budget'})
+		self.assertEqual(set(statistics['stages']), {'capture', 'decide', 'actuate', 'end_to_end'})
+		self.assertEqual(set(statistics['stages']['decide']), {'count', 'mean', 'max', 'last'})
+		self.assertEqual(statistics['stages']['actuate']['count'], len(device.actions))
+		self.assertEqual(statistics['stale'], 0)
+
+	def test_stale_frames_are_dropped(self):
+		decided = list()
+		pipeline = Pipeline(capture, decided.append, FakeDevice(), latency_budget=0.0)
+		pipeline.run(0.05)
+		self.assertEqual(decided, [])
+		self.assertGreater(pipeline.statistics()['stale'], 0)
+
+	def test_failing_stage(self):
+		def fail(frames):
+			raise ValueError('boom')
+
+		with self.assertRaisesRegex(ValueError, 'boom'):
+			Pipeline(capture, fail, FakeDevice()).run(10)
+		pipeline = Pipeline(capture, decide, FakeDevice(), actuate=lambda device, action: fail(action)).start()
+		while pipeline.running.is_set():
+			time.sleep(0.001)
+		with self.assertRaisesRegex(ValueError, 'boom'):
+			pipeline.stop()
+
+
+if __name__ == '__main__':
+	unittest.main()
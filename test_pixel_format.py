@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from pixel_format import *
+
+
+class TestPixelFormat(unittest.TestCase):
+	def setUp(self):
+		self.bgra = np.random.default_rng(0).integers(0, 256, (6, 10, 4), dtype='uint8')
+
+	def test_frame_shape(self):
+		self.assertEqual(frame_shape(6, 10, PixelFormat.GRAY), (6, 10))
+		self.assertEqual(frame_shape(6, 10, PixelFormat.BGRA), (6, 10, 4))
+		self.assertEqual(allocate_frame(6, 10, PixelFormat.RGB).shape, (6, 10, 3))
+
+	def test_bgra_is_not_converted(self):
+		self.assertIs(convert_bgra(self.bgra, PixelFormat.BGRA), self.bgra)
+		self.assertIs(convert(self.bgra, PixelFormat.BGRA, PixelFormat.BGRA), self.bgra)
+
+	def test_round_trips(self):
+		bgr = self.bgra[..., :3]
+		rgb = convert_bgra(self.bgra, PixelFormat.RGB)
+		np.testing.assert_array_equal(rgb, bgr[..., ::-1])
+		np.testing.assert_array_equal(convert(rgb, PixelFormat.RGB, PixelFormat.BGR), bgr)
+		np.testing.assert_array_equal(convert(convert(bgr, PixelFormat.BGR, PixelFormat.RGB), PixelFormat.RGB, PixelFormat.BGR), bgr)
+		np.testing.assert_array_equal(convert(rgb, PixelFormat.RGB, PixelFormat.BGRA)[..., :3], bgr)
+		gray = convert_bgra(self.bgra, PixelFormat.GRAY)
+		np.testing.assert_array_equal(gray, convert(rgb, PixelFormat.RGB, PixelFormat.GRAY))
+		np.testing.assert_array_equal(convert(gray, PixelFormat.GRAY, PixelFormat.BGR), np.repeat(gray[..., np.newaxis], 3, axis=2))
+
+	def test_out(self):
+		for from_format in (PixelFormat.BGRA, PixelFormat.RGB):
+			frame = convert_bgra(self.bgra, from_format)
+			for to_format in PixelFormat:
+				out = allocate_frame(6, 10, to_format)
+				self.assertIs(convert(frame, from_format, to_format, out=out), out)
+				np.testing.assert_array_equal(out, convert(frame, from_format, to_format))
+
+	def test_out_errors(self):
+		for out in (np.empty((6, 10, 4), dtype='uint8'), np.empty((6, 10, 3), dtype=np.float32),
+			np.empty((6, 20, 3), dtype='uint8')[:, ::2]):
+			with self.assertRaises(ValueError):
+				convert_bgra(self.bgra, PixelFormat.RGB, out=out)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from pixel_format import PixelFormat
+from preprocessing import Preprocessor
+
+
+def constant_frame(value, width=8, height=6, nof_channels=None):
+	shape = (height, width) if nof_channels is None else (height, width, nof_channels)
+	return np.full(shape, value, dtype='uint8')
+
+
+class TestPreprocessor(unittest.TestCase):
+	def test_stack_order(self):
+		preprocessor = Preprocessor((8, 6), input_format=PixelFormat.GRAY, nof_stacked=3, dtype='uint8')
+		expected = [[1, 1, 1], [1, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5], [4, 5, 6], [5, 6, 7]]
+		for value, stack in enumerate(expected, start=1):
+			result = preprocessor.process(constant_frame(value))
+			self.assertEqual(result.shape, (3, 6, 8, 1))
+			self.assertEqual(result[:, 0, 0, 0].tolist(), stack)
+		preprocessor.reset()
+		self.assertEqual(preprocessor.process(constant_frame(9))[:, 0, 0, 0].tolist(), [9, 9, 9])
+
+	def test_shapes(self):
+		frame = np.random.default_rng(0).integers(0, 256, (48, 64, 3), dtype='uint8')
+		preprocessor = Preprocessor((64, 48), crop=(8, 4, 32, 24), size=(16, 12), grayscale=True, nof_stacked=4)
+		self.assertEqual(preprocessor.process(frame).shape, (4, 12, 16, 1))
+		self.assertEqual(preprocessor.output_shape, (1, 4, 12, 16, 1))
+		self.assertEqual(Preprocessor((64, 48), crop=(8, 4, 32, 24)).process(frame).shape, (1, 24, 32, 3))
+		cropped = Preprocessor((64, 48), crop=(8, 4, 32, 24), dtype='uint8').process(frame)
+		np.testing.assert_array_equal(cropped[0], frame[4:28, 8:40])
+
+	def test_dtypes(self):
+		frame = constant_frame(51, nof_channels=3)
+		result = Preprocessor((8, 6), dtype='uint8').process(frame)
+		self.assertEqual(result.dtype, np.uint8)
+		self.assertTrue((result == 51).all())
+		result = Preprocessor((8, 6)).process(frame)
+		self.assertEqual(result.dtype, np.float32)
+		np.testing.assert_allclose(result, 0.2)
+		result = Preprocessor((8, 6), scale=1.0, mean=50.0, std=0.5).process(frame)
+		np.testing.assert_allclose(result, 2.0)
+
+	def test_streams(self):
+		preprocessor = Preprocessor((8, 6), input_format=PixelFormat.GRAY, nof_streams=2, nof_stacked=2, dtype='uint8')
+		preprocessor([constant_frame(1), constant_frame(10)])
+		result = preprocessor([constant_frame(2), constant_frame(20)])
+		self.assertEqual(result.shape, (2, 2, 6, 8, 1))
+		self.assertEqual(result[:, :, 0, 0, 0].tolist(), [[1, 2], [10, 20]])
+
+	def test_errors(self):
+		with self.assertRaises(ValueError):
+			Preprocessor((8, 6), crop=(4, 0, 8, 6))
+		preprocessor = Preprocessor((8, 6), nof_streams=2)
+		with self.assertRaises(ValueError):
+			preprocessor([constant_frame(0, nof_channels=3)])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+import numpy as np
+
+from region import *
+from pixel_format import PixelFormat
+
+
+class TestRegion(unittest.TestCase):
+	def test_to_regions(self):
+		self.assertEqual(to_regions([(1, 2, 3, 4), Region(0, 0, 5, 5)]), (Region(1, 2, 3, 4), Region(0, 0, 5, 5)))
+
+	def test_check_regions(self):
+		check_regions(to_regions([(0, 0, 10, 6), (9, 5, 1, 1)]), 10, 6)
+		for region in ((-1, 0, 2, 2), (0, -1, 2, 2), (9, 0, 2, 2), (0, 5, 2, 2), (0, 0, 0, 2), (0, 0, 2, 0)):
+			with self.assertRaises(ValueError):
+				check_regions([Region(*region)], 10, 6)
+
+	def test_allocate_batch(self):
+		batch = allocate_batch(to_regions([(0, 0, 4, 2), (4, 2, 4, 2)]), PixelFormat.BGRA)
+		self.assertIsInstance(batch, np.ndarray)
+		self.assertEqual((batch.shape, batch.dtype), ((2, 2, 4, 4), np.uint8))
+		shots = allocate_batch(to_regions([(0, 0, 4, 2), (0, 0, 3, 1)]), PixelFormat.GRAY)
+		self.assertEqual([shot.shape for shot in shots], [(2, 4), (1, 3)])
+		self.assertTrue(is_batchable([]))
+		self.assertEqual(allocate_batch((), PixelFormat.RGB), [])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,5 +1,11 @@
 import unittest
+import time
+
+import numpy as np
+
 from screenshot import *
+from capture_backends import SyntheticBackend
+from pixel_format import allocate_frame
 
 
 class TestScreenshot(unittest.TestCase):
@@ -15,3 +21,50 @@ class TestScreenshot(unittest.TestCase):
 			raise
 		finally:
 			logging.info("THE END")
+
+
+class CountingBackend(SyntheticBackend):
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.nof_opens = 0
+		self.nof_closes = 0
+
+	def open(self):
+		self.nof_opens += 1
+		super().open()
+
+	def close(self):
+		self.nof_closes += 1
+		super().close()
+
+
+class TestCaptureSession(unittest.TestCase):
+	def test_read_needs_enter(self):
+		with self.assertRaises(RuntimeError):
+			CaptureSession(backend=SyntheticBackend(width=8, height=4)).read()
+
+	def test_backend_is_opened_once(self):
+		backend = CountingBackend(width=8, height=4, nof_sources=2)
+		with CaptureSession(backend=backend, pixel_format=PixelFormat.BGR) as session:
+			for frame_no, shots in zip(range(3), session):
+				self.assertEqual([shot.shape for shot in shots], [(4, 8, 3), (4, 8, 3)])
+				np.testing.assert_array_equal(shots[1], backend.frame(1, frame_no)[..., :3])
+		self.assertEqual((backend.nof_opens, backend.nof_closes), (1, 1))
+		self.assertEqual(session.statistics()['frames'], 3)
+
+	def test_read_into_out(self):
+		out = [allocate_frame(4, 8, PixelFormat.GRAY)]
+		with CaptureSession(backend=SyntheticBackend(width=8, height=4), pixel_format=PixelFormat.GRAY) as session:
+			shots = session.read(out=out)
+		self.assertIs(shots[0], out[0])
+
+	def test_fps(self):
+		with CaptureSession(backend=SyntheticBackend(width=8, height=4), fps=100) as session:
+			start = time.perf_counter()
+			for _ in range(5):
+				session.read()
+			elapsed = time.perf_counter() - start
+			statistics = session.statistics()
+		self.assertGreaterEqual(elapsed, 0.035)
+		self.assertEqual((statistics['frames'], statistics['dropped']), (5, 0))
+		self.assertEqual(set(statistics), {'frames', 'late', 'dropped', 'fps'})
@@ -0,0 +1,81 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from pixel_format import PixelFormat
+from template_matching import TemplateMatcher, _synthetic_frame
+
+
+def _sharp_frame(width=640, height=480, seed=0):
+	"""Text and rectangle outlines without blur, like HUDs and menus: full of look-alikes at coarse levels."""
+	rng = np.random.default_rng(seed)
+	frame = np.full((height, width), 30, dtype='uint8')
+	for _ in range(40):
+		left, top = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 30))
+		cv2.rectangle(frame, (left, top), (left + int(rng.integers(20, 120)), top + int(rng.integers(10, 60))),
+			int(rng.integers(100, 256)), 1)
+	for _ in range(40):
+		cv2.putText(frame, ''.join(rng.choice(list('ABCDEFGHIJ0123456789'), 6)),
+			(int(rng.integers(0, width - 100)), int(rng.integers(15, height))), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+			int(rng.integers(150, 256)), 1)
+	return frame
+
+
+class TestTemplateMatching(unittest.TestCase):
+	def setUp(self):
+		self.frame = _synthetic_frame(320, 240)
+		self.template = self.frame[100:148, 200:264]
+
+	def test_match(self):
+		matcher = TemplateMatcher()
+		matcher.add('present', cv2.cvtColor(self.template, cv2.COLOR_GRAY2BGR), PixelFormat.BGR)
+		matcher.add('absent', _synthetic_frame(320, 240, seed=1)[10:58, 10:74], PixelFormat.GRAY)
+		rgb = cv2.cvtColor(self.frame, cv2.COLOR_GRAY2RGB)
+		matches = matcher.match(rgb, PixelFormat.RGB)
+		self.assertEqual([(match.name, match.left, match.top, match.width, match.height) for match in matches],
+			[('present', 200, 100, 64, 48)])
+		self.assertAlmostEqual(matches[0].score, 1.0, places=3)
+		self.assertEqual(matcher.nof_rejections, 1)
+		self.assertEqual(matcher.match_batch(np.stack([rgb, rgb]), PixelFormat.RGB), [matches, matches])
+
+	def test_roi(self):
+		matcher = TemplateMatcher()
+		matcher.add('inside', self.template, PixelFormat.GRAY, roi=(150, 80, 150, 100))
+		matcher.add('outside', self.template, PixelFormat.GRAY, roi=(0, 0, 150, 240))
+		self.assertEqual([match.name for match in matcher.match(self.frame, PixelFormat.GRAY)], ['inside'])
+		matcher.add('too large', self.template, PixelFormat.GRAY, roi=(300, 0, 100, 100))
+		with self.assertRaises(ValueError):
+			matcher.match(self.frame, PixelFormat.GRAY)
+
+	def test_scales(self):
+		scaled = cv2.resize(self.template, (80, 60), interpolation=cv2.INTER_LINEAR)
+		matcher = TemplateMatcher(scales=(0.8, 1.0, 1.25), threshold=0.9)
+		matcher.add('scaled', scaled, PixelFormat.GRAY)
+		(match, ) = matcher.match(self.frame, PixelFormat.GRAY)
+		self.assertEqual(match.scale, 0.8)
+		self.assertLessEqual(abs(match.left - 200) + abs(match.top - 100), 2)
+
+	def test_sharp_content(self):
+		frame = _sharp_frame()
+		rng = np.random.default_rng(5)
+		matcher = TemplateMatcher(threshold=0.9)
+		crops = dict()
+		while len(crops) < 60:
+			#Odd sizes and offsets, so the crops do not line up with the pyramid's pixels.
+			width, height = 2 * int(rng.integers(8, 32)) + 1, 2 * int(rng.integers(8, 24)) + 1
+			left, top = 2 * int(rng.integers(0, (640 - width) // 2)) + 1, 2 * int(rng.integers(0, (480 - height) // 2)) + 1
+			crop = frame[top:top + height, left:left + width]
+			if crop.std() > 20:
+				matcher.add(len(crops), crop, PixelFormat.GRAY)
+				crops[len(crops)] = crop
+		matches = matcher.match(frame, PixelFormat.GRAY)
+		self.assertEqual([match.name for match in matches], list(crops))
+		for match in matches:
+			#Outlines and strokes recur elsewhere in the frame (in other intensities), any perfect match is right.
+			window = frame[match.top:match.top + match.height, match.left:match.left + match.width]
+			self.assertGreater(cv2.matchTemplate(window, crops[match.name], cv2.TM_CCOEFF_NORMED)[0, 0], 0.999)
+
+
+if __name__ == '__main__':
+	unittest.main()
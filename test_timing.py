@@ -0,0 +1,39 @@
+import threading
+import time
+import unittest
+
+from timing import LatenessHistogram, PeriodicTicker, sleep_until
+
+
+class TestTiming(unittest.TestCase):
+	def test_sleep_until(self):
+		deadline_ns = time.perf_counter_ns() + 5000000
+		lateness_ns = sleep_until(deadline_ns)
+		self.assertGreaterEqual(time.perf_counter_ns(), deadline_ns)
+		self.assertGreaterEqual(lateness_ns, 0)
+		event = threading.Event()
+		event.set()
+		self.assertIsNone(sleep_until(time.perf_counter_ns() + 10**9, event=event))
+
+	def test_ticker_skips_missed_ticks(self):
+		ticker = PeriodicTicker(0.002)
+		ticker.start()
+		ticker.wait()
+		time.sleep(0.011)
+		ticker.wait()
+		self.assertGreaterEqual(ticker.nof_missed, 4)
+		start_ns = ticker.next_ns
+		for _ in range(10):
+			self.assertLess(ticker.wait(), ticker.period_ns)
+		#Ticks stay on the grid, however late they are.
+		self.assertEqual((ticker.next_ns - start_ns) % ticker.period_ns, 0)
+		self.assertGreaterEqual(ticker.next_ns - start_ns, 10 * ticker.period_ns)
+		self.assertEqual(ticker.lateness.count, 12)
+
+	def test_histogram(self):
+		histogram = LatenessHistogram()
+		for lateness_ns in (500, 1500, 1500, 10**10):
+			histogram.add(lateness_ns)
+		self.assertEqual(histogram.percentile_ns(50), 2000)
+		self.assertEqual(histogram.percentile_ns(100), 10**10)
+		self.assertEqual(histogram.as_dict()['buckets'], {'<=1000': 1, '<=2000': 2, f'>{LatenessHistogram.EDGES_NS[-1]}': 1})
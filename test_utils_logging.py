@@ -0,0 +1,79 @@
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+
+import utils_logging
+
+
+class TestUtilsLogging(unittest.TestCase):
+	def test_bounded_queue_drops(self):
+		handler = utils_logging.BoundedQueueHandler(max_size=2)
+		for record_no in range(5):
+			handler.handle(logging.makeLogRecord({'msg': f'record {record_no}'}))
+		self.assertEqual((handler.queue.qsize(), handler.nof_dropped), (2, 3))
+
+	def test_level_sees_through_queue(self):
+		handler = utils_logging.BoundedQueueHandler()
+		handler.handlers = [logging.NullHandler(logging.INFO), logging.NullHandler(logging.WARNING)]
+		self.assertEqual(handler.level, logging.INFO)
+		logger = logging.Logger('test_level_sees_through_queue')
+		logger.addHandler(handler)
+		self.assertFalse(utils_logging.debug_enabled(logger))
+		handler.handlers[0].setLevel(logging.DEBUG)
+		self.assertTrue(utils_logging.debug_enabled(logger))
+
+	def test_jsonl_to_html(self):
+		record = logging.makeLogRecord({'msg': '<%s>', 'args': ('message', ), 'levelno': logging.INFO, 'levelname': 'INFO'})
+		with tempfile.TemporaryDirectory() as directory:
+			jsonl_path = pathlib.Path(directory) / 'log.jsonl'
+			jsonl_path.write_text(utils_logging.JsonLinesFormatter().format(record) + '\n')
+			html_log = utils_logging.jsonl_to_html(jsonl_path).read_text()
+		self.assertIn('<div class="message">&lt;message&gt;</div>', html_log)
+
+	def test_rotating_log_starts_new_file(self):
+		cwd = os.getcwd()
+		with tempfile.TemporaryDirectory() as directory:
+			os.chdir(directory)
+			try:
+				for backup_count in (0, 1):
+					for run in ('first', 'second'):
+						handler = utils_logging.LogDirFileHandler(f'log{backup_count}.txt', mode='w', max_bytes=2**20, backup_count=backup_count)
+						handler.emit(logging.makeLogRecord({'msg': run}))
+						handler.close()
+					self.assertEqual(pathlib.Path(f'log/log{backup_count}.txt').read_text().split(), ['second'])
+				self.assertEqual(pathlib.Path('log/log1.txt.1').read_text().split(), ['first'])
+			finally:
+				os.chdir(cwd)
+
+	def test_message_is_formatted_when_queued(self):
+		handler = utils_logging.BoundedQueueHandler()
+		state = ['before']
+		try:
+			raise ValueError('boom')
+		except ValueError:
+			record = logging.LogRecord('test', logging.ERROR, __file__, 1, '%s', (state, ), sys.exc_info())
+		handler.handle(record)
+		state[0] = 'after'
+		queued = handler.queue.get_nowait()
+		self.assertEqual((queued.msg, queued.args, queued.exc_info), ("['before']", None, None))
+		self.assertIn('ValueError: boom', queued.exc_text)
+		self.assertIn('boom', utils_logging.JsonLinesFormatter().format(queued))
+
+	def test_html_formatter_escapes(self):
+		record = logging.makeLogRecord({'msg': '%s', 'args': ('<b>&</b>', ), 'levelno': logging.INFO, 'levelname': 'INFO'})
+		formatted = utils_logging.LOG_FORMATTERS['html'].format(record)
+		self.assertIn('<div class="message">&lt;b&gt;&amp;&lt;/b&gt;</div>', formatted)
+		self.assertEqual(record.getMessage(), '<b>&</b>')
+
+	def test_call_with_clashing_argument_names(self):
+
+		def function(decorated_function, signature=None, **kwargs):
+			pass
+
+		text = utils_logging.call_entry_to_string(function, 1, signature=2, args=3)
+		self.assertIn("(decorated_function=1,signature=2,kwargs={'args': 3})", text)
+		call = utils_logging._LazyCall(function, (1, ), {'signature': 2})
+		self.assertIn('(decorated_function=1,signature=2)', str(call))
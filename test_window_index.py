@@ -0,0 +1,54 @@
+import re
+import unittest
+
+from window_index import FakeWindowSource, WindowIndex, WindowInfo, fake_windows
+
+
+class TestWindowIndex(unittest.TestCase):
+	def setUp(self):
+		self.source = FakeWindowSource([
+			WindowInfo(1, 100, 10, 'Untitled - Notepad', 'Notepad'),
+			WindowInfo(2, 100, 10, '', 'IME'),
+			WindowInfo(3, 200, 20, 'aijoystick', 'ConsoleWindowClass'),
+		])
+		self.index = WindowIndex(self.source, ttl=float('inf'), full_refresh_interval=float('inf'))
+
+	def test_find(self):
+		self.assertEqual(self.index.find(window_name_regex='.*Notepad'), {1})
+		self.assertEqual(self.index.find(window_class_name_regex=re.compile('Console')), {3})
+		self.assertEqual(self.index.find(process_id=100), {1, 2})
+		self.assertEqual(self.index.find(window_name='aijoystick', window_class_name='Notepad'), set())
+		self.assertEqual(self.index.find(window_class_name='IME', window_handle=3), {2, 3})
+		self.assertEqual(set(self.index.process_information(200)), {(3, 200, 20)})
+
+	def test_incremental_refresh(self):
+		self.index.refresh()
+		self.assertEqual(self.source.nof_information_calls, 3)
+		self.source.add(WindowInfo(4, 200, 21, 'Notepad 2', 'Notepad'))
+		self.source.remove(1)
+		self.source.rename(3, 'renamed')
+		self.index.refresh()
+		self.assertEqual(self.source.nof_information_calls, 4)
+		self.assertEqual(self.index.find(window_class_name='Notepad'), {4})
+		#Titles of known windows are only re-queried by a full refresh.
+		self.assertEqual(self.index.find(window_name='aijoystick'), {3})
+		self.index.refresh(full=True)
+		self.assertEqual(self.index.find(window_name='aijoystick'), set())
+		self.assertEqual(self.index.get(3).window_name, 'renamed')
+		self.assertNotIn('aijoystick', self.index.by_window_name)
+
+	def test_ttl(self):
+		self.index.ttl = 0
+		self.index.find(process_id=100)
+		self.index.find(process_id=100)
+		self.assertEqual(self.source.nof_enumerations, 2)
+		self.assertEqual(self.source.nof_information_calls, 3)
+
+	def test_many_windows(self):
+		index = WindowIndex(FakeWindowSource(fake_windows(5000)))
+		self.assertEqual(len(index.find(window_class_name='Notepad')), 834)
+		self.assertEqual(len(index.find(window_name_regex='Notepad window')), 417)
+
+
+if __name__ == '__main__':
+	unittest.main()
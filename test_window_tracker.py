@@ -0,0 +1,45 @@
+import unittest
+
+from window_tracker import FakeWindowProvider, Geometry, WindowChange, WindowClosed, WindowTracker
+
+
+class TestWindowTracker(unittest.TestCase):
+	def setUp(self):
+		self.provider = FakeWindowProvider({1: Geometry(0, 0, 640, 480)})
+		self.changes = list()
+		self.tracker = WindowTracker(1, provider=self.provider, interval=0)
+		self.tracker.subscribe(lambda tracker, change, previous: self.changes.append((change, previous)))
+
+	def test_changes(self):
+		self.assertEqual(self.tracker.revalidate(), [])
+		self.provider.move(1, 10, 20)
+		self.assertEqual(self.tracker.revalidate(), [WindowChange.MOVED])
+		self.provider.resize(1, 800, 600)
+		self.assertEqual(self.tracker.revalidate(), [WindowChange.RESIZED])
+		self.assertEqual(self.tracker.size, (800, 600))
+		self.assertEqual(self.changes, [(WindowChange.MOVED, Geometry(0, 0, 640, 480)),
+			(WindowChange.RESIZED, Geometry(10, 20, 640, 480))])
+
+	def test_closed(self):
+		self.provider.close(1)
+		self.assertEqual(self.tracker.revalidate(), [WindowChange.CLOSED])
+		self.assertFalse(self.tracker.valid)
+		with self.assertRaises(WindowClosed):
+			self.tracker.size
+		#The handle may be reused by another window.
+		self.provider.windows[1] = Geometry(0, 0, 10, 10)
+		self.assertEqual(self.tracker.revalidate(), [])
+		self.assertFalse(self.tracker.valid)
+
+	def test_interval(self):
+		self.tracker.interval = 3600
+		nof_queries = self.provider.nof_queries
+		self.provider.resize(1, 800, 600)
+		self.assertEqual(self.tracker.revalidate(), [])
+		self.assertEqual(self.tracker.size, (640, 480))
+		self.assertEqual(self.provider.nof_queries, nof_queries)
+		self.assertEqual(self.tracker.revalidate(force=True), [WindowChange.RESIZED])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -25,3 +25,93 @@ class TestVJoyDevice(unittest.TestCase):
 					dev.set_continuous_hat(chat, value)
 			dev.reset_hats()
 			dev.reset()
+
+
+class CountingInterface(SimulatedVJoyInterface):
+	"""Counts the capability queries."""
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.nof_queries = 0
+
+	def GetVJDAxisExist(self, rID, Axis):
+		self.nof_queries += 1
+		return super().GetVJDAxisExist(rID, Axis)
+
+	def GetVJDButtonNumber(self, rID):
+		self.nof_queries += 1
+		return super().GetVJDButtonNumber(rID)
+
+	def GetVJDDiscPovNumber(self, rID):
+		self.nof_queries += 1
+		return super().GetVJDDiscPovNumber(rID)
+
+	def GetVJDContPovNumber(self, rID):
+		self.nof_queries += 1
+		return super().GetVJDContPovNumber(rID)
+
+
+class TestCapabilities(unittest.TestCase):
+	def test_setters_use_cached_capabilities(self):
+		interface = CountingInterface()
+		with VJoyDevice(report_id=1, interface=interface) as dev:
+			self.assertGreater(interface.nof_queries, 0)
+			self.assertEqual(dev.capabilities, SimulatedVJoyInterface.DEFAULT_CAPABILITIES)
+			interface.nof_queries = 0
+			for value in range(1, 0x8000, 0x800):
+				dev.set_axis(VJDHIDUsage.HID_USAGE_X, value)
+				dev.set_button(1, value % 2 == 1)
+				dev.set_discrete_hat(1, VJoyDevice.DiscreteHatDirection.NORTH)
+			self.assertEqual((dev.get_nof_buttons(), dev.get_nof_discrete_hats()), (32, 4))
+			self.assertEqual(interface.nof_queries, 0)
+			with self.assertRaises(ValueError):
+				dev.set_axis(VJDHIDUsage.HID_USAGE_X, 0x8001)
+			with self.assertRaises(ValueError):
+				dev.set_button(33, True)
+
+	def test_not_entered_queries_the_driver(self):
+		interface = CountingInterface()
+		dev = VJoyDevice(report_id=1, interface=interface)
+		self.assertEqual(dev.get_nof_buttons(), 32)
+		self.assertGreater(interface.nof_queries, 0)
+
+
+class TestSimulatedVJoyInterface(unittest.TestCase):
+	def test_busy(self):
+		interface = SimulatedVJoyInterface()
+		with VJoyDevice(report_id=1, interface=interface.as_process(1)):
+			self.assertEqual(interface.GetVJDStatus(1), VJDStatus.VJD_STAT_BUSY)
+			with self.assertRaises(RuntimeError):
+				VJoyDevice(report_id=1, interface=interface).__enter__()
+		self.assertEqual(interface.GetVJDStatus(1), VJDStatus.VJD_STAT_FREE)
+		self.assertEqual(interface.GetVJDStatus(2), VJDStatus.VJD_STAT_MISS)
+
+	def test_commit_matches_setters(self):
+		capabilities = SimulatedVJoyInterface.DEFAULT_CAPABILITIES._replace(nof_buttons=128, nof_discrete_hats=0, nof_continuous_hats=2)
+		interface = SimulatedVJoyInterface({1: capabilities, 2: capabilities})
+		with VJoyDevice(report_id=1, interface=interface) as dev, VJoyDevice(report_id=2, interface=interface) as committed:
+			with committed.transaction() as state:
+				for dev_or_state in (dev, state):
+					dev_or_state.set_axis(VJDHIDUsage.HID_USAGE_RZ, 0x10)
+					dev_or_state.set_button(1, True)
+					dev_or_state.set_button(32, True)
+					dev_or_state.set_button(128, True)
+					dev_or_state.set_continuous_hat(2, 9000)
+			self.assertEqual(dev.state, committed.state)
+			for field, _ in JOYSTICK_POSITION_V2._fields_:
+				if field != 'bDevice':
+					self.assertEqual(getattr(interface.position(1), field), getattr(interface.position(2), field), field)
+
+	def test_commit_needs_acquired_device(self):
+		dev = VJoyDevice(report_id=1, interface=SimulatedVJoyInterface())
+		with self.assertRaisesRegex(RuntimeError, "not acquired"):
+			with dev.transaction():
+				pass
+		with self.assertRaisesRegex(RuntimeError, "not acquired"):
+			dev.commit(VJoyState())
+		with dev:
+			dev.commit()
+		for use in (dev.commit, dev.transaction().__enter__):
+			with self.assertRaisesRegex(RuntimeError, "not acquired"):
+				use()
+		self.assertIsNone(dev.capabilities)
@@ -0,0 +1,150 @@
+"""
+The purpose of this module is to wait for deadlines more precisely than time.sleep does.
+
+time.sleep may oversleep by several milliseconds (about one timer tick on Windows), too coarse for inputs that are
+synchronized with frames. sleep_until sleeps until shortly before a perf_counter_ns deadline and spins (yielding
+the GIL) for the rest. A PeriodicTicker ticks on a fixed grid of deadlines, so lateness does not accumulate into
+drift, and records the lateness of every tick in a LatenessHistogram.
+"""
+
+import bisect
+import platform
+import time
+
+#Spin the last part of a wait, roughly the oversleep of time.sleep on the platform. time.sleep uses a high-resolution
+#timer on Windows since Python 3.11, spinning a whole timer tick would busy-wait half of a 250 Hz period.
+DEFAULT_SPIN_NS = 500000 if platform.system() == 'Windows' else 200000
+
+
+def sleep_until(deadline_ns, spin_ns=DEFAULT_SPIN_NS, event=None):
+	"""Wait until time.perf_counter_ns() reaches deadline_ns.
+
+	:param deadline_ns: time.perf_counter_ns() value to wait for
+	:param spin_ns: nanoseconds before the deadline to stop sleeping and start spinning
+	:param event: optional threading.Event that interrupts the wait when set
+	:return: nanoseconds the wait ended after the deadline, None if interrupted by event
+	"""
+	while True:
+		remaining_ns = deadline_ns - time.perf_counter_ns()
+		if remaining_ns <= spin_ns:
+			break
+		if event is None:
+			time.sleep((remaining_ns - spin_ns) / 1e9)
+		elif event.wait((remaining_ns - spin_ns) / 1e9):
+			return None
+	while True:
+		now_ns = time.perf_counter_ns()
+		if now_ns >= deadline_ns:
+			return now_ns - deadline_ns
+		if event is not None and event.is_set():
+			return None
+		#Yield the GIL, a pure busy loop would stall the other threads for up to sys.getswitchinterval().
+		time.sleep(0)
+
+
+class LatenessHistogram:
+	"""Histogram of lateness in nanoseconds, with power of two buckets from 1 us to about 1 s."""
+
+	EDGES_NS = tuple(1000 * 2**bucket_no for bucket_no in range(21))
+
+	def __init__(self):
+		self.counts = [0] * (len(self.EDGES_NS) + 1)
+		self.count = 0
+		self.total_ns = 0
+		self.max_ns = 0
+
+	def add(self, lateness_ns):
+		self.counts[bisect.bisect_right(self.EDGES_NS, lateness_ns)] += 1
+		self.count += 1
+		self.total_ns += lateness_ns
+		if lateness_ns > self.max_ns:
+			self.max_ns = lateness_ns
+
+	@property
+	def mean_ns(self):
+		return self.total_ns / self.count if self.count else 0.0
+
+	def percentile_ns(self, percentile):
+		"""
+		:param percentile: 0 to 100
+		:return: upper edge of the bucket the percentile falls in (max_ns for the last bucket), 0 if empty
+		"""
+		if not self.count:
+			return 0
+		rank = percentile / 100 * self.count
+		cumulative = 0
+		for bucket_no, count in enumerate(self.counts):
+			cumulative += count
+			if cumulative >= rank and count:
+				return self.EDGES_NS[bucket_no] if bucket_no < len(self.EDGES_NS) else self.max_ns
+		return self.max_ns
+
+	def as_dict(self):
+		"""
+		:return: count, mean, p50, p99 and max in nanoseconds, and the non-empty buckets as {'<=EDGE_NS': count}
+		"""
+		buckets = {
+			(f'<={self.EDGES_NS[bucket_no]}' if bucket_no < len(self.EDGES_NS) else f'>{self.EDGES_NS[-1]}'): count
+			for bucket_no, count in enumerate(self.counts) if count
+		}
+		return {
+			'count': self.count,
+			'mean_ns': self.mean_ns,
+			'p50_ns': self.percentile_ns(50),
+			'p99_ns': self.percentile_ns(99),
+			'max_ns': self.max_ns,
+			'buckets': buckets,
+		}
+
+
+class PeriodicTicker:
+	"""Ticks every period seconds on a fixed grid of deadlines.
+
+	Deadlines are start + n * period, so a late tick does not shift the following ones. Ticks that are missed
+	completely (the wait ends more than a period late) are skipped instead of being caught up in a burst.
+
+	Usage::
+
+		ticker = PeriodicTicker(1 / 250)
+		while running:
+			ticker.wait()
+			...
+	"""
+
+	def __init__(self, period, spin_ns=DEFAULT_SPIN_NS, event=None):
+		"""
+		:param period: seconds between ticks
+		:param spin_ns: see sleep_until
+		:param event: optional threading.Event that interrupts waits when set
+		"""
+		self.period_ns = int(round(period * 1e9))
+		self.spin_ns = spin_ns
+		self.event = event
+		self.next_ns = None
+		self.nof_ticks = 0
+		self.nof_missed = 0
+		self.lateness = LatenessHistogram()
+
+	def start(self, start_ns=None):
+		"""Put the first tick at start_ns, time.perf_counter_ns() if None. wait() starts the ticker if needed."""
+		self.next_ns = time.perf_counter_ns() if start_ns is None else start_ns
+
+	def wait(self):
+		"""Wait for the next tick.
+
+		:return: nanoseconds the tick is late, None if interrupted by the event
+		"""
+		if self.next_ns is None:
+			self.start()
+		lateness_ns = sleep_until(self.next_ns, self.spin_ns, self.event)
+		if lateness_ns is None:
+			return None
+		if lateness_ns >= self.period_ns:
+			nof_missed = lateness_ns // self.period_ns
+			self.nof_missed += nof_missed
+			self.next_ns += nof_missed * self.period_ns
+			lateness_ns -= nof_missed * self.period_ns
+		self.lateness.add(lateness_ns)
+		self.nof_ticks += 1
+		self.next_ns += self.period_ns
+		return lateness_ns
@@ -0,0 +1,33 @@
+"""
+The purpose of this module is to defer importing heavy dependencies (cv2, numpy, mss) until they are used.
+
+lazy_import returns a module whose code runs on first attribute access, so importing a module that only needs cv2 in
+some functions does not make every script (and worker process) that imports it pay for cv2 at startup.
+
+Usage::
+
+	cv2 = lazy_import('cv2')
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+	"""
+	:param name: absolute name of the module
+	:raises ModuleNotFoundError: if the module cannot be found
+	:return: the module if already imported, otherwise a module that is loaded on first attribute access
+	"""
+	module = sys.modules.get(name)
+	if module is not None:
+		return module
+	spec = importlib.util.find_spec(name)
+	if spec is None:
+		raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+	loader = importlib.util.LazyLoader(spec.loader)
+	spec.loader = loader
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	loader.exec_module(module)
+	return module
@@ -1,68 +1,336 @@
+import atexit
 import inspect
+import json
 import logging
+import logging.handlers
 import pathlib
+import queue
+import sys
+import time
 
 from functools import wraps
 import html
 
 
-def call_entry_to_string(decorated_function, *args, **kwargs):
-	func_args = inspect.signature(decorated_function).bind(*args, **kwargs).arguments
+#Functions decorated with hot=True are only wrapped if this is True when they are decorated.
+LOG_HOT_CALLS = False
+
+
+def debug_enabled(logger=None):
+	"""Check, without formatting anything, if a DEBUG record of logger would reach a handler.
+
+	:param logger: logger to check, the root logger if None
+	"""
+	logger = logger if logger is not None else logging.getLogger()
+	if not logger.isEnabledFor(logging.DEBUG):
+		return False
+	while logger:
+		for handler in logger.handlers:
+			if handler.level <= logging.DEBUG:
+				return True
+		if not logger.propagate:
+			break
+		logger = logger.parent
+	return False
+
+
+def call_entry_to_string(decorated_function, /, *args, **kwargs):
+	return _call_to_string(decorated_function, args, kwargs)
+
+
+def _call_to_string(decorated_function, args, kwargs, signature=None):
+	signature = signature if signature is not None else inspect.signature(decorated_function)
+	func_args = signature.bind(*args, **kwargs).arguments
 	func_args_str = ','.join('{}={!r}'.format(*item) for item in func_args.items())
 	return f'[{decorated_function.__code__.co_filename}:{decorated_function.__code__.co_firstlineno}][{decorated_function.__module__}.{decorated_function.__qualname__}({func_args_str})]'
 
 
-def log_args(decorated_function):
-	"""Decorator to print function call details - parameters names and effective values.
-	based on https://stackoverflow.com/a/6278457/3021108
-    """
+#Signatures of decorated functions, looked up when a call is first formatted instead of when decorating (at import).
+_signatures = dict()
+
+
+def _signature(decorated_function):
+	signature = _signatures.get(decorated_function)
+	if signature is None:
+		signature = _signatures[decorated_function] = inspect.signature(decorated_function)
+	return signature
+
+
+class _LazyCall:
+	"""Log message of a call, only formatted if a handler formats the record."""
+
+	__slots__ = ('decorated_function', 'args', 'kwargs', 'tag', 'retval')
+
+	def __init__(self, decorated_function, args, kwargs, tag='[ENTER]', retval=None):
+		self.decorated_function = decorated_function
+		self.args = args
+		self.kwargs = kwargs
+		self.tag = tag
+		self.retval = retval
+
+	def exit(self, retval):
+		return _LazyCall(self.decorated_function, self.args, self.kwargs, '[EXIT]', retval)
 
+	def __str__(self):
+		function_call = _call_to_string(self.decorated_function, self.args, self.kwargs, _signature(self.decorated_function))
+		if self.tag == '[EXIT]':
+			function_call = f'{function_call} -> {self.retval}'
+		return f'{self.tag}\n{function_call}'
+
+
+def _decorator(make_wrapper, decorated_function, hot):
+	if decorated_function is None:
+		return lambda decorated_function: _decorator(make_wrapper, decorated_function, hot)
+	if hot and not LOG_HOT_CALLS:
+		return decorated_function
+	return make_wrapper(decorated_function)
+
+
+def _log_args_wrapper(decorated_function):
 	@wraps(decorated_function)
 	def log_args_wrapper(*args, **kwargs):
-		logging.debug(html.escape(f'[ENTER]\n{call_entry_to_string(decorated_function,*args,**kwargs)}', True))
+		if debug_enabled():
+			logging.debug('%s', _LazyCall(decorated_function, args, kwargs))
 		return decorated_function(*args, **kwargs)
 
 	return log_args_wrapper
 
 
-def log_call(decorated_function):
+def _log_call_wrapper(decorated_function):
 	@wraps(decorated_function)
 	def log_call_wrapper(*args, **kwargs):
-		function_call = call_entry_to_string(decorated_function, *args, **kwargs)
-		logging.debug(html.escape(f'[ENTER]\n{function_call}', True))
+		if not debug_enabled():
+			return decorated_function(*args, **kwargs)
+		function_call = _LazyCall(decorated_function, args, kwargs)
+		logging.debug('%s', function_call)
 		retval = decorated_function(*args, **kwargs)
-		logging.debug(html.escape(f"[EXIT]\n{function_call} -> {retval}", True))
+		logging.debug('%s', function_call.exit(retval))
 		return retval
 
 	return log_call_wrapper
 
 
+def log_args(decorated_function=None, *, hot=False):
+	"""Decorator to print function call details - parameters names and effective values.
+	based on https://stackoverflow.com/a/6278457/3021108
+
+	Nothing is formatted unless a handler takes DEBUG records. Use as @log_args, or as @log_args(hot=True) to not
+	wrap the function at all unless LOG_HOT_CALLS is set.
+    """
+	return _decorator(_log_args_wrapper, decorated_function, hot)
+
+
+def log_call(decorated_function=None, *, hot=False):
+	"""Decorator to print function calls and return values, see log_args."""
+	return _decorator(_log_call_wrapper, decorated_function, hot)
+
+
+def benchmark(nof_calls=100000):
+	"""Measure the overhead per call of the decorators with DEBUG logging disabled.
+
+	:return: dict mapping decorator to seconds per call
+	"""
+
+	def function(a, b=1):
+		return a + b
+
+	root = logging.getLogger()
+	level = root.level
+	root.setLevel(logging.INFO)
+	try:
+		result = dict()
+		for name, decorated in (('undecorated', function), ('log_args', log_args(function)), ('log_call', log_call(function)),
+			('log_call(hot=True)', log_call(hot=True)(function))):
+			start = time.perf_counter()
+			for call_no in range(nof_calls):
+				decorated(call_no, b=2)
+			result[name] = (time.perf_counter() - start) / nof_calls
+		return result
+	finally:
+		root.setLevel(level)
+
+
 LOG_FORMAT_STRING = '[%(asctime)s][%(relativeCreated)07dms][%(processName)s:%(threadName)s][%(name)s:%(levelname)s][%(pathname)s:%(lineno)s][%(funcName)s]\n\t%(message)s'
 STREAM_FORMATTER = logging.Formatter(LOG_FORMAT_STRING)
 STREAM_HANDLER = logging.StreamHandler()
 STREAM_HANDLER.setFormatter(STREAM_FORMATTER)
-HTML_FORMATTER = logging.Formatter(
+
+
+class HtmlFormatter(logging.Formatter):
+	"""Formatter of the HTML log, escapes the message and traceback of a record so logged text cannot break the markup."""
+
+	def format(self, record):
+		record = logging.makeLogRecord(record.__dict__)
+		message = record.getMessage()
+		if record.exc_info and not record.exc_text:
+			record.exc_text = self.formatException(record.exc_info)
+		if record.exc_text:
+			message = f'{message}\n{record.exc_text}'
+		if record.stack_info:
+			message = f'{message}\n{self.formatStack(record.stack_info)}'
+		record.msg = html.escape(message, True)
+		record.args = None
+		record.exc_info = None
+		record.exc_text = None
+		record.stack_info = None
+		return super().format(record)
+
+
+HTML_FORMATTER = HtmlFormatter(
 	fmt='<details>\n\t<summary><samp>' + LOG_FORMAT_STRING +
 	'</samp></summary>\n\t<div><div class="processName">%(processName)s</div><div class="process">%(process)s</div><div class="threadName">%(threadName)s</div><div class="thread">%(thread)s</div><div class="name">%(name)s</div><div class="levelname">%(levelname)s</div><div class="levelno">%(levelno)s</div><div class="created">%(created)s</div><div class="msecs">%(msecs)s</div><div class="asctime">%(asctime)s</div><div class="relativeCreated">%(relativeCreated)s</div><div class="pathname">%(pathname)s</div><div class="lineno">%(lineno)s</div><div class="filename">%(filename)s</div><div class="module">%(module)s</div><div class="funcName">%(funcName)s</div><div class="message">%(message)s</div></div>\n</details>'
 )
-if __name__ == '__main__':
-	FILE_NAME = __name__
-else:
-	for frame in inspect.stack()[1:]:  #exclude current frame, check the callers
-		if frame.filename[0] != '<':  #libraries have '<' in filename
-			FILE_NAME = frame.filename
-			break
 
 
-class LogDirFileHandler(logging.FileHandler):
-	def __init__(self, filename, mode='a', encoding='utf-8', delay=0):
+def _main_file_name():
+	main_file = getattr(sys.modules.get('__main__'), '__file__', None)
+	return pathlib.Path(main_file).name if main_file else 'python'
+
+
+class LogDirFileHandler(logging.handlers.RotatingFileHandler):
+	"""File handler writing to the log directory of the working directory, rotating files when max_bytes is not 0.
+
+	RotatingFileHandler always appends when rotating, so with mode 'w' an existing log is rolled over (or emptied
+	without backups) instead: every run still starts a new log file.
+	"""
+
+	def __init__(self, filename, mode='a', encoding='utf-8', delay=0, max_bytes=0, backup_count=0):
 		cwd = pathlib.Path().resolve()
 		logdir = (cwd / 'log')
 		logdir.mkdir(exist_ok=True)
 		logfile = logdir / pathlib.Path(filename).name
-		logging.FileHandler.__init__(self, str(logfile), mode, encoding, delay)
+		start_new = mode == 'w' and max_bytes > 0 and logfile.is_file() and logfile.stat().st_size > 0
+		if start_new and not backup_count:
+			logfile.write_bytes(b'')
+		logging.handlers.RotatingFileHandler.__init__(self, str(logfile), mode, max_bytes, backup_count, encoding, delay)
+		if start_new and backup_count:
+			self.doRollover()
+
+
+#Record attributes written by JsonLinesFormatter, enough to render a record with any of the formatters above later.
+JSON_RECORD_FIELDS = ('created', 'relativeCreated', 'msecs', 'levelno', 'levelname', 'name', 'processName', 'process',
+	'threadName', 'thread', 'pathname', 'filename', 'module', 'lineno', 'funcName')
+
+
+class JsonLinesFormatter(logging.Formatter):
+	"""Formats a record as one compact JSON object per line, see jsonl_to_html for turning a log into HTML."""
+
+	def format(self, record):
+		entry = {field: getattr(record, field, None) for field in JSON_RECORD_FIELDS}
+		entry['message'] = record.getMessage()
+		if record.exc_info:
+			entry['exc_text'] = self.formatException(record.exc_info)
+		elif record.exc_text:
+			entry['exc_text'] = record.exc_text
+		return json.dumps(entry, default=repr)
+
 
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+	"""QueueHandler that drops records (and counts them) instead of blocking when its bounded queue is full.
 
-HTML_HANDLER = LogDirFileHandler(f'{FILE_NAME}_log.html', mode='w')
-HTML_HANDLER.setFormatter(HTML_FORMATTER)
-logging.basicConfig(level=logging.NOTSET, handlers=[STREAM_HANDLER, HTML_HANDLER])
+	The message (and traceback) of a record is turned into text before it is queued, on the logging thread: logged
+	objects may change, or be in use by their thread, by the time the listener thread writes the record. Its level is
+	at least the lowest level of the handlers behind the queue, so debug_enabled sees through it.
+	"""
+
+	def __init__(self, max_size=10000):
+		super().__init__(queue.Queue(max_size))
+		self.handlers = list()
+		self.nof_dropped = 0
+
+	@property
+	def level(self):
+		downstream_level = min((handler.level for handler in self.handlers), default=logging.NOTSET)
+		return max(self._level, downstream_level)
+
+	@level.setter
+	def level(self, level):
+		self._level = level
+
+	def prepare(self, record):
+		"""
+		:return: copy of record with msg the merged message, no args and any traceback rendered to exc_text
+		"""
+		record = logging.makeLogRecord(record.__dict__)
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			if not record.exc_text:
+				record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		return record
+
+	def enqueue(self, record):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.nof_dropped += 1
+
+
+LOG_FORMATTERS = {
+	'jsonl': JsonLinesFormatter(),
+	'text': STREAM_FORMATTER,
+	'html': HTML_FORMATTER,
+}
+QUEUE_HANDLER = None
+FILE_HANDLER = None
+_listener = None
+
+
+def setup_logging(file_format='jsonl', max_bytes=16 * 2**20, backup_count=4, max_queue_size=10000, file_name=None):
+	"""Log to STREAM_HANDLER and a rotating file in the log directory through a queue, written by a background thread.
+
+	:param file_format: format of the log file, a key of LOG_FORMATTERS
+	:param max_bytes: size at which the log file is rotated, 0 to never rotate
+	:param backup_count: number of rotated log files kept
+	:param max_queue_size: records that may wait for the writer thread, more are dropped (see QUEUE_HANDLER.nof_dropped)
+	:param file_name: name of the log file, derived from the main script if None
+	"""
+	global QUEUE_HANDLER, FILE_HANDLER, _listener
+	shutdown_logging()
+	atexit.unregister(shutdown_logging)
+	atexit.register(shutdown_logging)
+	FILE_HANDLER = LogDirFileHandler(file_name or f'{_main_file_name()}_log.{file_format}', mode='w', max_bytes=max_bytes, backup_count=backup_count)
+	FILE_HANDLER.setFormatter(LOG_FORMATTERS[file_format])
+	QUEUE_HANDLER = BoundedQueueHandler(max_queue_size)
+	QUEUE_HANDLER.handlers = [STREAM_HANDLER, FILE_HANDLER]
+	_listener = logging.handlers.QueueListener(QUEUE_HANDLER.queue, *QUEUE_HANDLER.handlers, respect_handler_level=True)
+	_listener.start()
+	logging.basicConfig(level=logging.NOTSET, handlers=[QUEUE_HANDLER], force=True)
+
+
+def shutdown_logging():
+	"""Write the queued records and stop the writer thread of setup_logging."""
+	global _listener
+	if _listener is not None:
+		_listener.stop()
+		_listener = None
+		FILE_HANDLER.close()
+
+
+def jsonl_to_html(jsonl_path, html_path=None):
+	"""Render a JSON lines log as the HTML log (HTML_FORMATTER), offline instead of per record.
+
+	:param jsonl_path: log written with file_format='jsonl'
+	:param html_path: HTML file to write, jsonl_path with suffix .html if None
+	:return: path of the HTML file
+	"""
+	jsonl_path = pathlib.Path(jsonl_path)
+	html_path = pathlib.Path(html_path) if html_path else jsonl_path.with_suffix('.html')
+	with open(jsonl_path, encoding='utf-8') as jsonl_file, open(html_path, 'w', encoding='utf-8') as html_file:
+		for line in jsonl_file:
+			entry = json.loads(line)
+			message = entry.pop('message')
+			if entry.get('exc_text'):
+				message = f"{message}\n{entry.pop('exc_text')}"
+			record = logging.makeLogRecord(dict(entry, msg=message, args=None))
+			html_file.write(HTML_FORMATTER.format(record) + '\n')
+	return html_path
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1:
+		for jsonl_path in sys.argv[1:]:
+			print(jsonl_to_html(jsonl_path))
+	else:
+		for name, seconds in benchmark().items():
+			print(f'{name}: {seconds * 1e9:.0f} ns/call')
@@ -2,16 +2,21 @@
 The purpose of this module is to help finding window handles.
 """
 
-import platform
-import re
-from collections import namedtuple
+import time
 import logging
 
+import metrics
 import utils_logging
 
 import ctypes
 import ctypes.wintypes
 from utils_os import assert_win
+from window_index import Information, WindowIndex, WindowInfo
+from window_tracker import Geometry
+
+_ENUMERATE_SECONDS = metrics.histogram('window_finder.enumerate_seconds')
+_LOOKUP_SECONDS = metrics.histogram('window_finder.get_window_handles_seconds')
+_NOF_WINDOWS = metrics.gauge('window_finder.windows')
 
 
 def __get_window_name(hwnd):
@@ -42,32 +47,75 @@ def __get_window_class_name(hwnd, max_nof_bytes_class_name=32):
 	return windows_class_name_buffer.value
 
 
-def __get_window_handle_information_for(window_handle):
-	Information = namedtuple('Information', ['window_handle', 'process_id', 'thread_id'])
+def enumerate_window_handles():
+	"""
+	:return: list of the handles of the top-level windows, without querying them
+	"""
+
+	window_handles = list()
+
+	def EnumWindowsProc(hwnd, lParam):
+		window_handles.append(hwnd)
+		#To continue enumeration, the callback function must return TRUE;
+		#to stop enumeration, it must return FALSE.
+		return True
+
+	with _ENUMERATE_SECONDS.time():
+		assert_win(
+			ctypes.windll.user32.EnumWindows(
+			ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)(EnumWindowsProc), 0))
+	_NOF_WINDOWS.set(len(window_handles))
+
+	return window_handles
+
+
+def get_window_info(window_handle):
+	"""
+	:return: WindowInfo of window_handle, None if the window has been destroyed
+	"""
 	window_process_id = ctypes.wintypes.DWORD()
 	thread_id = ctypes.windll.user32.GetWindowThreadProcessId(window_handle, ctypes.byref(window_process_id))
-	return Information(window_handle=window_handle, process_id=window_process_id.value, thread_id=thread_id)
+	if not thread_id:
+		return None
+	try:
+		window_class_name = __get_window_class_name(window_handle)
+	except OSError:
+		return None
+	return WindowInfo(window_handle=window_handle,
+		process_id=window_process_id.value,
+		thread_id=thread_id,
+		window_name=__get_window_name(window_handle),
+		window_class_name=window_class_name)
+
 
+class WindowsWindowSource:
+	"""Window source of WindowIndex enumerating the top-level windows of the desktop."""
+	handles = staticmethod(enumerate_window_handles)
+	information = staticmethod(get_window_info)
 
-def __get_window_handle_information():
-	"""Retrieves information such as window_handle, process_id and thread_id.
 
-	:return: a named tuple with window_handle, process_id and thread_id
+def get_window_geometry(window_handle):
 	"""
+	:return: Geometry of window_handle in screen coordinates, None if the window does not exist
+	"""
+	if not ctypes.windll.user32.IsWindow(window_handle):
+		return None
+	window_rect = ctypes.wintypes.RECT()
+	if not ctypes.windll.user32.GetWindowRect(window_handle, ctypes.byref(window_rect)):
+		return None
+	return Geometry(left=window_rect.left,
+		top=window_rect.top,
+		width=window_rect.right - window_rect.left,
+		height=window_rect.bottom - window_rect.top)
 
-	information = list()
 
-	def EnumWindowsProc(hwnd, lParam):
-		information.append(__get_window_handle_information_for(hwnd))
-		#To continue enumeration, the callback function must return TRUE;
-		#to stop enumeration, it must return FALSE.
-		return True
+class WindowsGeometryProvider:
+	"""Geometry provider of WindowTracker querying the desktop windows."""
+	geometry = staticmethod(get_window_geometry)
 
-	assert_win(
-		ctypes.windll.user32.EnumWindows(
-		ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)(EnumWindowsProc), 0))
 
-	return information
+#Shared by all lookups, titles and classes of known windows are re-queried every full_refresh_interval.
+INDEX = WindowIndex(WindowsWindowSource(), ttl=1.0, full_refresh_interval=10.0)
 
 
 def __get_window_handle(window_name=None, window_class_name=None):
@@ -89,22 +137,17 @@ def __get_window_handle(window_name=None, window_class_name=None):
 
 
 def process_information(process_id):
-	all_windows = __get_window_handle_information()
-	result = dict()
-	for info in all_windows:
-		if info.process_id == process_id:
-			result[info] = {
-				'window_name': __get_window_name(info.window_handle),
-				'window_class_name': __get_window_class_name(info.window_handle)
-			}
-	return result
+	return INDEX.process_information(process_id)
 
 
 def window_information(window_handle):
+	window = INDEX.get(window_handle)
+	if window is None:
+		raise ctypes.WinError()
 	return {
-		__get_window_handle_information_for(window_handle): {
-		'window_name': __get_window_name(window_handle),
-		'window_class_name': __get_window_class_name(window_handle)
+		Information(window.window_handle, window.process_id, window.thread_id): {
+		'window_name': window.window_name,
+		'window_class_name': window.window_class_name
 		}
 	}
 
@@ -151,29 +194,21 @@ def get_window_handles(window_handle=None,
 	:return: [description]
 	:rtype: [type]
 	"""
+	start = time.perf_counter()
 	try:
-		hwnds = set()
-		if window_handle:
-			hwnds.add(window_handle)
-		if window_name or window_class_name:
+		hwnds = INDEX.find(window_handle=window_handle,
+			window_name=window_name,
+			window_class_name=window_class_name,
+			window_name_regex=window_name_regex,
+			window_class_name_regex=window_class_name_regex,
+			process_id=process_id)
+		if (window_name or window_class_name) and not INDEX.find(window_name=window_name, window_class_name=window_class_name):
+			#Created since the last refresh, or not top-level.
 			hwnds.add(__get_window_handle(window_name=window_name, window_class_name=window_class_name))
-		if process_id or window_name_regex or window_class_name_regex:
-			information = __get_window_handle_information()
-			for info in information:
-				if process_id == info.process_id:
-					logging.debug(f"[{info}]")
-					hwnds.add(info.window_handle)
-				if window_name_regex:
-					window_name = __get_window_name(info.window_handle)
-					if re.match(window_name_regex, window_name):
-						logging.debug(f"[{info}][window_name:{window_name}]")
-						hwnds.add(info.window_handle)
-				if window_class_name_regex:
-					window_class_name = __get_window_class_name(info.window_handle)
-					if re.match(window_class_name_regex, window_class_name):
-						logging.debug(f"[{info}][window_class_name:{window_class_name}]")
-						hwnds.add(info.window_handle)
+		logging.debug('%s', hwnds)
 		return hwnds
 	except Exception as exception:
 		logging.error(exception)
 		raise
+	finally:
+		_LOOKUP_SECONDS.observe(time.perf_counter() - start)
@@ -0,0 +1,242 @@
+"""
+The purpose of this module is to look windows up without enumerating and querying every window per lookup.
+
+A WindowIndex keeps a snapshot of the top-level windows keyed by handle, process id, title and class. Refreshing it
+enumerates only the handles and queries title, class and process of the windows that are new; titles of known
+windows are re-queried by a full refresh, at a longer interval. The enumeration source is injectable: the Windows
+source lives in window_finder_windows, FakeWindowSource stands in for it in tests and benchmarks.
+"""
+
+import functools
+import re
+import time
+from collections import namedtuple
+
+import utils_logging
+
+WindowInfo = namedtuple('WindowInfo', ['window_handle', 'process_id', 'thread_id', 'window_name', 'window_class_name'])
+WindowInfo.__doc__ = """
+:param window_handle: window handle
+:param process_id: id of the process that created the window
+:param thread_id: id of the thread that created the window
+:param window_name: window text (title bar)
+:param window_class_name: name of the window class
+"""
+
+Information = namedtuple('Information', ['window_handle', 'process_id', 'thread_id'])
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(pattern):
+	return re.compile(pattern)
+
+
+def compile_pattern(pattern):
+	"""
+	:param pattern: regular expression string, or an already compiled pattern
+	:return: compiled pattern, compiled once per distinct string
+	"""
+	return pattern if isinstance(pattern, re.Pattern) else _compile(pattern)
+
+
+class FakeWindowSource:
+	"""In-memory window source, for running and benchmarking WindowIndex without Windows."""
+
+	def __init__(self, windows=()):
+		"""
+		:param windows: iterable of WindowInfo
+		"""
+		self.windows = {window.window_handle: window for window in windows}
+		self.nof_enumerations = 0
+		self.nof_information_calls = 0
+
+	def handles(self):
+		self.nof_enumerations += 1
+		return list(self.windows)
+
+	def information(self, window_handle):
+		"""
+		:return: WindowInfo, None if the window does not exist (any more)
+		"""
+		self.nof_information_calls += 1
+		return self.windows.get(window_handle)
+
+	def add(self, window):
+		self.windows[window.window_handle] = window
+
+	def remove(self, window_handle):
+		del self.windows[window_handle]
+
+	def rename(self, window_handle, window_name):
+		self.windows[window_handle] = self.windows[window_handle]._replace(window_name=window_name)
+
+
+class WindowIndex:
+	"""Snapshot of the top-level windows of a source, refreshed when older than ttl.
+
+	Usage::
+
+		index = WindowIndex(source, ttl=1.0)
+		handles = index.find(window_name_regex='.*Notepad.*')
+	"""
+
+	@utils_logging.log_call
+	def __init__(self, source, ttl=1.0, full_refresh_interval=10.0):
+		"""
+		:param source: window source with handles() and information(window_handle), see FakeWindowSource
+		:param ttl: seconds a snapshot is used before it is refreshed (incrementally), 0 to refresh on every lookup
+		:param full_refresh_interval: seconds between refreshes that also re-query known windows (titles change)
+		"""
+		self.source = source
+		self.ttl = ttl
+		self.full_refresh_interval = full_refresh_interval
+		self.by_handle = dict()
+		self.by_process_id = dict()
+		self.by_window_name = dict()
+		self.by_window_class_name = dict()
+		self.refreshed = None
+		self.fully_refreshed = None
+
+	def _add(self, window):
+		self.by_handle[window.window_handle] = window
+		self.by_process_id.setdefault(window.process_id, set()).add(window.window_handle)
+		self.by_window_name.setdefault(window.window_name, set()).add(window.window_handle)
+		self.by_window_class_name.setdefault(window.window_class_name, set()).add(window.window_handle)
+
+	def _remove(self, window_handle):
+		window = self.by_handle.pop(window_handle)
+		for by_key, key in ((self.by_process_id, window.process_id), (self.by_window_name, window.window_name),
+			(self.by_window_class_name, window.window_class_name)):
+			handles = by_key[key]
+			handles.discard(window_handle)
+			if not handles:
+				del by_key[key]
+
+	def refresh(self, full=False):
+		"""Enumerate the windows, query the new ones (all of them if full) and forget those that are gone."""
+		now = time.monotonic()
+		handles = set(self.source.handles())
+		for window_handle in set(self.by_handle) - handles:
+			self._remove(window_handle)
+		for window_handle in (handles if full else handles - set(self.by_handle)):
+			if window_handle in self.by_handle:
+				self._remove(window_handle)
+			window = self.source.information(window_handle)
+			if window is not None:
+				self._add(window)
+		self.refreshed = now
+		if full or self.fully_refreshed is None:
+			self.fully_refreshed = now
+
+	def ensure_fresh(self):
+		"""Refresh if the snapshot is older than ttl, fully if the last full refresh is older than full_refresh_interval."""
+		now = time.monotonic()
+		if self.refreshed is None or now - self.refreshed >= self.ttl:
+			self.refresh(full=self.fully_refreshed is not None and now - self.fully_refreshed >= self.full_refresh_interval)
+
+	def get(self, window_handle):
+		"""
+		:return: WindowInfo of window_handle, None if there is no such window
+		"""
+		self.ensure_fresh()
+		window = self.by_handle.get(window_handle)
+		#Child windows are not enumerated, query them without adding them to the snapshot.
+		return self.source.information(window_handle) if window is None else window
+
+	def windows(self):
+		self.ensure_fresh()
+		return list(self.by_handle.values())
+
+	def find(self,
+		window_handle=None,
+		window_name=None,
+		window_class_name=None,
+		window_name_regex=None,
+		window_class_name_regex=None,
+		process_id=None):
+		"""Handles of the windows matching any of the given criteria.
+
+		:param window_handle: handle to include
+		:param window_name: exact window title
+		:param window_class_name: exact window class name
+		:param window_name_regex: regular expression (string or compiled) matched at the start of the title
+		:param window_class_name_regex: regular expression (string or compiled) matched at the start of the class name
+		:param process_id: id of the process owning the windows
+		:return: set of window handles
+		"""
+		self.ensure_fresh()
+		handles = set()
+		if window_handle:
+			handles.add(window_handle)
+		if window_name and window_class_name:
+			handles |= self.by_window_name.get(window_name, set()) & self.by_window_class_name.get(window_class_name, set())
+		elif window_name:
+			handles |= self.by_window_name.get(window_name, set())
+		elif window_class_name:
+			handles |= self.by_window_class_name.get(window_class_name, set())
+		if process_id:
+			handles |= self.by_process_id.get(process_id, set())
+		#Match each distinct title (class) once, many windows share them.
+		for pattern, by_key in ((window_name_regex, self.by_window_name), (window_class_name_regex, self.by_window_class_name)):
+			if pattern:
+				match = compile_pattern(pattern).match
+				for key, key_handles in by_key.items():
+					if match(key):
+						handles |= key_handles
+		return handles
+
+	def process_information(self, process_id):
+		"""
+		:return: dict from Information to {'window_name': ..., 'window_class_name': ...} of the windows of process_id
+		"""
+		self.ensure_fresh()
+		return {
+			Information(window.window_handle, window.process_id, window.thread_id): {
+			'window_name': window.window_name,
+			'window_class_name': window.window_class_name
+			}
+			for window in (self.by_handle[window_handle] for window_handle in self.by_process_id.get(process_id, ()))
+		}
+
+
+def fake_windows(nof_windows, nof_processes=100, first_handle=0x10000):
+	"""
+	:return: list of nof_windows WindowInfo with varied titles and classes, for tests and benchmarks
+	"""
+	classes = ('Notepad', 'Chrome_WidgetWin_1', 'CabinetWClass', 'ConsoleWindowClass', 'tooltips_class32', 'IME')
+	return [
+		WindowInfo(window_handle=first_handle + window_no,
+		process_id=1000 + window_no % nof_processes,
+		thread_id=5000 + window_no,
+		window_name=f'{classes[window_no % len(classes)]} window {window_no}' if window_no % 4 else '',
+		window_class_name=classes[window_no % len(classes)]) for window_no in range(nof_windows)
+	]
+
+
+def benchmark(nof_windows=5000, nof_lookups=100):
+	"""Measure refreshes and lookups of a WindowIndex over nof_windows fake windows.
+
+	:return: dict mapping operation to seconds
+	"""
+	source = FakeWindowSource(fake_windows(nof_windows))
+	index = WindowIndex(source, ttl=float('inf'))
+	result = dict()
+	start = time.perf_counter()
+	index.refresh(full=True)
+	result['full_refresh'] = time.perf_counter() - start
+	source.add(WindowInfo(1, 1, 1, 'new window', 'Notepad'))
+	start = time.perf_counter()
+	index.refresh()
+	result['incremental_refresh'] = time.perf_counter() - start
+	for name, criteria in (('find_regex', dict(window_name_regex='.*Notepad.*')), ('find_process', dict(process_id=1042)),
+		('find_name', dict(window_name='new window'))):
+		start = time.perf_counter()
+		for _ in range(nof_lookups):
+			index.find(**criteria)
+		result[name] = (time.perf_counter() - start) / nof_lookups
+	return result
+
+
+if __name__ == '__main__':
+	for name, seconds in benchmark().items():
+		print(f'{name}: {seconds * 1e6:.0f} us')
@@ -0,0 +1,160 @@
+"""
+The purpose of this module is to follow the geometry of a captured window without querying it every frame.
+
+A WindowTracker caches the position, size and validity of one window and revalidates them at most every interval
+seconds, from a geometry provider. Moves, resizes and closing are signalled to listeners, so that e.g. capture
+buffers are reallocated only when the size actually changed. The Windows provider lives in window_finder_windows,
+FakeWindowProvider stands in for it in tests.
+
+Usage::
+
+	tracker = WindowTracker(window_handle, interval=0.1)
+	tracker.subscribe(lambda tracker, change, previous: print(change, previous, tracker.geometry))
+	while True:
+		tracker.revalidate()
+		width, height = tracker.size
+"""
+
+import enum
+import platform
+import time
+from collections import namedtuple
+
+import utils_logging
+
+Geometry = namedtuple('Geometry', ['left', 'top', 'width', 'height'])
+Geometry.__doc__ = """Window rectangle in screen coordinates.
+
+:param left: x of the upper-left corner
+:param top: y of the upper-left corner
+:param width: width in pixels
+:param height: height in pixels
+"""
+
+
+class WindowChange(enum.Enum):
+	MOVED = 'moved'
+	RESIZED = 'resized'
+	CLOSED = 'closed'
+
+
+class WindowClosed(OSError):
+	"""The tracked window does not exist any more."""
+
+
+class FakeWindowProvider:
+	"""In-memory geometry provider, for running WindowTracker without Windows."""
+
+	def __init__(self, windows=None):
+		"""
+		:param windows: dict from window handle to Geometry
+		"""
+		self.windows = dict(windows or dict())
+		self.nof_queries = 0
+
+	def geometry(self, window_handle):
+		"""
+		:return: Geometry of window_handle, None if the window does not exist
+		"""
+		self.nof_queries += 1
+		return self.windows.get(window_handle)
+
+	def move(self, window_handle, left, top):
+		self.windows[window_handle] = self.windows[window_handle]._replace(left=left, top=top)
+
+	def resize(self, window_handle, width, height):
+		self.windows[window_handle] = self.windows[window_handle]._replace(width=width, height=height)
+
+	def close(self, window_handle):
+		del self.windows[window_handle]
+
+
+def default_provider():
+	"""
+	:return: geometry provider of the desktop windows
+	:raises NotImplementedError: on other platforms than Windows
+	"""
+	if platform.system() != 'Windows':
+		raise NotImplementedError("window geometry is only available on Windows, use a FakeWindowProvider")
+	from window_finder_windows import WindowsGeometryProvider
+	return WindowsGeometryProvider()
+
+
+class WindowTracker:
+	"""Cached geometry and validity of one window, revalidated at most every interval seconds."""
+
+	@utils_logging.log_call
+	def __init__(self, window_handle, provider=None, interval=0.1):
+		"""
+		:param window_handle: handle of the window to track
+		:param provider: geometry provider with geometry(window_handle), see FakeWindowProvider, default_provider if None
+		:param interval: seconds the cached geometry is used before it is queried again, 0 to query on every revalidate
+		"""
+		self.window_handle = window_handle
+		self.provider = provider if provider is not None else default_provider()
+		self.interval = interval
+		self.listeners = list()
+		self.geometry = None
+		self.revalidated = None
+		self.nof_revalidations = 0
+		self.revalidate(force=True)
+
+	@property
+	def valid(self):
+		return self.geometry is not None
+
+	@property
+	def size(self):
+		"""
+		:return: (width, height) of the window
+		:raises WindowClosed: if the window does not exist
+		"""
+		geometry = self.check()
+		return geometry.width, geometry.height
+
+	def subscribe(self, listener):
+		"""
+		:param listener: called as listener(tracker, change, previous geometry) for every WindowChange
+		"""
+		self.listeners.append(listener)
+
+	def unsubscribe(self, listener):
+		self.listeners.remove(listener)
+
+	def revalidate(self, force=False):
+		"""Query the geometry if the cached one is older than interval (or if force), and signal the changes.
+
+		:return: list of WindowChange, empty if nothing changed or the cached geometry was used
+		"""
+		now = time.monotonic()
+		if not force and self.revalidated is not None and now - self.revalidated < self.interval:
+			return []
+		self.revalidated = now
+		self.nof_revalidations += 1
+		previous = self.geometry
+		if previous is None and self.nof_revalidations > 1:
+			#A closed window stays closed, its handle may be reused by an unrelated window.
+			return []
+		self.geometry = self.provider.geometry(self.window_handle)
+		changes = list()
+		if previous is not None:
+			if self.geometry is None:
+				changes.append(WindowChange.CLOSED)
+			else:
+				if (self.geometry.left, self.geometry.top) != (previous.left, previous.top):
+					changes.append(WindowChange.MOVED)
+				if (self.geometry.width, self.geometry.height) != (previous.width, previous.height):
+					changes.append(WindowChange.RESIZED)
+		for change in changes:
+			for listener in list(self.listeners):
+				listener(self, change, previous)
+		return changes
+
+	def check(self):
+		"""
+		:return: cached Geometry
+		:raises WindowClosed: if the window does not exist
+		"""
+		if self.geometry is None:
+			raise WindowClosed(f"window {self.window_handle} does not exist")
+		return self.geometry
@@ -1,8 +1,15 @@
 import ctypes
 from ctypes import wintypes
+from collections import namedtuple
+import contextlib
 import enum
 import logging
+import os
+import platform
+import time
+import types
 
+import metrics
 import utils_logging
 
 #Alternative to vJoy - ViGem ?
@@ -63,81 +70,224 @@ class VJDHIDUsage(enum.IntEnum):
 	HID_USAGE_POV = 0x39
 
 
+VJoyCapabilities = namedtuple('VJoyCapabilities',
+	['axes', 'axis_ranges', 'nof_buttons', 'nof_discrete_hats', 'nof_continuous_hats'])
+VJoyCapabilities.__doc__ = """Immutable description of what a vJoy device has, read once when the device is entered.
+
+:param axes: frozenset of the VJDHIDUsage axes that exist
+:param axis_ranges: read-only mapping from axis to (logical minimum, logical maximum)
+:param nof_buttons: number of buttons
+:param nof_discrete_hats: number of discrete POV hats
+:param nof_continuous_hats: number of continuous POV hats
+"""
+
+_CALLS = metrics.counter('vjoy.calls')
+_COMMITS = metrics.counter('vjoy.commits')
+_COMMIT_SECONDS = metrics.histogram('vjoy.commit_seconds')
+
+#Range checked by VJoyDevice.set_axis if the driver does not report one.
+DEFAULT_AXIS_RANGE = (0x1, 0x8000)
+
+#JOYSTICK_POSITION_V2 field of each axis
+AXIS_FIELDS = {
+	VJDHIDUsage.HID_USAGE_X: 'wAxisX',
+	VJDHIDUsage.HID_USAGE_Y: 'wAxisY',
+	VJDHIDUsage.HID_USAGE_Z: 'wAxisZ',
+	VJDHIDUsage.HID_USAGE_RX: 'wAxisXRot',
+	VJDHIDUsage.HID_USAGE_RY: 'wAxisYRot',
+	VJDHIDUsage.HID_USAGE_RZ: 'wAxisZRot',
+	VJDHIDUsage.HID_USAGE_SL0: 'wSlider',
+	VJDHIDUsage.HID_USAGE_SL1: 'wDial',
+	VJDHIDUsage.HID_USAGE_WHL: 'wWheel',
+}
+#JOYSTICK_POSITION_V2 fields of buttons 1-32, 33-64, 65-96, 97-128
+BUTTON_FIELDS = ('lButtons', 'lButtonsEx1', 'lButtonsEx2', 'lButtonsEx3')
+#JOYSTICK_POSITION_V2 fields of continuous hats 1-4, discrete hats are the nibbles of bHats
+HAT_FIELDS = ('bHats', 'bHatsEx1', 'bHatsEx2', 'bHatsEx3')
+
+
+def _check_axis(capabilities, axis, value):
+	if axis in capabilities.axes:
+		axis_min, axis_max = capabilities.axis_ranges[axis]
+		if not ((axis_min <= value) and (value <= axis_max)):
+			raise ValueError(f"value is not within bounds: {axis_min}<={value}<={axis_max}")
+	else:
+		raise ValueError(f"axis {axis} is not in available axes ({set(capabilities.axes)})")
+
+
+def _check_button(capabilities, button_no, value):
+	nof_buttons = capabilities.nof_buttons
+	if (1 <= button_no) and (button_no <= nof_buttons):
+		if not ((0 <= value) and (value <= 1)):
+			raise ValueError(f"value is not within bounds: 0<={value}<=1")
+	else:
+		raise ValueError(f"button_no {button_no} is not within bounds 1<={button_no}<={nof_buttons}")
+
+
+def _check_discrete_hat(capabilities, hat_no, value):
+	nof_discrete_hats = capabilities.nof_discrete_hats
+	if (1 <= hat_no) and (hat_no <= nof_discrete_hats):
+		if not isinstance(value, VJoyDevice.DiscreteHatDirection):
+			raise ValueError(f"value {value} should be one of {list(VJoyDevice.DiscreteHatDirection)}")
+	else:
+		raise ValueError(f"discrete hat no {hat_no} is not within bounds 1<={hat_no}<={nof_discrete_hats}")
+
+
+def _check_continuous_hat(capabilities, hat_no, value):
+	nof_continuous_hats = capabilities.nof_continuous_hats
+	if (1 <= hat_no) and (hat_no <= nof_continuous_hats):
+		if not (-1 <= value and value <= 35999):
+			raise ValueError(f"value {value} should be in range -1 to 35999")
+	else:
+		raise ValueError(f"continuous hat no {hat_no} is not within bounds 1<={hat_no}<={nof_continuous_hats}")
+
+
+def _int32(value):
+	"""Reinterpret the lower 32 bits of value as a signed 32 bit integer (LONG)."""
+	value &= 0xFFFFFFFF
+	return value - 0x100000000 if value & 0x80000000 else value
+
+
+DLL_PATH = r"C:\Program Files\vJoy\x64\vJoyInterface.dll"
+
+#restype and argtypes of the vJoyInterface.dll functions, bound once when the DLL is loaded.
+PROTOTYPES = {
+	#	VJOYINTERFACE_API SHORT __cdecl GetvJoyVersion(void);
+	'GetvJoyVersion': (ctypes.wintypes.SHORT, ()),
+	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoyProductString(void);
+	'GetvJoyProductString': (ctypes.c_wchar_p, ()),
+	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoyManufacturerString(void);
+	'GetvJoyManufacturerString': (ctypes.c_wchar_p, ()),
+	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoySerialNumberString(void);
+	'GetvJoySerialNumberString': (ctypes.c_wchar_p, ()),
+	#	VJOYINTERFACE_API BOOL	__cdecl vJoyEnabled(void);
+	'vJoyEnabled': (ctypes.wintypes.BOOL, ()),
+	#	VJOYINTERFACE_API BOOL	__cdecl	DriverMatch(WORD * DllVer, WORD * DrvVer);
+	'DriverMatch': (ctypes.wintypes.BOOL, (ctypes.POINTER(ctypes.wintypes.WORD), ctypes.POINTER(ctypes.wintypes.WORD))),
+	#	VJOYINTERFACE_API BOOL	__cdecl	GetvJoyMaxDevices(int * n);
+	'GetvJoyMaxDevices': (ctypes.wintypes.BOOL, (ctypes.POINTER(ctypes.c_int), )),
+	#	VJOYINTERFACE_API BOOL	__cdecl	GetNumberExistingVJD(int * n);
+	'GetNumberExistingVJD': (ctypes.wintypes.BOOL, (ctypes.POINTER(ctypes.c_int), )),
+	#	VJOYINTERFACE_API int	__cdecl  GetVJDButtonNumber(UINT rID);
+	'GetVJDButtonNumber': (ctypes.c_int, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API int	__cdecl  GetVJDDiscPovNumber(UINT rID);
+	'GetVJDDiscPovNumber': (ctypes.c_int, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API int	__cdecl  GetVJDContPovNumber(UINT rID);
+	'GetVJDContPovNumber': (ctypes.c_int, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisExist(UINT rID, UINT Axis);
+	'GetVJDAxisExist': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, ctypes.wintypes.UINT)),
+	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisMax(UINT rID, UINT Axis, LONG * Max);
+	'GetVJDAxisMax': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, ctypes.wintypes.UINT, ctypes.POINTER(ctypes.wintypes.LONG))),
+	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisMin(UINT rID, UINT Axis, LONG * Min);
+	'GetVJDAxisMin': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, ctypes.wintypes.UINT, ctypes.POINTER(ctypes.wintypes.LONG))),
+	#	VJOYINTERFACE_API enum VjdStat	__cdecl	GetVJDStatus(UINT rID);
+	'GetVJDStatus': (ctypes.c_int, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL	__cdecl	isVJDExists(UINT rID);	// Added in 2.1.6
+	'isVJDExists': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API int	__cdecl	GetOwnerPid(UINT rID);	// Added in 2.1.8
+	'GetOwnerPid': (ctypes.c_int, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL		__cdecl	AcquireVJD(UINT rID);
+	'AcquireVJD': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API VOID		__cdecl	RelinquishVJD(UINT rID);
+	'RelinquishVJD': (None, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL		__cdecl	UpdateVJD(UINT rID, PVOID pData);
+	'UpdateVJD': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, ctypes.POINTER(JOYSTICK_POSITION_V2))),
+	#	VJOYINTERFACE_API BOOL		__cdecl	ResetVJD(UINT rID);
+	'ResetVJD': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API VOID		__cdecl	ResetAll(void);
+	'ResetAll': (None, ()),
+	#	VJOYINTERFACE_API BOOL		__cdecl	ResetButtons(UINT rID);
+	'ResetButtons': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL		__cdecl	ResetPovs(UINT rID);
+	'ResetPovs': (ctypes.wintypes.BOOL, (ctypes.wintypes.UINT, )),
+	#	VJOYINTERFACE_API BOOL		__cdecl	SetAxis(LONG Value, UINT rID, UINT Axis);
+	'SetAxis': (ctypes.wintypes.BOOL, (ctypes.wintypes.LONG, ctypes.wintypes.UINT, ctypes.wintypes.UINT)),
+	#	VJOYINTERFACE_API BOOL		__cdecl	SetBtn(BOOL Value, UINT rID, UCHAR nBtn);
+	'SetBtn': (ctypes.wintypes.BOOL, (ctypes.wintypes.BOOL, ctypes.wintypes.UINT, ctypes.c_ubyte)),
+	#	VJOYINTERFACE_API BOOL		__cdecl	SetDiscPov(int Value, UINT rID, UCHAR nPov);
+	'SetDiscPov': (ctypes.wintypes.BOOL, (ctypes.wintypes.INT, ctypes.wintypes.UINT, ctypes.c_ubyte)),
+	#	VJOYINTERFACE_API BOOL		__cdecl	SetContPov(DWORD Value, UINT rID, UCHAR nPov);
+	'SetContPov': (ctypes.wintypes.BOOL, (ctypes.wintypes.DWORD, ctypes.wintypes.UINT, ctypes.c_ubyte)),
+}
+
+
 class VJoyInterface:
-	dll = ctypes.cdll.LoadLibrary(r"C:\Program Files\vJoy\x64\vJoyInterface.dll")
+	"""Thin wrapper of vJoyInterface.dll. The DLL is loaded, and its prototypes bound, on first use."""
+
+	dll = None
+
+	@staticmethod
+	@utils_logging.log_call
+	def load(path=DLL_PATH):
+		"""Load the DLL and bind restype and argtypes of its functions, does nothing if already loaded.
+
+		:return: the loaded DLL
+		"""
+		if VJoyInterface.dll is None:
+			dll = ctypes.cdll.LoadLibrary(path)
+			for name, (restype, argtypes) in PROTOTYPES.items():
+				function = getattr(dll, name, None)
+				if function is None:
+					logging.warning(f"{path} has no {name}, it is older than the wrapper")
+					continue
+				function.restype = restype
+				function.argtypes = argtypes
+			VJoyInterface.dll = dll
+		return VJoyInterface.dll
+
+	@staticmethod
+	def _dll():
+		return VJoyInterface.dll if VJoyInterface.dll is not None else VJoyInterface.load()
+
+	#
+	#
+	#	/////	General driver data
 
 	@staticmethod
-	#	VJOYINTERFACE_API SHORT __cdecl GetvJoyVersion(void);
 	@utils_logging.log_call
 	def GetvJoyVersion():
-		function = VJoyInterface.dll.GetvJoyVersion
-		function.restype = ctypes.wintypes.SHORT
-		return function(None)
+		return VJoyInterface._dll().GetvJoyVersion()
 
 	@staticmethod
-	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoyProductString(void);
 	@utils_logging.log_call
 	def GetvJoyProductString():
-		function = VJoyInterface.dll.GetvJoyProductString
-		function.restype = ctypes.c_wchar_p
-		result = function(None)
-		return str(result)
+		return str(VJoyInterface._dll().GetvJoyProductString())
 
 	@staticmethod
-	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoyManufacturerString(void);
 	@utils_logging.log_call
 	def GetvJoyManufacturerString():
-		function = VJoyInterface.dll.GetvJoyManufacturerString
-		function.restype = ctypes.c_wchar_p
-		result = function(None)
-		return str(result)
+		return str(VJoyInterface._dll().GetvJoyManufacturerString())
 
 	@staticmethod
-	#	VJOYINTERFACE_API PVOID	__cdecl	GetvJoySerialNumberString(void);
 	@utils_logging.log_call
 	def GetvJoySerialNumberString():
-		function = VJoyInterface.dll.GetvJoySerialNumberString
-		function.restype = ctypes.c_wchar_p
-		result = function(None)
-		return str(result)
+		return str(VJoyInterface._dll().GetvJoySerialNumberString())
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl vJoyEnabled(void);
 	@utils_logging.log_call
 	def vJoyEnabled():
-		function = VJoyInterface.dll.vJoyEnabled
-		function.restype = ctypes.wintypes.BOOL
-		return function(None)
+		return VJoyInterface._dll().vJoyEnabled()
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl	DriverMatch(WORD * DllVer, WORD * DrvVer);
 	@utils_logging.log_call
 	def DriverMatch():
-		function = VJoyInterface.dll.DriverMatch
-		function.restype = ctypes.wintypes.BOOL
 		DllVer = ctypes.wintypes.WORD()
 		DrvVer = ctypes.wintypes.WORD()
-		result = function(ctypes.byref(DllVer), ctypes.byref(DrvVer))
+		result = VJoyInterface._dll().DriverMatch(ctypes.byref(DllVer), ctypes.byref(DrvVer))
 		return result, DllVer, DrvVer
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl	GetvJoyMaxDevices(int * n);	// What is the maximum possible number of vJoy devices
 	@utils_logging.log_call
 	def GetvJoyMaxDevices():
-		function = VJoyInterface.dll.GetvJoyMaxDevices
-		function.restype = ctypes.wintypes.BOOL
 		n = ctypes.c_int()
-		result = function(ctypes.byref(n))
+		result = VJoyInterface._dll().GetvJoyMaxDevices(ctypes.byref(n))
 		return result, n
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl	GetNumberExistingVJD(int * n);	// What is the number of vJoy devices currently enabled
 	@utils_logging.log_call
 	def GetNumberExistingVJD():
-		function = VJoyInterface.dll.GetNumberExistingVJD
-		function.restype = ctypes.wintypes.BOOL
 		n = ctypes.c_int()
-		result = function(ctypes.byref(n))
+		result = VJoyInterface._dll().GetNumberExistingVJD(ctypes.byref(n))
 		return result, n
 
 	#
@@ -145,112 +295,72 @@ class VJoyInterface:
 	#	/////	vJoy Device properties
 
 	@staticmethod
-	#	VJOYINTERFACE_API int	__cdecl  GetVJDButtonNumber(UINT rID);	// Get the number of buttons defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDButtonNumber(rID):
-		return VJoyInterface.dll.GetVJDButtonNumber(ctypes.wintypes.UINT(rID))
+		return VJoyInterface._dll().GetVJDButtonNumber(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API int	__cdecl  GetVJDDiscPovNumber(UINT rID);	// Get the number of descrete-type POV hats defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDDiscPovNumber(rID):
-		return VJoyInterface.dll.GetVJDDiscPovNumber(ctypes.wintypes.UINT(rID))
+		return VJoyInterface._dll().GetVJDDiscPovNumber(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API int	__cdecl  GetVJDContPovNumber(UINT rID);	// Get the number of descrete-type POV hats defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDContPovNumber(rID):
-		return VJoyInterface.dll.GetVJDContPovNumber(ctypes.wintypes.UINT(rID))
+		return VJoyInterface._dll().GetVJDContPovNumber(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisExist(UINT rID, UINT Axis); // Test if given axis defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDAxisExist(rID, Axis):
-		function = VJoyInterface.dll.GetVJDAxisExist
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID), ctypes.wintypes.UINT(Axis))
-		return result
+		return VJoyInterface._dll().GetVJDAxisExist(rID, Axis)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisMax(UINT rID, UINT Axis, LONG * Max); // Get logical Maximum value for a given axis defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDAxisMax(rID, Axis):
-		function = VJoyInterface.dll.GetVJDAxisMax
-		function.restype = ctypes.wintypes.BOOL
 		Max = ctypes.wintypes.LONG()
-		result = function(ctypes.wintypes.UINT(rID), ctypes.wintypes.UINT(Axis), ctypes.byref(Max))
+		result = VJoyInterface._dll().GetVJDAxisMax(rID, Axis, ctypes.byref(Max))
 		return result, Max
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl  GetVJDAxisMin(UINT rID, UINT Axis, LONG * Min); // Get logical Minimum value for a given axis defined in the specified VDJ
 	@utils_logging.log_call
 	def GetVJDAxisMin(rID, Axis):
-		function = VJoyInterface.dll.GetVJDAxisMin
-		function.restype = ctypes.wintypes.BOOL
 		Min = ctypes.wintypes.LONG()
-		result = function(ctypes.wintypes.UINT(rID), ctypes.wintypes.UINT(Axis), ctypes.byref(Min))
+		result = VJoyInterface._dll().GetVJDAxisMin(rID, Axis, ctypes.byref(Min))
 		return result, Min
 
 	@staticmethod
-	#	VJOYINTERFACE_API enum VjdStat	__cdecl	GetVJDStatus(UINT rID);			// Get the status of the specified vJoy Device.
 	@utils_logging.log_call
 	def GetVJDStatus(rID):
-		function = VJoyInterface.dll.GetVJDStatus
-		result = function(ctypes.wintypes.UINT(rID))
-		return VJDStatus(result)
-
-	#	// Added in 2.1.6
+		return VJDStatus(VJoyInterface._dll().GetVJDStatus(rID))
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL	__cdecl	isVJDExists(UINT rID);					// TRUE if the specified vJoy Device exists
 	@utils_logging.log_call
 	def isVJDExists(rID):
-		function = VJoyInterface.dll.isVJDExists
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
-
-	#	// Added in 2.1.8
+		return VJoyInterface._dll().isVJDExists(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API int	__cdecl	GetOwnerPid(UINT rID);					// Reurn owner's Process ID if the specified vJoy Device exists
 	@utils_logging.log_call
 	def GetOwnerPid(rID):
-		function = VJoyInterface.dll.GetOwnerPid
-		function.restype = ctypes.c_int
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().GetOwnerPid(rID)
 
 	#
 	#
 	#	/////	Write access to vJoy Device - Basic
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	AcquireVJD(UINT rID);				// Acquire the specified vJoy Device.
 	@utils_logging.log_call
 	def AcquireVJD(rID):
-		function = VJoyInterface.dll.AcquireVJD
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().AcquireVJD(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API VOID		__cdecl	RelinquishVJD(UINT rID);			// Relinquish the specified vJoy Device.
 	@utils_logging.log_call
 	def RelinquishVJD(rID):
-		function = VJoyInterface.dll.RelinquishVJD
-		function.restype = None
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().RelinquishVJD(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	UpdateVJD(UINT rID, PVOID pData);	// Update the position data of the specified vJoy Device.
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def UpdateVJD(rID, Data: JOYSTICK_POSITION_V2):
-		function = VJoyInterface.dll.UpdateVJD
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID), ctypes.byref(Data))
-		return result
+		return VJoyInterface._dll().UpdateVJD(rID, ctypes.byref(Data))
 
 	#
 	#	/////	Write access to vJoy Device - Modifyiers
@@ -260,79 +370,279 @@ class VJoyInterface:
 	#	//// Reset functions
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	ResetVJD(UINT rID);			// Reset all controls to predefined values in the specified VDJ
 	@utils_logging.log_call
 	def ResetVJD(rID):
-		function = VJoyInterface.dll.ResetVJD
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().ResetVJD(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API VOID		__cdecl	ResetAll(void);				// Reset all controls to predefined values in all VDJ
 	@utils_logging.log_call
 	def ResetAll():
-		function = VJoyInterface.dll.ResetAll
-		function.restype = None
-		result = function()
-		return result
+		return VJoyInterface._dll().ResetAll()
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	ResetButtons(UINT rID);		// Reset all buttons (To 0) in the specified VDJ
 	@utils_logging.log_call
 	def ResetButtons(rID):
-		function = VJoyInterface.dll.ResetButtons
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().ResetButtons(rID)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	ResetPovs(UINT rID);		// Reset all POV Switches (To -1) in the specified VDJ
 	@utils_logging.log_call
 	def ResetPovs(rID):
-		function = VJoyInterface.dll.ResetPovs
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.UINT(rID))
-		return result
+		return VJoyInterface._dll().ResetPovs(rID)
 
 	#
 	#	// Write data
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	SetAxis(LONG Value, UINT rID, UINT Axis);		// Write Value to a given axis defined in the specified VDJ
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def SetAxis(Value, rID, Axis):
-		function = VJoyInterface.dll.SetAxis
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.LONG(Value), ctypes.wintypes.UINT(rID), ctypes.wintypes.UINT(Axis))
-		return result
+		return VJoyInterface._dll().SetAxis(Value, rID, Axis)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	SetBtn(BOOL Value, UINT rID, UCHAR nBtn);		// Write Value to a given button defined in the specified VDJ
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def SetBtn(Value, rID, nBtn):
-		function = VJoyInterface.dll.SetBtn
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.BOOL(Value), ctypes.wintypes.UINT(rID), ctypes.c_ubyte(nBtn))
-		return result
+		return VJoyInterface._dll().SetBtn(Value, rID, nBtn)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	SetDiscPov(int Value, UINT rID, UCHAR nPov);	// Write Value to a given descrete POV defined in the specified VDJ
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def SetDiscPov(Value, rID, nPov):
-		function = VJoyInterface.dll.SetDiscPov
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.INT(Value), ctypes.wintypes.UINT(rID), ctypes.c_ubyte(nPov))
-		return result
+		return VJoyInterface._dll().SetDiscPov(Value, rID, nPov)
 
 	@staticmethod
-	#	VJOYINTERFACE_API BOOL		__cdecl	SetContPov(DWORD Value, UINT rID, UCHAR nPov);	// Write Value to a given continuous POV defined in the specified VDJ
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def SetContPov(Value, rID, nPov):
-		function = VJoyInterface.dll.SetContPov
-		function.restype = ctypes.wintypes.BOOL
-		result = function(ctypes.wintypes.DWORD(Value), ctypes.wintypes.UINT(rID), ctypes.c_ubyte(nPov))
-		return result
+		return VJoyInterface._dll().SetContPov(Value, rID, nPov)
+
+
+class SimulatedVJoyInterface:
+	"""In-memory stand-in for VJoyInterface with the same functions, for running and benchmarking without the driver.
+
+	Devices are acquired, owned and relinquished like with the driver; a device owned by another (simulated) process
+	is busy. The modifier functions update the position data the same way the driver does, so UpdateVJD and the
+	modifiers can be compared field by field.
+
+	Usage::
+
+		interface = SimulatedVJoyInterface()
+		with VJoyDevice(report_id=1, interface=interface) as dev:
+			...
+		interface.position(1).wAxisX
+	"""
+
+	DEFAULT_CAPABILITIES = VJoyCapabilities(
+		axes=frozenset(AXIS_FIELDS),
+		axis_ranges=types.MappingProxyType({axis: DEFAULT_AXIS_RANGE for axis in AXIS_FIELDS}),
+		nof_buttons=32,
+		nof_discrete_hats=4,
+		nof_continuous_hats=0)
+
+	def __init__(self, devices=None, pid=None):
+		"""
+		:param devices: dict from report id to VJoyCapabilities, or to a _SimulatedDevice to share it, device 1 with DEFAULT_CAPABILITIES if None
+		:param pid: process id the interface acts as, os.getpid() if None
+		"""
+		devices = devices if devices is not None else {1: SimulatedVJoyInterface.DEFAULT_CAPABILITIES}
+		self.devices = {
+			rID: device if isinstance(device, _SimulatedDevice) else _SimulatedDevice(device)
+			for rID, device in devices.items()
+		}
+		self.pid = pid if pid is not None else os.getpid()
+
+	def as_process(self, pid):
+		"""
+		:return: interface to the same devices acting as process pid, e.g. to make a device busy
+		"""
+		return SimulatedVJoyInterface(self.devices, pid)
+
+	def position(self, rID):
+		"""
+		:return: current JOYSTICK_POSITION_V2 of device rID
+		"""
+		return self.devices[rID].position
+
+	def _owned(self, rID):
+		device = self.devices.get(rID)
+		return device if device is not None and device.owner_pid == self.pid else None
+
+	def GetvJoyVersion(self):
+		return 0x219
+
+	def GetvJoyProductString(self):
+		return 'vJoy - Virtual Joystick (simulated)'
+
+	def GetvJoyManufacturerString(self):
+		return 'aijoystick'
+
+	def GetvJoySerialNumberString(self):
+		return '2.1.9'
+
+	def vJoyEnabled(self):
+		return True
+
+	def DriverMatch(self):
+		return True, ctypes.wintypes.WORD(0x219), ctypes.wintypes.WORD(0x219)
+
+	def GetvJoyMaxDevices(self):
+		return True, ctypes.c_int(16)
+
+	def GetNumberExistingVJD(self):
+		return True, ctypes.c_int(len(self.devices))
+
+	def GetVJDButtonNumber(self, rID):
+		return self.devices[rID].capabilities.nof_buttons if rID in self.devices else 0
+
+	def GetVJDDiscPovNumber(self, rID):
+		return self.devices[rID].capabilities.nof_discrete_hats if rID in self.devices else 0
+
+	def GetVJDContPovNumber(self, rID):
+		return self.devices[rID].capabilities.nof_continuous_hats if rID in self.devices else 0
+
+	def GetVJDAxisExist(self, rID, Axis):
+		return rID in self.devices and Axis in self.devices[rID].capabilities.axes
+
+	def _axis_limit(self, rID, Axis, limit_no):
+		if not self.GetVJDAxisExist(rID, Axis):
+			return False, ctypes.wintypes.LONG()
+		return True, ctypes.wintypes.LONG(self.devices[rID].capabilities.axis_ranges[Axis][limit_no])
+
+	def GetVJDAxisMax(self, rID, Axis):
+		return self._axis_limit(rID, Axis, 1)
+
+	def GetVJDAxisMin(self, rID, Axis):
+		return self._axis_limit(rID, Axis, 0)
+
+	def GetVJDStatus(self, rID):
+		device = self.devices.get(rID)
+		if device is None:
+			return VJDStatus.VJD_STAT_MISS
+		if device.owner_pid is None:
+			return VJDStatus.VJD_STAT_FREE
+		return VJDStatus.VJD_STAT_OWN if device.owner_pid == self.pid else VJDStatus.VJD_STAT_BUSY
+
+	def isVJDExists(self, rID):
+		return rID in self.devices
+
+	def GetOwnerPid(self, rID):
+		device = self.devices.get(rID)
+		#The driver returns a negative status if there is no owner.
+		return device.owner_pid if device is not None and device.owner_pid is not None else -VJDStatus.VJD_STAT_FREE
+
+	def AcquireVJD(self, rID):
+		status = self.GetVJDStatus(rID)
+		if status == VJDStatus.VJD_STAT_FREE:
+			self.devices[rID].owner_pid = self.pid
+			self.devices[rID].reset()
+		return status in (VJDStatus.VJD_STAT_FREE, VJDStatus.VJD_STAT_OWN)
+
+	def RelinquishVJD(self, rID):
+		if self._owned(rID) is not None:
+			self.devices[rID].owner_pid = None
+
+	def UpdateVJD(self, rID, Data: JOYSTICK_POSITION_V2):
+		device = self._owned(rID)
+		if device is None:
+			return False
+		ctypes.pointer(device.position)[0] = Data
+		device.nof_updates += 1
+		return True
+
+	def ResetVJD(self, rID):
+		device = self._owned(rID)
+		if device is None:
+			return False
+		device.reset()
+		return True
+
+	def ResetAll(self):
+		for rID in self.devices:
+			self.ResetVJD(rID)
+
+	def ResetButtons(self, rID):
+		device = self._owned(rID)
+		if device is None:
+			return False
+		device.reset_buttons()
+		return True
+
+	def ResetPovs(self, rID):
+		device = self._owned(rID)
+		if device is None:
+			return False
+		device.reset_hats()
+		return True
+
+	def SetAxis(self, Value, rID, Axis):
+		device = self._owned(rID)
+		if device is None or Axis not in device.capabilities.axes:
+			return False
+		setattr(device.position, AXIS_FIELDS[Axis], Value)
+		device.nof_updates += 1
+		return True
+
+	def SetBtn(self, Value, rID, nBtn):
+		device = self._owned(rID)
+		if device is None or not (1 <= nBtn <= device.capabilities.nof_buttons):
+			return False
+		field = BUTTON_FIELDS[(nBtn - 1) // 32]
+		bit = 1 << ((nBtn - 1) % 32)
+		buttons = getattr(device.position, field) & 0xFFFFFFFF
+		setattr(device.position, field, _int32(buttons | bit if Value else buttons & ~bit))
+		device.nof_updates += 1
+		return True
+
+	def SetDiscPov(self, Value, rID, nPov):
+		device = self._owned(rID)
+		if device is None or not (1 <= nPov <= device.capabilities.nof_discrete_hats):
+			return False
+		shift = 4 * (nPov - 1)
+		device.position.bHats = (device.position.bHats & ~(0xF << shift)) | ((Value & 0xF) << shift)
+		device.nof_updates += 1
+		return True
+
+	def SetContPov(self, Value, rID, nPov):
+		device = self._owned(rID)
+		if device is None or not (1 <= nPov <= device.capabilities.nof_continuous_hats):
+			return False
+		setattr(device.position, HAT_FIELDS[nPov - 1], Value & 0xFFFFFFFF)
+		device.nof_updates += 1
+		return True
+
+
+class _SimulatedDevice:
+	def __init__(self, capabilities):
+		self.capabilities = capabilities
+		self.owner_pid = None
+		self.position = JOYSTICK_POSITION_V2()
+		self.nof_updates = 0
+		self.reset()
+
+	def reset(self):
+		for axis, (axis_min, axis_max) in self.capabilities.axis_ranges.items():
+			setattr(self.position, AXIS_FIELDS[axis], (axis_min + axis_max) // 2)
+		self.reset_buttons()
+		self.reset_hats()
+
+	def reset_buttons(self):
+		for field in BUTTON_FIELDS:
+			setattr(self.position, field, 0)
+
+	def reset_hats(self):
+		for field in HAT_FIELDS:
+			setattr(self.position, field, 0xFFFFFFFF)
+
+
+_simulated_interface = None
+
+
+def default_interface():
+	"""
+	:return: VJoyInterface on Windows, otherwise a process wide SimulatedVJoyInterface
+	"""
+	global _simulated_interface
+	if platform.system() == 'Windows':
+		return VJoyInterface
+	if _simulated_interface is None:
+		_simulated_interface = SimulatedVJoyInterface()
+	return _simulated_interface
 
 
 class VJoyDevice:
@@ -344,106 +654,138 @@ class VJoyDevice:
 		WEST = 3
 
 	@utils_logging.log_call
-	def __init__(self, report_id=1):
+	def __init__(self, report_id=1, interface=None):
+		"""
+		:param report_id: vJoy device number
+		:param interface: VJoyInterface, or a SimulatedVJoyInterface, default_interface() if None
+		"""
 		self.rID = report_id
+		self.interface = interface if interface is not None else default_interface()
+		self.capabilities = None
+		#What this device last wrote, setters keep it up to date so a commit only changes what was changed.
+		self.state = None
+		self.position = JOYSTICK_POSITION_V2()
 
 	@utils_logging.log_call
 	def __enter__(self):
 		"""
 		Enter the runtime context related to this object. The with statement will bind this method’s return value to the target(s) specified in the as clause of the statement, if any.
 		"""
-		if VJoyInterface.vJoyEnabled():
+		if self.interface.vJoyEnabled():
 			logging.info(
-				f"vJoy version:{VJoyInterface.GetvJoyVersion()}\nVendor:{VJoyInterface.GetvJoyManufacturerString()}\nProduct:{VJoyInterface.GetvJoyProductString()}\nSerial number:{VJoyInterface.GetvJoySerialNumberString()}"
+				f"vJoy version:{self.interface.GetvJoyVersion()}\nVendor:{self.interface.GetvJoyManufacturerString()}\nProduct:{self.interface.GetvJoyProductString()}\nSerial number:{self.interface.GetvJoySerialNumberString()}"
 			)
-			ok, dll_ver, drv_ver = VJoyInterface.DriverMatch()
+			ok, dll_ver, drv_ver = self.interface.DriverMatch()
 			if ok:
-				vjdExists = VJoyInterface.isVJDExists(self.rID)
+				vjdExists = self.interface.isVJDExists(self.rID)
 				if vjdExists:
-					status = VJoyInterface.GetVJDStatus(self.rID)
-					owner_pid = VJoyInterface.GetOwnerPid(self.rID)
+					status = self.interface.GetVJDStatus(self.rID)
+					owner_pid = self.interface.GetOwnerPid(self.rID)
 					logging.debug(f"status={status} pid={owner_pid}.")
 					if status == VJDStatus.VJD_STAT_OWN:
 						pass
 					elif status == VJDStatus.VJD_STAT_FREE:
-						if not VJoyInterface.AcquireVJD(self.rID):
+						if not self.interface.AcquireVJD(self.rID):
 							raise RuntimeError(f"Failed to acquire vJoy device number {self.rID}.")
 					elif status == VJDStatus.VJD_STAT_BUSY:
 						raise RuntimeError(f"{status}: pid {owner_pid} owns the vJoy device number {self.rID}.")
 					else:
 						raise RuntimeError(status)
+					self.capabilities = self.query_capabilities()
+					self.state = VJoyState.neutral(self.capabilities)
 					return self
 				else:
 					raise RuntimeError(
 						f"vjoy device {self.rID} is not configured and enabled. Possible causes: Device does not exist, device is disabled, driver is not installed, ..."
 					)
 			else:
-				raise RuntimeError(f"vJoyInterface DLL (version {dll_ver}) does not match vJoy Driver (version {drv:ver})")
+				raise RuntimeError(f"vJoyInterface DLL (version {dll_ver}) does not match vJoy Driver (version {drv_ver})")
 		else:
 			raise RuntimeError("vJoy not enabled.")
 
+	@utils_logging.log_call
+	def query_capabilities(self):
+		"""Ask the driver what the device has, VJoyDevice does this once in __enter__.
+
+		:return: VJoyCapabilities
+		"""
+		axes = frozenset(hid_used for hid_used in list(VJDHIDUsage) if self.interface.GetVJDAxisExist(self.rID, hid_used))
+		axis_ranges = dict()
+		for axis in axes:
+			min_ok, axis_min = self.interface.GetVJDAxisMin(self.rID, axis)
+			max_ok, axis_max = self.interface.GetVJDAxisMax(self.rID, axis)
+			axis_ranges[axis] = (axis_min.value, axis_max.value) if (min_ok and max_ok) else DEFAULT_AXIS_RANGE
+		return VJoyCapabilities(
+			axes=axes,
+			axis_ranges=types.MappingProxyType(axis_ranges),
+			nof_buttons=self.interface.GetVJDButtonNumber(self.rID),
+			nof_discrete_hats=self.interface.GetVJDDiscPovNumber(self.rID),
+			nof_continuous_hats=self.interface.GetVJDContPovNumber(self.rID))
+
+	def _get_capabilities(self):
+		return self.capabilities if self.capabilities is not None else self.query_capabilities()
+
 	@utils_logging.log_call
 	def get_available_axes(self):
-		return {hid_used for hid_used in list(VJDHIDUsage) if VJoyInterface.GetVJDAxisExist(self.rID, hid_used)}
+		return set(self._get_capabilities().axes)
 
 	@utils_logging.log_call
 	def get_nof_buttons(self):
-		return VJoyInterface.GetVJDButtonNumber(self.rID)
+		return self._get_capabilities().nof_buttons
 
 	@utils_logging.log_call
 	def get_nof_discrete_hats(self):
-		return VJoyInterface.GetVJDDiscPovNumber(self.rID)
+		return self._get_capabilities().nof_discrete_hats
 
 	@utils_logging.log_call
 	def get_nof_continuous_hats(self):
-		return VJoyInterface.GetVJDContPovNumber(self.rID)
+		return self._get_capabilities().nof_continuous_hats
 
 	@utils_logging.log_call
 	def reset(self):
-		return VJoyInterface.ResetVJD(self.rID)
+		if self.state is not None:
+			self.state = VJoyState.neutral(self.capabilities)
+		return self.interface.ResetVJD(self.rID)
 
 	@utils_logging.log_call
 	def reset_buttons(self):
-		return VJoyInterface.ResetButtons(self.rID)
+		if self.state is not None:
+			self.state.buttons = 0
+		return self.interface.ResetButtons(self.rID)
 
 	@utils_logging.log_call
 	def reset_hats(self):
-		return VJoyInterface.ResetPovs(self.rID)
+		if self.state is not None:
+			neutral = VJoyState.neutral(self.capabilities)
+			self.state.discrete_hats = neutral.discrete_hats
+			self.state.continuous_hats = neutral.continuous_hats
+		return self.interface.ResetPovs(self.rID)
 
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def set_axis(self, axis: VJDHIDUsage, value):
-		axes = self.get_available_axes()
-		if axis in axes:
-			if (0x1 <= value) and (value <= 0x8000):
-				return VJoyInterface.SetAxis(value, self.rID, axis)
-			else:
-				raise ValueError(f"value is not within bounds: {0x1}=0x1<={value}<=0x8000={0x8000}")
-		else:
-			raise ValueError(f"axis {axis} is not in available axes ({axes})")
+		_check_axis(self._get_capabilities(), axis, value)
+		if self.state is not None:
+			self.state.axes[axis] = value
+		_CALLS.inc()
+		return self.interface.SetAxis(value, self.rID, axis)
 
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def set_button(self, button_no, value: bool):
-		nof_buttons = self.get_nof_buttons()
-		if (1 <= button_no) and (button_no <= nof_buttons):
-			if (0 <= value) and (value <= 1):
-				return VJoyInterface.SetBtn(value, self.rID, button_no)
-			else:
-				raise ValueError(f"value is not within bounds: 0<={value}<=1")
-		else:
-			raise ValueError(f"button_no {button_no} is not within bounds 1<={button_no}<={nof_buttons}")
+		_check_button(self._get_capabilities(), button_no, value)
+		if self.state is not None:
+			self.state._set_button(button_no, value)
+		_CALLS.inc()
+		return self.interface.SetBtn(value, self.rID, button_no)
 
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def set_discrete_hat(self, hat_no, value):
-		nof_discrete_hats = self.get_nof_discrete_hats()
-		if (1 <= hat_no) and (hat_no <= nof_discrete_hats):
-			if value in list(DiscreteHatDirection):
-				return VJoyInterface.SetDiscPov(value, self.rID, hat_no)
-			else:
-				raise ValueError(f"value {value} should be one of {list(DiscreteHatDirection)}")
-		else:
-			raise ValueError(f"discrete hat no {hat_no} is not within bounds 1<={hat_no}<={nof_discrete_hats}")
+		_check_discrete_hat(self._get_capabilities(), hat_no, value)
+		if self.state is not None:
+			self.state.discrete_hats[hat_no] = value
+		_CALLS.inc()
+		return self.interface.SetDiscPov(value.value, self.rID, hat_no)
 
-	@utils_logging.log_call
+	@utils_logging.log_call(hot=True)
 	def set_continuous_hat(self, hat_no, value):
 		"""[summary]
 
@@ -453,14 +795,52 @@ class VJoyDevice:
 		:raises ValueError: [description]
 		"""
 
-		nof_continuous_hats = self.get_nof_continuous_hats()
-		if (1 <= hat_no) and (hat_no <= nof_continuous_hats):
-			if -1 <= value and value <= 35999:
-				VJoyInterface.SetContPov(value, self.rID, hat_no)
-			else:
-				raise ValueError(f"value {value} should be in range -1 to 35999")
-		else:
-			raise ValueError(f"continuous hat no {hat_no} is not within bounds 1<={hat_no}<={nof_continuous_hats}")
+		_check_continuous_hat(self._get_capabilities(), hat_no, value)
+		if self.state is not None:
+			self.state.continuous_hats[hat_no] = value
+		_CALLS.inc()
+		self.interface.SetContPov(value, self.rID, hat_no)
+
+	@utils_logging.log_call(hot=True)
+	def commit(self, state=None):
+		"""Write a complete device state with a single UpdateVJD call, the game never sees it half-applied.
+
+		:param state: VJoyState to write, the device's own state (self.state) if None
+		:raises RuntimeError: if the device has not been acquired (entered)
+		:return: result of UpdateVJD
+		"""
+		if self.state is None:
+			raise RuntimeError("device not acquired")
+		if state is None:
+			state = self.state
+		elif state is not self.state:
+			state.check(self.capabilities)
+			self.state = state.copy()
+		start = time.perf_counter()
+		state.fill(self.position, self.rID, self.capabilities)
+		result = self.interface.UpdateVJD(self.rID, self.position)
+		_COMMIT_SECONDS.observe(time.perf_counter() - start)
+		_CALLS.inc()
+		_COMMITS.inc()
+		return result
+
+	@contextlib.contextmanager
+	def transaction(self):
+		"""Collect changes in a copy of the current state and commit them together when the with-block exits.
+
+		Usage::
+
+			with dev.transaction() as state:
+				state.set_axis(VJDHIDUsage.HID_USAGE_X, 0x4000)
+				state.set_button(1, True)
+
+		:raises RuntimeError: if the device has not been acquired (entered)
+		"""
+		if self.state is None:
+			raise RuntimeError("device not acquired")
+		state = self.state.copy()
+		yield state
+		self.commit(state)
 
 	@utils_logging.log_call
 	def __exit__(self, exc_type, exc_value, traceback):
@@ -469,7 +849,175 @@ class VJoyDevice:
 		If an exception is supplied, and the method wishes to suppress the exception (i.e., prevent it from being propagated), it should return a true value. Otherwise, the exception will be processed normally upon exit from this method.
 		Note that __exit__() methods should not reraise the passed-in exception; this is the caller’s responsibility.
 		"""
-		VJoyInterface.RelinquishVJD(self.rID)
-		if VJoyInterface.GetVJDStatus(self.rID) is not VJDStatus.VJD_STAT_FREE:
+		self.interface.RelinquishVJD(self.rID)
+		#Not acquired any more, commit and transaction refuse to write.
+		self.state = None
+		self.capabilities = None
+		if self.interface.GetVJDStatus(self.rID) is not VJDStatus.VJD_STAT_FREE:
 			raise RuntimeError()
 		return False
+
+
+class VJoyState:
+	"""Complete state of a vJoy device (axes, buttons and hats) that VJoyDevice.commit writes in one UpdateVJD call.
+
+	If it is given capabilities the setters validate like the VJoyDevice setters do.
+	"""
+
+	def __init__(self, axes=None, buttons=0, discrete_hats=None, continuous_hats=None, capabilities=None):
+		"""
+		:param axes: dict from VJDHIDUsage to value
+		:param buttons: bit mask of pressed buttons, bit 0 is button 1
+		:param discrete_hats: dict from hat number to VJoyDevice.DiscreteHatDirection
+		:param continuous_hats: dict from hat number to value (-1 to 35999)
+		:param capabilities: optional VJoyCapabilities to validate against
+		"""
+		self.axes = dict(axes) if axes else dict()
+		self.buttons = buttons
+		self.discrete_hats = dict(discrete_hats) if discrete_hats else dict()
+		self.continuous_hats = dict(continuous_hats) if continuous_hats else dict()
+		self.capabilities = capabilities
+
+	@classmethod
+	def neutral(cls, capabilities):
+		"""
+		:return: VJoyState with centered axes, released buttons and neutral hats
+		"""
+		return cls(
+			axes={axis: (axis_min + axis_max) // 2
+			for axis, (axis_min, axis_max) in capabilities.axis_ranges.items()},
+			discrete_hats={hat_no: VJoyDevice.DiscreteHatDirection.NEUTRAL
+			for hat_no in range(1, capabilities.nof_discrete_hats + 1)},
+			continuous_hats={hat_no: -1
+			for hat_no in range(1, capabilities.nof_continuous_hats + 1)},
+			capabilities=capabilities)
+
+	def copy(self):
+		return VJoyState(self.axes, self.buttons, self.discrete_hats, self.continuous_hats, self.capabilities)
+
+	def __eq__(self, other):
+		return isinstance(other, VJoyState) and (self.axes, self.buttons, self.discrete_hats, self.continuous_hats) == (
+			other.axes, other.buttons, other.discrete_hats, other.continuous_hats)
+
+	def __repr__(self):
+		return f'VJoyState(axes={self.axes!r}, buttons={self.buttons:#x}, discrete_hats={self.discrete_hats!r}, continuous_hats={self.continuous_hats!r})'
+
+	def set_axis(self, axis: VJDHIDUsage, value):
+		if self.capabilities is not None:
+			_check_axis(self.capabilities, axis, value)
+		self.axes[axis] = value
+
+	def _set_button(self, button_no, value):
+		if value:
+			self.buttons |= 1 << (button_no - 1)
+		else:
+			self.buttons &= ~(1 << (button_no - 1))
+
+	def set_button(self, button_no, value: bool):
+		if self.capabilities is not None:
+			_check_button(self.capabilities, button_no, value)
+		self._set_button(button_no, value)
+
+	def get_button(self, button_no):
+		return bool(self.buttons >> (button_no - 1) & 1)
+
+	def set_discrete_hat(self, hat_no, value):
+		if self.capabilities is not None:
+			_check_discrete_hat(self.capabilities, hat_no, value)
+		self.discrete_hats[hat_no] = value
+
+	def set_continuous_hat(self, hat_no, value):
+		if self.capabilities is not None:
+			_check_continuous_hat(self.capabilities, hat_no, value)
+		self.continuous_hats[hat_no] = value
+
+	def check(self, capabilities):
+		"""
+		:raises ValueError: if any control does not exist or has a value out of bounds
+		"""
+		for axis, value in self.axes.items():
+			_check_axis(capabilities, axis, value)
+		if self.buttons >> capabilities.nof_buttons:
+			raise ValueError(f"buttons {self.buttons:#x} has buttons above {capabilities.nof_buttons} pressed")
+		for hat_no, value in self.discrete_hats.items():
+			_check_discrete_hat(capabilities, hat_no, value)
+		for hat_no, value in self.continuous_hats.items():
+			_check_continuous_hat(capabilities, hat_no, value)
+
+	def fill(self, position: JOYSTICK_POSITION_V2, rID, capabilities=None):
+		"""Write the state into a JOYSTICK_POSITION_V2 for UpdateVJD."""
+		position.bDevice = rID
+		for axis, value in self.axes.items():
+			field = AXIS_FIELDS.get(axis)
+			if field is None:
+				raise ValueError(f"axis {axis} cannot be set with UpdateVJD")
+			setattr(position, field, value)
+		for field_no, field in enumerate(BUTTON_FIELDS):
+			setattr(position, field, _int32(self.buttons >> (32 * field_no)))
+		if self.continuous_hats or (capabilities is not None and capabilities.nof_continuous_hats):
+			for hat_no, field in enumerate(HAT_FIELDS, start=1):
+				setattr(position, field, self.continuous_hats.get(hat_no, -1) & 0xFFFFFFFF)
+		else:
+			#One nibble per discrete hat, 0xF is neutral.
+			hats = 0xFFFFFFFF
+			for hat_no, direction in self.discrete_hats.items():
+				shift = 4 * (hat_no - 1)
+				hats = (hats & ~(0xF << shift)) | ((direction.value & 0xF) << shift)
+			position.bHats = hats
+			for field in HAT_FIELDS[1:]:
+				setattr(position, field, 0xFFFFFFFF)
+
+
+def benchmark(report_id=1, nof_updates=200, interface=None):
+	"""Compare writing a complete state control by control with writing it in one commit.
+
+	:param report_id: vJoy device to use
+	:param interface: see VJoyDevice
+	:param nof_updates: number of complete states written per way
+	:return: dict with driver calls/s and complete updates/s for both ways
+	"""
+	with VJoyDevice(report_id=report_id, interface=interface) as dev:
+		capabilities = dev.capabilities
+		nof_calls_per_update = len(capabilities.axes) + capabilities.nof_buttons + capabilities.nof_discrete_hats + capabilities.nof_continuous_hats
+		axes = sorted(capabilities.axes)
+
+		start = time.perf_counter()
+		for update_no in range(nof_updates):
+			pressed = bool(update_no % 2)
+			for axis in axes:
+				axis_min, axis_max = capabilities.axis_ranges[axis]
+				dev.set_axis(axis, axis_max if pressed else axis_min)
+			for button_no in range(1, capabilities.nof_buttons + 1):
+				dev.set_button(button_no, pressed)
+			for hat_no in range(1, capabilities.nof_discrete_hats + 1):
+				dev.set_discrete_hat(hat_no, VJoyDevice.DiscreteHatDirection.NORTH if pressed else VJoyDevice.DiscreteHatDirection.NEUTRAL)
+			for hat_no in range(1, capabilities.nof_continuous_hats + 1):
+				dev.set_continuous_hat(hat_no, 9000 if pressed else -1)
+		per_control = time.perf_counter() - start
+
+		start = time.perf_counter()
+		for update_no in range(nof_updates):
+			pressed = bool(update_no % 2)
+			with dev.transaction() as state:
+				for axis in axes:
+					axis_min, axis_max = capabilities.axis_ranges[axis]
+					state.set_axis(axis, axis_max if pressed else axis_min)
+				for button_no in range(1, capabilities.nof_buttons + 1):
+					state.set_button(button_no, pressed)
+				for hat_no in range(1, capabilities.nof_discrete_hats + 1):
+					state.set_discrete_hat(hat_no, VJoyDevice.DiscreteHatDirection.NORTH if pressed else VJoyDevice.DiscreteHatDirection.NEUTRAL)
+				for hat_no in range(1, capabilities.nof_continuous_hats + 1):
+					state.set_continuous_hat(hat_no, 9000 if pressed else -1)
+		committed = time.perf_counter() - start
+		dev.reset()
+	return {
+		'per_control_calls_per_s': nof_updates * nof_calls_per_update / per_control,
+		'per_control_updates_per_s': nof_updates / per_control,
+		'commit_calls_per_s': nof_updates / committed,
+		'commit_updates_per_s': nof_updates / committed,
+	}
+
+
+if __name__ == '__main__':
+	for name, value in benchmark().items():
+		print(f'{name}: {value:.0f}')